@@ -0,0 +1,56 @@
+# FILE: agent_clock.py
+import time
+from datetime import datetime, timedelta
+
+
+class SystemClock:
+    """Wall-clock time, used when the agent runs live."""
+
+    def now(self):
+        return datetime.now()
+
+    def today(self):
+        return self.now().date()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class VirtualClock:
+    """A clock that only moves when told to, so replays run as fast as the CPU allows."""
+
+    def __init__(self, start):
+        self.current = start
+
+    def now(self):
+        return self.current
+
+    def today(self):
+        return self.current.date()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.current += timedelta(seconds=seconds)
+
+    def set(self, moment):
+        self.current = moment
+
+
+class ScaledClock:
+    """Wall-clock time sped up `speed` times from a chosen start, so a load test can run a session in minutes."""
+
+    def __init__(self, start, speed=1.0):
+        self.start = start
+        self.speed = speed
+        self.started = time.monotonic()
+
+    def now(self):
+        return self.start + timedelta(seconds=(time.monotonic() - self.started) * self.speed)
+
+    def today(self):
+        return self.now().date()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
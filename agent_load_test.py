@@ -0,0 +1,204 @@
+# FILE: agent_load_test.py
+"""
+Load test for the live ORB agent against mock_upstox_server.py. For each instrument count it starts a
+mock API on a sped-up session clock and runs one live_agent_orb.OrbAgent per instrument through
+run_cycle every (virtual) minute, as the live loop does, with the candle requests spread over a
+thread pool. It reports how wake-to-signal latency, cycle time and error recovery change as the
+universe grows, and compares every agent's trades with an offline replay of the same sessions, so
+the cost of slow or failing requests shows up as divergent trades.
+
+    python agent_load_test.py --counts 1 50 100 250 500 --minutes 45 --speed 60
+    python agent_load_test.py --latency-ms 40 --jitter-ms 40 --error-rate 0.02 --rate-limit 400 --outage-at 20 --outage-minutes 2
+
+Latencies are wall-clock; with --speed 60 each session minute lasts one real second, so a cycle
+longer than that overruns and the scheduler reports (and backfills) the skipped minute.
+"""
+import argparse
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import quote
+import numpy as np
+import pandas as pd
+import requests
+import live_agent_orb
+from live_agent_orb import OrbAgent, run_cycle
+from agent_clock import VirtualClock
+from agent_scheduler import MinuteScheduler, WAKE_OFFSET_SECONDS
+from mock_upstox_server import CandleBook, FaultInjector, RecordedCandles, SyntheticCandles, CANDLE_INTERVAL, session_clock, start_mock_server
+from orb_scanner import synthetic_keys
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+DEFAULT_COUNTS = (1, 50, 100, 250, 500)
+DEFAULT_MINUTES = 45 # The 30-minute opening range plus a quarter of an hour of breakout checks
+DEFAULT_SPEED = 60.0
+REQUEST_WORKERS = 16
+REQUEST_TIMEOUT_SECONDS = 5
+RETRY_BACKOFF_SECONDS = 0.05
+FAILED = "API_ERROR"
+
+
+class CandleFetcher:
+    """The live agent's fetch_candles for each key, over one keep-alive session, with optional retries."""
+
+    def __init__(self, base_url, retries=0, workers=REQUEST_WORKERS):
+        self.base_url = base_url.rstrip('/')
+        self.retries = retries
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.request_seconds = [] # list.append is atomic, so the worker threads can share these
+        self.retried = []
+
+    def for_key(self, key):
+        url = f"{self.base_url}/v2/historical-candle/intraday/{quote(key, safe='')}/{CANDLE_INTERVAL}"
+
+        def fetch_candles(now):
+            for attempt in range(self.retries + 1):
+                started = time.perf_counter()
+                try:
+                    response = self.session.get(url, timeout=REQUEST_TIMEOUT_SECONDS)
+                    response.raise_for_status()
+                    candles = response.json()['data']['candles']
+                    self.request_seconds.append(time.perf_counter() - started)
+                    return sorted(candles, key=lambda candle: candle[0])
+                except requests.RequestException:
+                    self.request_seconds.append(time.perf_counter() - started)
+                    if attempt == self.retries:
+                        raise
+                    self.retried.append(key)
+                    time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+        return fetch_candles
+
+
+def trade_record(agent):
+    return [(trade.get('entry_time'), trade.get('entry_price'), trade.get('exit_time'), trade.get('exit_reason')) for trade in agent.trades]
+
+
+def offline_trades(keys, source, start, minutes):
+    """Each key's trades when the agent sees every minute's candles on time (VirtualClock, no HTTP, no faults)."""
+    clock = VirtualClock(start)
+    book = CandleBook(source, clock)
+    agents = {key: OrbAgent(clock.today(), alert=lambda *args: None, email=lambda *args: None) for key in keys}
+    for minute in range(minutes):
+        clock.set(start + timedelta(minutes=minute, seconds=WAKE_OFFSET_SECONDS))
+        for key, agent in agents.items():
+            run_cycle(agent, clock, lambda now: book.intraday(key)[::-1], status_file=None)
+    return {key: trade_record(agent) for key, agent in agents.items()}
+
+
+def run_load(count, args, source):
+    """Runs `count` agents for args.minutes session minutes against a fresh mock server and returns one report row."""
+    keys = synthetic_keys(count)
+    clock = session_clock(args.speed)
+    start = clock.start
+    faults = FaultInjector(args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate, args.rate_limit)
+    server = start_mock_server(0, candles=CandleBook(source, clock), faults=faults)
+    fetcher = CandleFetcher(f"http://127.0.0.1:{server.server_address[1]}", args.retries, args.workers)
+    fetchers = {key: fetcher.for_key(key) for key in keys}
+    agents = {key: OrbAgent(clock.today(), alert=lambda *args: None, email=lambda *args: None) for key in keys}
+    scheduler = MinuteScheduler(clock)
+    pool = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="agents")
+
+    def decide(key, tick):
+        try:
+            signal = run_cycle(agents[key], clock, fetchers[key], status_file=None, backfill_minutes=tick.skipped_minutes)
+        except requests.RequestException:
+            signal = FAILED
+        return signal, time.perf_counter()
+
+    signal_seconds, cycle_seconds, failed_by_minute, outage_by_minute = [], [], [], []
+    lost_streak = dict.fromkeys(keys, 0)
+    longest_streak = 0
+    outage = range(args.outage_at, args.outage_at + args.outage_minutes) if args.outage_at is not None else range(0)
+    try:
+        for minute in range(args.minutes):
+            tick = scheduler.wait()
+            woke = time.perf_counter()
+            if len(outage) and minute == outage.start:
+                faults.fail_for(args.outage_minutes * 60 / args.speed)
+            outage_before = faults.counts['outage']
+            results = list(pool.map(lambda key: decide(key, tick), keys))
+            cycle_seconds.append(time.perf_counter() - woke)
+            outage_by_minute.append(faults.counts['outage'] - outage_before)
+            failed = 0
+            for key, (signal, decided) in zip(keys, results):
+                if signal == FAILED:
+                    failed += 1
+                    lost_streak[key] += 1
+                    longest_streak = max(longest_streak, lost_streak[key])
+                else:
+                    lost_streak[key] = 0
+                    signal_seconds.append(decided - woke)
+            failed_by_minute.append(failed)
+    finally:
+        pool.shutdown()
+        server.shutdown()
+        server.server_close()
+
+    # Minutes from the end of the outage until no request hit it; random 500s (--error-rate) don't count
+    recovery = None
+    if len(outage):
+        recovered = [minute for minute in range(outage.stop, args.minutes) if outage_by_minute[minute] == 0]
+        recovery = recovered[0] - outage.stop if recovered else None
+
+    reference = offline_trades(keys, source, start, args.minutes)
+    divergent = sum(trade_record(agents[key]) != reference[key] for key in keys)
+    signal_ms = np.array(signal_seconds) * 1000
+    minute_seconds = 60 / args.speed
+    return {
+        'instruments': count,
+        'requests': faults.counts['requests'],
+        'signal_p50_ms': np.percentile(signal_ms, 50) if len(signal_ms) else np.nan,
+        'signal_p95_ms': np.percentile(signal_ms, 95) if len(signal_ms) else np.nan,
+        'signal_max_ms': signal_ms.max() if len(signal_ms) else np.nan,
+        'request_p95_ms': np.percentile(fetcher.request_seconds, 95) * 1000,
+        'cycle_max_ms': max(cycle_seconds) * 1000,
+        'minute_used_pct': 100 * max(cycle_seconds) / minute_seconds,
+        'skipped_minutes': scheduler.skipped_total,
+        'throttled': faults.counts['throttled'],
+        'server_errors': faults.counts['errors'] + faults.counts['outage'],
+        'retries': len(fetcher.retried),
+        'lost_decisions': sum(failed_by_minute),
+        'longest_loss_min': longest_streak,
+        'recovery_min': recovery,
+        'divergent_agents': divergent,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the live ORB agent against the mock Upstox API")
+    parser.add_argument('--counts', type=int, nargs='+', default=list(DEFAULT_COUNTS), help="instrument counts to test")
+    parser.add_argument('--minutes', type=int, default=DEFAULT_MINUTES, help="session minutes per run, from the open")
+    parser.add_argument('--speed', type=float, default=DEFAULT_SPEED, help="session minutes per real minute")
+    parser.add_argument('--workers', type=int, default=REQUEST_WORKERS, help="concurrent candle requests")
+    parser.add_argument('--retries', type=int, default=0, help="retries per failed request (the live agent makes none)")
+    parser.add_argument('--recorded', nargs='+', metavar='CSV', help="replay sessions from these candle CSVs instead of synthetic walks")
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with a 500")
+    parser.add_argument('--rate-limit', type=float, help="server requests per second before 429s")
+    parser.add_argument('--outage-at', type=int, metavar='MINUTE', help="session minute at which the API starts answering 503")
+    parser.add_argument('--outage-minutes', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    logging.getLogger(live_agent_orb.__name__).setLevel(logging.WARNING) # the agent logs every minute
+    source = RecordedCandles(args.recorded) if args.recorded else SyntheticCandles()
+    rows = []
+    for count in args.counts:
+        logger.info(f"--- {count} instruments, {args.minutes} session minutes at {args.speed:g}x ---")
+        rows.append(run_load(count, args, source))
+        logger.info(f"{count} instruments: signal p95 {rows[-1]['signal_p95_ms']:.1f} ms, {rows[-1]['lost_decisions']} lost decisions, "
+                    f"{rows[-1]['divergent_agents']} divergent agents")
+    report = pd.DataFrame(rows).set_index('instruments')
+    print(report.round(1).to_string())
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,150 @@
+# FILE: agent_metrics.py
+"""
+Lightweight latency/throughput instrumentation for the live agent: fixed-bucket histograms and
+counters, exposed as Prometheus text on a local HTTP endpoint and as a rolling JSON summary file.
+Recording a sample is a bisect plus a few additions, so it is safe to call on the hot loop.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter", f"{self.name} {self.value}"]
+
+    def summary(self):
+        return self.value
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1) # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def quantile(self, q):
+        """Upper bucket bound containing the q-th quantile (Prometheus-style estimate)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for bound, bucket_count in zip(self.buckets + (self.max,), self.counts):
+            running += bucket_count
+            if running >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        running = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            running += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {running}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+    def summary(self):
+        return {'count': self.count, 'mean': self.sum / self.count if self.count else 0.0, 'max': self.max,
+                'p50': self.quantile(0.5), 'p95': self.quantile(0.95), 'p99': self.quantile(0.99)}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self.started = time.time()
+
+    def counter(self, name, help_text):
+        return self.metrics.setdefault(name, Counter(name, help_text))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self.metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def render(self):
+        """Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write_summary(self, path):
+        """Writes the rolling JSON summary atomically, so a reader never sees half a file."""
+        summary = {'updated': time.strftime('%Y-%m-%d %H:%M:%S'), 'uptime_seconds': round(time.time() - self.started, 1)}
+        summary.update({name: metric.summary() for name, metric in self.metrics.items()})
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(summary, f, indent=2)
+        os.replace(temp_path, path)
+
+
+def start_metrics_server(registry, port, host="127.0.0.1"):
+    """Serves GET /metrics from a daemon thread and returns the server."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass # keep scrapes out of the agent log
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+class AgentMetrics:
+    """The live agent's metric set."""
+
+    def __init__(self, registry=None):
+        self.registry = registry or MetricsRegistry()
+        self.api_latency = self.registry.histogram('aita_api_latency_seconds', 'Latency of Upstox candle requests')
+        self.signal_latency = self.registry.histogram('aita_candle_close_to_signal_seconds', 'Time from candle close (minute boundary) to the agent decision')
+        self.cycle_duration = self.registry.histogram('aita_cycle_duration_seconds', 'Duration of one agent cycle')
+        self.status_write = self.registry.histogram('aita_status_write_seconds', 'Time spent writing status.json')
+        self.alert_latency = self.registry.histogram('aita_alert_seconds', 'Time spent sending alerts and reports')
+        self.cycles = self.registry.counter('aita_cycles_total', 'Agent cycles run')
+        self.api_errors = self.registry.counter('aita_api_errors_total', 'Upstox API errors (error responses, connection failures and timeouts)')
+        self.skipped_minutes = self.registry.counter('aita_skipped_minutes_total', 'Minute boundaries missed by the scheduler')
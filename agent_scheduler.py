@@ -0,0 +1,97 @@
+# FILE: agent_scheduler.py
+import logging
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
+
+WAKE_OFFSET_SECONDS = 2.0 # Give the exchange a moment to publish the candle that just closed
+MAX_BACKFILL_MINUTES = 60
+
+
+class Tick:
+    """One scheduled wake-up: the minute boundary it belongs to, how late it fired and any minutes skipped before it."""
+
+    def __init__(self, minute, deadline, woke_at, skipped_minutes):
+        self.minute = minute
+        self.deadline = deadline
+        self.woke_at = woke_at
+        self.lateness_seconds = (woke_at - deadline).total_seconds()
+        self.skipped_minutes = skipped_minutes
+
+
+class LatencyStats:
+    """Running count / mean / max of a latency series, in seconds."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def __str__(self):
+        return f"last={self.last:.3f}s mean={self.mean:.3f}s max={self.max:.3f}s (n={self.count})"
+
+
+class MinuteScheduler:
+    """
+    Wakes a fixed offset after every exchange-minute boundary instead of sleeping a flat 60 seconds,
+    so the loop never drifts. Each wake-up is measured against its deadline, and minute boundaries
+    that passed while the previous cycle was still running are reported for backfill.
+    """
+
+    def __init__(self, clock, offset_seconds=WAKE_OFFSET_SECONDS, max_backfill_minutes=MAX_BACKFILL_MINUTES):
+        self.clock = clock
+        self.offset = timedelta(seconds=offset_seconds)
+        self.max_backfill_minutes = max_backfill_minutes
+        self.last_minute = None
+        self.wake_lateness = LatencyStats()
+        self.decision_latency = LatencyStats()
+        self.skipped_total = 0
+
+    def next_deadline(self, now=None):
+        """The next minute boundary plus the wake offset that is still in the future."""
+        now = now or self.clock.now()
+        minute = now.replace(second=0, microsecond=0)
+        deadline = minute + self.offset
+        if deadline <= now:
+            deadline += timedelta(minutes=1)
+        return deadline
+
+    def wait(self):
+        """Sleeps until the next deadline and returns the Tick describing the wake-up."""
+        deadline = self.next_deadline()
+        self.clock.sleep((deadline - self.clock.now()).total_seconds())
+        woke_at = self.clock.now()
+        minute = deadline - self.offset
+
+        # Every boundary between the last processed minute and this one was missed
+        skipped = []
+        if self.last_minute is not None:
+            gap = int((minute - self.last_minute).total_seconds() // 60) - 1
+            if gap > 0:
+                self.skipped_total += gap
+                first = max(1, gap - self.max_backfill_minutes + 1)
+                skipped = [self.last_minute + timedelta(minutes=k) for k in range(first, gap + 1)]
+                logger.warning(f"Scheduler skipped {gap} minute(s) before {minute:%H:%M}; backfilling {len(skipped)}.")
+        self.last_minute = minute
+
+        tick = Tick(minute, deadline, woke_at, skipped)
+        self.wake_lateness.add(tick.lateness_seconds)
+        return tick
+
+    def record_decision(self, tick):
+        """Records how long after the candle close (the minute boundary) the decision was made."""
+        latency = (self.clock.now() - tick.minute).total_seconds()
+        self.decision_latency.add(latency)
+        return latency
@@ -0,0 +1,153 @@
+# FILE: aita.py
+"""
+Single entry point for the project's tools. Only the standard library is imported at startup; each
+subcommand imports what it needs (pandas, upstox_client, requests, ...) when it runs, so `--help`
+and instrument lookups start in a few tens of milliseconds.
+
+    python aita.py fetch [--symbol RELIANCE ...]     # research_fetch_portfolio_data.py
+    python aita.py backtest [--profile]              # research_portfolio_backtest.py
+    python aita.py optimize [sweep_cluster local args] <data.csv> ...
+    python aita.py live                              # live_agent_orb.py
+    python aita.py scan [--mock N]                   # orb_scanner.py
+    python aita.py lookup HDFC [--exchange NSE_EQ]   # SQLite instrument index, no pandas
+    python aita.py bench                             # startup time check for --help and lookup
+"""
+import argparse
+import os
+import sys
+
+STARTUP_BUDGET_MS = 100.0
+HEAVY_MODULES = ('pandas', 'numpy', 'upstox_client', 'requests', 'pandas_ta', 'numba')
+
+
+def cmd_fetch(args):
+    import research_fetch_portfolio_data as fetcher
+    api_instance = fetcher.make_history_api()
+    for symbol in args.symbol or list(fetcher.TARGET_STOCKS):
+        fetcher.fetch_symbol_history(api_instance, symbol, fetcher.TARGET_STOCKS[symbol])
+
+
+def _run_script(module, argv):
+    import runpy
+    sys.argv = [f"{module}.py", *argv]
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
+
+
+def cmd_backtest(args):
+    _run_script("research_portfolio_backtest", args.rest)
+
+
+def cmd_optimize(args):
+    import logging
+    import sweep_cluster
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
+    sweep_cluster.main(['local', *args.rest])
+
+
+def cmd_live(args):
+    import live_agent_orb
+    live_agent_orb.main()
+
+
+def cmd_scan(args):
+    import logging
+    import orb_scanner
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
+    orb_scanner.main(args.rest)
+
+
+def cmd_lookup(args):
+    from utils.instrument_index import InstrumentIndex
+    rows = InstrumentIndex(args.csv).search(args.term, args.exchange, args.type, args.limit)
+    if not rows:
+        print(f"No instruments found for '{args.term}'")
+        return 1
+    for row in rows:
+        expiry = f"  expiry {row['expiry'][:10]}" if row['expiry'] else ""
+        print(f"{row['tradingsymbol']:<28} {row['instrument_key']:<28} {row['exchange']:<8} {row['instrument_type'] or '':<6} "
+              f"lot {row['lot_size'] or '-':<6}{expiry}")
+
+
+def cmd_bench(args):
+    """Times fresh interpreter starts of `--help` and `lookup` and checks no heavy module is imported."""
+    import statistics
+    import subprocess
+    import time
+    script = os.path.abspath(__file__)
+    cases = [['--help']]
+    if os.path.exists(args.csv):
+        cases.append(['lookup', args.term, '--csv', args.csv])
+        subprocess.run([sys.executable, script, *cases[-1]], capture_output=True) # Build the index outside the timing
+    else:
+        print(f"{args.csv} not found; timing --help only")
+
+    baseline = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        baseline.append(1000 * (time.perf_counter() - started))
+    print(f"{'(bare interpreter start)':<40} median {statistics.median(baseline):6.1f} ms")
+
+    failed = False
+    for case in cases:
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, script, *case], capture_output=True, check=True)
+            timings.append(1000 * (time.perf_counter() - started))
+        imported = subprocess.run([sys.executable, '-X', 'importtime', script, *case], capture_output=True, text=True).stderr
+        heavy = sorted({name for name in HEAVY_MODULES if f" {name}\n" in imported})
+        median = statistics.median(timings)
+        ok = median <= args.budget_ms and not heavy
+        failed |= not ok
+        print(f"{' '.join(case):<40} median {median:6.1f} ms  min {min(timings):6.1f} ms  "
+              f"{'heavy imports: ' + ', '.join(heavy) if heavy else 'no heavy imports'}  {'OK' if ok else 'FAIL'}")
+    return 1 if failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="aita", description="AITA-01 research and trading tools")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    fetch = commands.add_parser('fetch', help="download 1-minute history for the portfolio symbols")
+    fetch.add_argument('--symbol', action='append', help="only this symbol (repeatable)")
+    fetch.set_defaults(handler=cmd_fetch)
+
+    for name, handler, text in (('backtest', cmd_backtest, "run the portfolio ORB backtest"),
+                                ('optimize', cmd_optimize, "parameter sweep on local worker processes (sweep_cluster.py)"),
+                                ('scan', cmd_scan, "universe-wide ORB scanner")):
+        # Everything after the subcommand (including --help) goes to the underlying tool
+        command = commands.add_parser(name, help=text, add_help=False)
+        command.set_defaults(handler=handler, passthrough=True)
+
+    live = commands.add_parser('live', help="run the live ORB agent")
+    live.set_defaults(handler=cmd_live)
+
+    lookup = commands.add_parser('lookup', help="search instruments by key, trading symbol or name prefix")
+    lookup.add_argument('term')
+    lookup.add_argument('--exchange')
+    lookup.add_argument('--type', help="instrument type, e.g. EQ, FUT, CE")
+    lookup.add_argument('--limit', type=int, default=20)
+    lookup.add_argument('--csv', default="upstox_complete_instruments.csv")
+    lookup.set_defaults(handler=cmd_lookup)
+
+    bench = commands.add_parser('bench', help=f"check that --help and lookup start within {STARTUP_BUDGET_MS:.0f} ms")
+    bench.add_argument('--runs', type=int, default=10)
+    bench.add_argument('--term', default="HDFCBANK")
+    bench.add_argument('--csv', default="upstox_complete_instruments.csv")
+    bench.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS)
+    bench.set_defaults(handler=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+    if rest and not getattr(args, 'passthrough', False):
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+    args.rest = rest
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
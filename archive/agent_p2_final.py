@@ -6,10 +6,10 @@ from datetime import datetime
 from dotenv import load_dotenv
 import json
 import pandas as pd
-import pandas_ta as ta
 import upstox_client
 from upstox_client.api import history_api
 from upstox_client.rest import ApiException
+from strategies import VwapCrossStrategy
 
 # (Logger and API Configuration is the same as before)
 # --- Load .env and Set up Logger ---
@@ -27,8 +27,13 @@ api_instance = history_api.HistoryApi(api_client)
 # --- Agent Configuration ---
 VOLUME_AVG_PERIOD = 20
 VOLUME_FACTOR = 1.5
+TREND_PERIOD = 50
 STATUS_FILE = "status.json"
 
+# The same VwapCrossStrategy the V2 backtests run (strategy_logic.run_v2_strategy), fed one candle at a time
+strategy = VwapCrossStrategy(VOLUME_AVG_PERIOD, VOLUME_FACTOR, TREND_PERIOD).stream()
+last_candle_time = None
+
 # --- Main Agent Loop ---
 while True:
     try:
@@ -44,50 +49,34 @@ while True:
             api_version="v2"
         )
         
-        candles = api_response.data.candles
-        df = pd.DataFrame(candles, columns=['timestamp_text', 'open', 'high', 'low', 'close', 'volume', 'oi'])
-        df['timestamp'] = pd.to_datetime(df['timestamp_text']).dt.tz_convert('Asia/Kolkata')
-        df = df.sort_values(by='timestamp')
-        df.set_index('timestamp', inplace=True)
-        
-        df.ta.vwap(append=True)
-        df.ta.sma(close=df['volume'], length=VOLUME_AVG_PERIOD, append=True)
-        
-        latest_data = df.iloc[-1]
-        latest_time = latest_data.name.strftime('%Y-%m-%d %H:%M:%S')
-        logger.info(f"Latest Data: Time: {latest_time}, Close: {latest_data['close']}, VWAP: {latest_data['VWAP_D']:.2f}")
+        # Only candles the strategy has not seen yet (the timestamps are ISO strings with the same offset)
+        candles = sorted(api_response.data.candles, key=lambda candle: candle[0])
+        new_candles = [candle for candle in candles if last_candle_time is None or candle[0] > last_candle_time]
+        if not new_candles:
+            continue
+        for candle in new_candles:
+            final_signal = strategy.update(*candle[:6])
+        last_candle_time = new_candles[-1][0]
+
+        current_bar = strategy.values
+        latest_time = pd.Timestamp(last_candle_time).strftime('%Y-%m-%d %H:%M:%S')
+        logger.info(f"Latest Data: Time: {latest_time}, Close: {current_bar['close']}, VWAP: {current_bar['vwap']:.2f}")
 
-        if len(df) > VOLUME_AVG_PERIOD:
-            previous_bar = df.iloc[-2]
-            current_bar = df.iloc[-1]
-            
-            # --- Specialist Agent Opinions ---
-            # 1. Crossover Agent
-            is_bullish_crossover = previous_bar['close'] < previous_bar['VWAP_D'] and current_bar['close'] > current_bar['VWAP_D']
-            is_bearish_crossover = previous_bar['close'] > previous_bar['VWAP_D'] and current_bar['close'] < current_bar['VWAP_D']
-            
-            # 2. Volume Agent
-            average_volume = previous_bar[f'SMA_{VOLUME_AVG_PERIOD}']
-            is_volume_strong = current_bar['volume'] > (average_volume * VOLUME_FACTOR)
+        # --- Specialist Agent Opinions (the strategy's own state for the latest candle) ---
+        is_bullish_crossover = current_bar['previous_close'] < current_bar['previous_vwap'] and current_bar['close'] > current_bar['vwap']
+        is_bearish_crossover = current_bar['previous_close'] > current_bar['previous_vwap'] and current_bar['close'] < current_bar['vwap']
+        is_volume_strong = current_bar['volume'] > current_bar['previous_volume_sma'] * VOLUME_FACTOR
 
-            # --- Master Agent Logic ---
-            # The Master Agent makes the final decision based on a simple rulebook.
-            final_signal = "HOLD" # Default decision is to do nothing.
+        # --- Master Agent Logic: the strategy's signal ---
+        logger.info(f"Crossover Opinion: {'BULLISH' if is_bullish_crossover else ('BEARISH' if is_bearish_crossover else 'HOLD')}, "
+                    f"Volume Opinion: {'STRONG' if is_volume_strong else 'WEAK'}")
+        logger.info(f"----> MASTER AGENT FINAL DECISION: {final_signal} <----")
 
-            if is_bullish_crossover and is_volume_strong:
-                final_signal = "BUY"
-            elif is_bearish_crossover and is_volume_strong:
-                final_signal = "SELL"
-            
-            logger.info(f"Crossover Opinion: {'BULLISH' if is_bullish_crossover else ('BEARISH' if is_bearish_crossover else 'HOLD')}, "
-                        f"Volume Opinion: {'STRONG' if is_volume_strong else 'WEAK'}")
-            logger.info(f"----> MASTER AGENT FINAL DECISION: {final_signal} <----")
-            # --- NEW: Save Status to File ---
         # Create a dictionary with the latest status
         status = {
             'timestamp': latest_time,
             'close_price': current_bar['close'],
-            'vwap': current_bar['VWAP_D'],
+            'vwap': current_bar['vwap'],
             'crossover_opinion': 'BULLISH' if is_bullish_crossover else ('BEARISH' if is_bearish_crossover else 'HOLD'),
             'volume_opinion': 'STRONG' if is_volume_strong else 'WEAK',
             'master_decision': final_signal
@@ -2,12 +2,14 @@
 import pandas as pd
 import logging
 import sys
+from backtest_profiler import profiler_from_args
 from strategy_logic import run_orb_strategy, calculate_performance_with_exits
 
 # (Logger and Configuration are the same as before)
 # --- Set up Logger ---
 logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
+profiler = profiler_from_args("phase3_backtest_orb") # --profile for per-stage timing
 
 # --- Configuration ---
 HISTORICAL_DATA_FILE = "reliance_1m_data_2024_2025.csv"
@@ -20,19 +22,23 @@ TAKE_PROFIT_PERCENT = 0.04
 # --- BACKTESTING ENGINE ---
 if __name__ == "__main__":
     try:
-        df_history = pd.read_csv(HISTORICAL_DATA_FILE)
-        df_history['timestamp'] = pd.to_datetime(df_history['timestamp_text'])
-        df_history = df_history.sort_values(by='timestamp').set_index('timestamp')
+        with profiler.stage("read_csv"):
+            df_history = pd.read_csv(HISTORICAL_DATA_FILE)
+        with profiler.stage("to_datetime"):
+            df_history['timestamp'] = pd.to_datetime(df_history['timestamp_text'])
+            df_history = df_history.sort_values(by='timestamp').set_index('timestamp')
         logger.info(f"Loaded {len(df_history)} rows of historical data.")
 
         # --- Call the NEW Opening Range Breakout strategy brain ---
-        signals = run_orb_strategy(df_history, range_minutes=30)
-        df_history['signal'] = signals
+        with profiler.stage("signals"):
+            signals = run_orb_strategy(df_history, range_minutes=30)
+            df_history['signal'] = signals
 
-        ending_cash, df_trades = calculate_performance_with_exits(
-            df_history, STARTING_CASH, BROKERAGE_PER_TRADE, 
-            SLIPPAGE_PERCENT, STOP_LOSS_PERCENT, TAKE_PROFIT_PERCENT
-        )
+        with profiler.stage("performance"):
+            ending_cash, df_trades = calculate_performance_with_exits(
+                df_history, STARTING_CASH, BROKERAGE_PER_TRADE, 
+                SLIPPAGE_PERCENT, STOP_LOSS_PERCENT, TAKE_PROFIT_PERCENT
+            )
 
         # --- Performance Analysis ---
         logger.info("--- Backtest Finished for ORB Strategy ---")
@@ -53,5 +59,8 @@ if __name__ == "__main__":
         print(df_trades['exit_reason'].value_counts())
         logger.info("--------------------------------\n")
 
+        profiler.log_summary(logger)
+        profiler.write()
+
     except Exception as e:
         logger.error(f"An error occurred: {e}", exc_info=True)
\ No newline at end of file
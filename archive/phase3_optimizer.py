@@ -2,11 +2,16 @@
 import pandas as pd
 import logging
 import sys
+from backtest_profiler import profiler_from_args
 from strategy_logic import run_v2_strategy, calculate_performance_with_exits
+from performance_analytics import compute_performance_metrics, summarize_sweep
+from results_store import ResultsStore, code_version
 
 # --- Set up Logger ---
 logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
+profiler = profiler_from_args("phase3_optimizer") # --profile for per-stage timing
+results_store = ResultsStore() # Combinations already run on identical data/code are read back instead of re-run
 
 # --- Configuration ---
 HISTORICAL_DATA_FILE = "reliance_1m_data_2024_2025.csv"
@@ -23,9 +28,14 @@ trend_periods_to_test = [50, 100] # Our new parameter to test
 
 # --- Main Optimizer Logic ---
 try:
-    df_history = pd.read_csv(HISTORICAL_DATA_FILE)
-    df_history['timestamp'] = pd.to_datetime(df_history['timestamp_text'])
-    df_history = df_history.sort_values(by='timestamp').set_index('timestamp')
+    engine_version = code_version()
+    data_version = results_store.data_fingerprint(HISTORICAL_DATA_FILE)
+    sweep_id = results_store.start_sweep("phase3_optimizer", engine_version)
+    with profiler.stage("read_csv"):
+        df_history = pd.read_csv(HISTORICAL_DATA_FILE)
+    with profiler.stage("to_datetime"):
+        df_history['timestamp'] = pd.to_datetime(df_history['timestamp_text'])
+        df_history = df_history.sort_values(by='timestamp').set_index('timestamp')
     logger.info(f"Loaded {len(df_history)} rows of historical data.")
     
     results = []
@@ -34,35 +44,46 @@ try:
     for trend_period in trend_periods_to_test:
         for vol_period in volume_periods_to_test:
             for vol_factor in volume_factors_to_test:
+                labels = {'trend_period': trend_period, 'vol_period': vol_period, 'vol_factor': vol_factor}
+                run_params = {**labels, 'stop_loss_pct': STOP_LOSS_PERCENT, 'take_profit_pct': TAKE_PROFIT_PERCENT,
+                              'slippage_pct': SLIPPAGE_PERCENT, 'brokerage': BROKERAGE_PER_TRADE, 'starting_cash': STARTING_CASH}
+                previous = results_store.find_run(
+                    results_store.run_fingerprint("v2", "RELIANCE", run_params, data_version, engine_version), sweep_id)
+                if previous:
+                    results.append({'labels': labels, 'metrics': previous[1]})
+                    logger.info(f"Skipped TP={trend_period}, VP={vol_period}, VF={vol_factor}: already recorded as run {previous[0]}")
+                    continue
+
+                with profiler.stage("signals"):
+                    signals = run_v2_strategy(df_history, 
+                                              volume_period=vol_period, 
+                                              volume_factor=vol_factor, 
+                                              trend_period=trend_period)
+                    df_history['signal'] = signals
                 
-                signals = run_v2_strategy(df_history, 
-                                          volume_period=vol_period, 
-                                          volume_factor=vol_factor, 
-                                          trend_period=trend_period)
-                df_history['signal'] = signals
-                
-                ending_cash, df_trades = calculate_performance_with_exits(
-                    df_history, STARTING_CASH, BROKERAGE_PER_TRADE, 
-                    SLIPPAGE_PERCENT, STOP_LOSS_PERCENT, TAKE_PROFIT_PERCENT
-                )
+                with profiler.stage("performance"):
+                    ending_cash, df_trades = calculate_performance_with_exits(
+                        df_history, STARTING_CASH, BROKERAGE_PER_TRADE, 
+                        SLIPPAGE_PERCENT, STOP_LOSS_PERCENT, TAKE_PROFIT_PERCENT
+                    )
                 
+                with profiler.stage("analytics"):
+                    metrics, _, _, _ = compute_performance_metrics(df_history, df_trades, STARTING_CASH, BROKERAGE_PER_TRADE)
+                results.append({'labels': labels, 'metrics': metrics})
+                results_store.record_run(sweep_id, "v2", "RELIANCE", run_params, data_version, engine_version, metrics, df_trades)
                 pnl = ending_cash - STARTING_CASH
-                results.append({
-                    'trend_period': trend_period, 
-                    'vol_period': vol_period, 
-                    'vol_factor': vol_factor, 
-                    'pnl': pnl,
-                    'win_rate': (len(df_trades[df_trades['profit'] > 0]) / len(df_trades) * 100) if len(df_trades) > 0 else 0,
-                    'num_trades': len(df_trades)
-                })
                 logger.info(f"Finished run for TP={trend_period}, VP={vol_period}, VF={vol_factor}. P&L: Rs.{pnl:,.2f}")
 
     logger.info("\n--- V2 OPTIMIZATION COMPLETE ---")
-    results_df = pd.DataFrame(results)
+    results_df = summarize_sweep(results)
+    results_df['pnl'] = results_df['ending_equity'] - STARTING_CASH
     ranked_results = results_df.sort_values(by='pnl', ascending=False)
     
     print("Top Performing Parameter Sets for Agent V2.0:")
     print(ranked_results.head(10))
 
+    profiler.log_summary(logger)
+    profiler.write()
+
 except Exception as e:
     logger.error(f"An error occurred: {e}", exc_info=True)
\ No newline at end of file
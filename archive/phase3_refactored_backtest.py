@@ -1,12 +1,14 @@
 import pandas as pd
 import logging
 import sys
+from backtest_profiler import profiler_from_args
 from strategy_logic import run_v2_strategy, calculate_performance_with_exits # <- Updated import
 
 # (Configuration is the same as before)
 # --- Set up Logger ---
 logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
+profiler = profiler_from_args("phase3_refactored_backtest") # --profile for per-stage timing
 
 # --- Configuration ---
 HISTORICAL_DATA_FILE = "reliance_1m_data_2024_2025.csv"
@@ -19,19 +21,23 @@ TAKE_PROFIT_PERCENT = 0.04
 # --- BACKTESTING ENGINE ---
 if __name__ == "__main__":
     try:
-        df_history = pd.read_csv(HISTORICAL_DATA_FILE)
-        df_history['timestamp'] = pd.to_datetime(df_history['timestamp_text'])
-        df_history = df_history.sort_values(by='timestamp').set_index('timestamp')
+        with profiler.stage("read_csv"):
+            df_history = pd.read_csv(HISTORICAL_DATA_FILE)
+        with profiler.stage("to_datetime"):
+            df_history['timestamp'] = pd.to_datetime(df_history['timestamp_text'])
+            df_history = df_history.sort_values(by='timestamp').set_index('timestamp')
         logger.info(f"Loaded {len(df_history)} rows of historical data.")
 
         # --- Call the new V2 strategy brain ---
-        signals = run_v2_strategy(df_history, volume_period=20, volume_factor=1.5, trend_period=50)
-        df_history['signal'] = signals
+        with profiler.stage("signals"):
+            signals = run_v2_strategy(df_history, volume_period=20, volume_factor=1.5, trend_period=50)
+            df_history['signal'] = signals
 
-        ending_cash, df_trades = calculate_performance_with_exits(
-            df_history, STARTING_CASH, BROKERAGE_PER_TRADE, 
-            SLIPPAGE_PERCENT, STOP_LOSS_PERCENT, TAKE_PROFIT_PERCENT
-        )
+        with profiler.stage("performance"):
+            ending_cash, df_trades = calculate_performance_with_exits(
+                df_history, STARTING_CASH, BROKERAGE_PER_TRADE, 
+                SLIPPAGE_PERCENT, STOP_LOSS_PERCENT, TAKE_PROFIT_PERCENT
+            )
 
         # (Performance Analysis section is the same as before)
         # ...
@@ -52,5 +58,8 @@ if __name__ == "__main__":
         print(df_trades['exit_reason'].value_counts())
         logger.info("--------------------------------\n")
 
+        profiler.log_summary(logger)
+        profiler.write()
+
     except Exception as e:
         logger.error(f"An error occurred: {e}", exc_info=True)
\ No newline at end of file
@@ -0,0 +1,122 @@
+# FILE: backtest_profiler.py
+"""
+Per-stage profiling for the backtest scripts. Each `with profiler.stage("read_csv", symbol)` block
+records wall time, CPU time and peak memory allocated inside it. The run writes a JSON report plus a
+folded-stack file (stage hierarchy weighted by wall-time microseconds) that flamegraph.pl,
+speedscope or inferno can render directly; with cProfile enabled a .prof file is written as well.
+
+Enable it with `--profile` on the command line or AITA_PROFILE=1 in the environment.
+"""
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PROFILE_ENV = "AITA_PROFILE"
+REPORT_FILE = "profile_report.json"
+FOLDED_FILE = "profile.folded"
+CPROFILE_FILE = "profile.prof"
+
+
+class StageProfiler:
+    def __init__(self, enabled=True, run_name="backtest", use_cprofile=False):
+        self.enabled = enabled
+        self.run_name = run_name
+        self.records = []
+        self._stack = []
+        self._cprofile = cProfile.Profile() if enabled and use_cprofile else None
+        if enabled:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            if self._cprofile:
+                self._cprofile.enable()
+
+    @contextmanager
+    def stage(self, name, symbol=None):
+        """Times one stage; stages may be nested (e.g. a symbol containing read_csv and signals)."""
+        if not self.enabled:
+            yield
+            return
+
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+        inherited = next((frame['symbol'] for frame in self._stack if frame['symbol']), None)
+        # Folded frames show a symbol once, where it is first introduced: run;HDFCBANK;symbol;read_csv
+        parent_frames = self._stack[-1]['frames'] if self._stack else [self.run_name]
+        frames = parent_frames + ([symbol] if symbol and symbol != inherited else []) + [name]
+        entry = {'name': name, 'symbol': symbol or inherited, 'base': current, 'peak': current,
+                 'path': [frame['name'] for frame in self._stack] + [name], 'frames': frames,
+                 'parent': ';'.join(parent_frames) if self._stack else None}
+        self._stack.append(entry)
+        wall_started, cpu_started = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall_started, time.process_time() - cpu_started
+            entry['peak'] = max(entry['peak'], tracemalloc.get_traced_memory()[1])
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], entry['peak'])
+            self.records.append({
+                'stage': name,
+                'symbol': entry['symbol'],
+                'stack': ';'.join(frames),
+                'parent_stack': entry['parent'],
+                'path': ';'.join(entry['path']),
+                'wall_seconds': wall,
+                'cpu_seconds': cpu,
+                'peak_alloc_mb': (entry['peak'] - entry['base']) / 1024 ** 2,
+            })
+
+    def summary(self):
+        """Totals per stage name, slowest first."""
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record['stage'], {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'peak_alloc_mb': 0.0})
+            total['calls'] += 1
+            total['wall_seconds'] += record['wall_seconds']
+            total['cpu_seconds'] += record['cpu_seconds']
+            total['peak_alloc_mb'] = max(total['peak_alloc_mb'], record['peak_alloc_mb'])
+        return dict(sorted(totals.items(), key=lambda item: -item[1]['wall_seconds']))
+
+    def folded_stacks(self):
+        """Self wall time per stage path in microseconds, in the folded format flame-graph tools read."""
+        self_time = {}
+        for record in self.records:
+            self_time[record['stack']] = self_time.get(record['stack'], 0.0) + record['wall_seconds']
+            if record['parent_stack']:
+                self_time[record['parent_stack']] = self_time.get(record['parent_stack'], 0.0) - record['wall_seconds']
+        return [f"{stack} {max(int(seconds * 1e6), 0)}" for stack, seconds in self_time.items()]
+
+    def write(self, report_path=REPORT_FILE, folded_path=FOLDED_FILE, cprofile_path=CPROFILE_FILE):
+        """Writes the JSON report and the folded stacks (and the cProfile dump when enabled)."""
+        if not self.enabled:
+            return None
+        if self._cprofile:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(cprofile_path)
+        with open(report_path, 'w') as f:
+            json.dump({'run': self.run_name, 'stages': self.summary(), 'records': self.records}, f, indent=2)
+        with open(folded_path, 'w') as f:
+            f.write("\n".join(self.folded_stacks()) + "\n")
+        return report_path
+
+    def log_summary(self, logger):
+        if not self.enabled:
+            return
+        logger.info("--- PROFILE (per stage, slowest first) ---")
+        for stage, total in self.summary().items():
+            logger.info(f"{stage:<22} calls={total['calls']:<4} wall={total['wall_seconds']:8.3f}s "
+                        f"cpu={total['cpu_seconds']:8.3f}s peak_alloc={total['peak_alloc_mb']:8.1f} MB")
+
+
+def profiler_from_args(run_name, argv=None):
+    """Builds a profiler that is enabled by --profile (add --cprofile for a function-level dump) or AITA_PROFILE=1."""
+    argv = sys.argv if argv is None else argv
+    enabled = "--profile" in argv or os.getenv(PROFILE_ENV, "") not in ("", "0")
+    return StageProfiler(enabled=enabled, run_name=run_name, use_cprofile="--cprofile" in argv)
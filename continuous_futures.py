@@ -0,0 +1,264 @@
+# FILE: continuous_futures.py
+"""
+Continuous futures series: resolves a root symbol's expiry chain from the cached instrument master,
+fetches and stores each contract's 1-minute candles as its own segment, and stitches the segments at
+the roll points into one series. The manifest remembers every contract ever seen (the master only
+lists live ones), so the chain keeps growing across rolls.
+
+Roll rules:  'expiry'  roll `roll_days` trading days before the front contract expires
+             'volume'  roll on the first day the next contract trades more volume (never later than 'expiry')
+Back-adjustment is applied lazily at load from the roll gaps in the manifest:
+             'difference'  earlier segments shifted by the price gap at each roll (keeps point P&L)
+             'ratio'       earlier segments scaled by the price ratio at each roll (keeps % returns)
+             None          raw stitched prices
+
+A re-sync after the next roll only fetches the days the stored segments don't have yet: the
+front contract's latest sessions and the new contract's segment.
+
+    python continuous_futures.py GOLDM MCX_FO
+"""
+import json
+import logging
+import os
+import sys
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from market_calendar import NSE_CALENDAR, EXCHANGE_TZ
+from utils.instrument_master import InstrumentMaster
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = "futures_cache"
+MANIFEST_FILE = "manifest.json"
+ROLL_DAYS_BEFORE_EXPIRY = 2
+OVERLAP_DAYS = 10 # calendar days of the next contract fetched before the front one expires (for volume rolls and the roll gap)
+CANDLE_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'oi']
+
+
+def trading_days(exchange, start, end):
+    """Session days for an exchange: the NSE calendar for NSE/BSE derivatives, weekdays for MCX."""
+    if exchange.startswith('MCX'):
+        return [start + timedelta(days=k) for k in range((end - start).days + 1) if (start + timedelta(days=k)).weekday() < 5]
+    return NSE_CALENDAR.trading_days(start, end)
+
+
+def candles_to_arrays(candles):
+    """Upstox candle lists ([timestamp, o, h, l, c, volume, oi]) to sorted (UTC ns, {column: array})."""
+    if not candles:
+        return np.empty(0, dtype=np.int64), {column: np.empty(0) for column in CANDLE_COLUMNS}
+    frame = pd.DataFrame(candles, columns=['timestamp'] + CANDLE_COLUMNS)
+    ns = pd.DatetimeIndex(pd.to_datetime(frame['timestamp'], format='ISO8601')).tz_convert('UTC').as_unit('ns').asi8
+    order = np.argsort(ns, kind='stable')
+    return ns[order], {column: frame[column].to_numpy(dtype=np.float64)[order] for column in CANDLE_COLUMNS}
+
+
+class ContinuousFuture:
+    def __init__(self, symbol, exchange, fetch_day, master=None, cache_dir=CACHE_DIR,
+                 roll_rule='expiry', roll_days=ROLL_DAYS_BEFORE_EXPIRY):
+        """
+        fetch_day(instrument_key, day) returns that session's candles (e.g. through utils.candle_cache), [] when
+        the exchange has none for it, or None when the request failed and the day must be fetched again.
+        """
+        if roll_rule not in ('expiry', 'volume'):
+            raise ValueError(f"Unknown roll rule {roll_rule!r}; expected 'expiry' or 'volume'.")
+        self.symbol = symbol
+        self.exchange = exchange
+        self.fetch_day = fetch_day
+        self.master = master or InstrumentMaster()
+        self.roll_rule = roll_rule
+        self.roll_days = roll_days
+        self.directory = os.path.join(cache_dir, f"{exchange}_{symbol}")
+        self.manifest_path = os.path.join(self.directory, MANIFEST_FILE)
+
+    # --- Manifest and segments ---
+    def read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'symbol': self.symbol, 'exchange': self.exchange, 'contracts': [], 'rolls': []}
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(f"{self.manifest_path}.tmp", 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(f"{self.manifest_path}.tmp", self.manifest_path)
+
+    def _segment_path(self, contract):
+        return os.path.join(self.directory, contract['instrument_key'].replace('|', '_') + ".npz")
+
+    def read_segment(self, contract):
+        try:
+            with np.load(self._segment_path(contract)) as data:
+                return data['timestamp'], {column: data[column] for column in CANDLE_COLUMNS}
+        except OSError:
+            return candles_to_arrays([])
+
+    def _append_segment(self, contract, ns, columns):
+        old_ns, old_columns = self.read_segment(contract)
+        merged_ns = np.concatenate([old_ns, ns])
+        order = np.argsort(merged_ns, kind='stable')
+        merged_ns = merged_ns[order]
+        # A re-fetched session (e.g. yesterday's partial day) replaces the stored bars
+        newest = np.r_[merged_ns[1:] != merged_ns[:-1], True]
+        merged = {column: np.concatenate([old_columns[column], columns[column]])[order][newest] for column in CANDLE_COLUMNS}
+        os.makedirs(self.directory, exist_ok=True)
+        np.savez(self._segment_path(contract), timestamp=merged_ns[newest], **merged)
+
+    # --- Chain, fetch and rolls ---
+    def resolve_chain(self, manifest):
+        """Contracts already in the manifest plus any new ones the instrument master lists, by expiry."""
+        known = {contract['instrument_key']: contract for contract in manifest['contracts']}
+        for row in self.master.futures_chain(self.symbol, self.exchange).itertuples():
+            known.setdefault(row.instrument_key, {'instrument_key': row.instrument_key, 'tradingsymbol': row.tradingsymbol,
+                                                  'expiry': str(row.expiry.date()), 'fetched_through': None})
+        return sorted(known.values(), key=lambda contract: contract['expiry'])
+
+    def sync(self, today=None):
+        """Fetches every session the stored segments are missing, recomputes the rolls and returns the manifest."""
+        today = today or date.today()
+        manifest = self.read_manifest()
+        chain = self.resolve_chain(manifest)
+
+        for position, contract in enumerate(chain):
+            expiry = date.fromisoformat(contract['expiry'])
+            if position == 0:
+                window_start = expiry - timedelta(days=45)
+            else:
+                window_start = date.fromisoformat(chain[position - 1]['expiry']) - timedelta(days=OVERLAP_DAYS)
+            fetched = contract['fetched_through']
+            first = max(window_start, date.fromisoformat(fetched) + timedelta(days=1)) if fetched else window_start
+            last = min(expiry, today)
+            if first > last:
+                continue
+
+            candles = []
+            first_failed = None
+            for day in trading_days(self.exchange, first, last):
+                day_candles = self.fetch_day(contract['instrument_key'], day)
+                if day_candles is None:
+                    first_failed = first_failed or day
+                    continue
+                candles.extend(day_candles)
+            ns, columns = candles_to_arrays(candles)
+            if len(ns):
+                self._append_segment(contract, ns, columns)
+            # Failed days and today's still-forming session are fetched again next time
+            through = first_failed - timedelta(days=1) if first_failed else last
+            contract['fetched_through'] = str(min(through, today - timedelta(days=1)))
+            logger.info(f"{contract['tradingsymbol']}: fetched {len(ns)} bars for {first} .. {last}")
+
+        manifest['contracts'] = chain
+        manifest['roll_rule'] = {'rule': self.roll_rule, 'roll_days': self.roll_days}
+        manifest['rolls'] = self.compute_rolls(chain)
+        self._write_manifest(manifest)
+        return manifest
+
+    def _daily_volume(self, contract):
+        ns, columns = self.read_segment(contract)
+        days = pd.DatetimeIndex(ns).tz_localize('UTC').tz_convert(EXCHANGE_TZ).normalize()
+        return pd.Series(columns['volume'], index=days).groupby(level=0).sum()
+
+    def compute_rolls(self, chain):
+        """Roll time between each pair of consecutive contracts plus the price gap and ratio at that roll."""
+        rolls = []
+        for front, following in zip(chain[:-1], chain[1:]):
+            front_ns, front_columns = self.read_segment(front)
+            next_ns, next_columns = self.read_segment(following)
+            if not len(front_ns) or not len(next_ns):
+                break
+            expiry = date.fromisoformat(front['expiry'])
+            sessions = [day for day in trading_days(self.exchange, expiry - timedelta(days=OVERLAP_DAYS + 10), expiry) if day <= expiry]
+            roll_day = sessions[max(len(sessions) - 1 - self.roll_days, 0)]
+            if self.roll_rule == 'volume':
+                front_volume, next_volume = self._daily_volume(front), self._daily_volume(following)
+                overlap = next_volume.index.intersection(front_volume.index)
+                ahead = overlap[(next_volume[overlap] > front_volume[overlap]).to_numpy()]
+                if len(ahead) and ahead[0].date() < roll_day:
+                    roll_day = ahead[0].date()
+
+            roll_ns = int(pd.Timestamp(roll_day).tz_localize(EXCHANGE_TZ).tz_convert('UTC').value)
+            # Gap measured on the last bar both contracts printed before the roll
+            common = np.intersect1d(front_ns[front_ns < roll_ns], next_ns[next_ns < roll_ns])
+            if len(common):
+                at = common[-1]
+                front_close = front_columns['close'][np.searchsorted(front_ns, at)]
+                next_close = next_columns['close'][np.searchsorted(next_ns, at)]
+            else:
+                front_close = front_columns['close'][max(np.searchsorted(front_ns, roll_ns) - 1, 0)]
+                next_close = next_columns['open'][min(np.searchsorted(next_ns, roll_ns), len(next_ns) - 1)]
+            rolls.append({'from': front['instrument_key'], 'to': following['instrument_key'], 'roll_ns': roll_ns,
+                          'roll_day': str(roll_day), 'gap': float(next_close - front_close), 'ratio': float(next_close / front_close)})
+        return rolls
+
+    # --- Stitched, lazily adjusted view ---
+    def load(self, adjustment='difference', manifest=None):
+        """The continuous series with a 'contract' column; adjustment is 'difference', 'ratio' or None."""
+        manifest = manifest or self.read_manifest()
+        rolls = manifest['rolls']
+        contracts = manifest['contracts'][:len(rolls) + 1]
+        bounds = [-np.inf] + [roll['roll_ns'] for roll in rolls] + [np.inf]
+        # Segment j absorbs every roll after it: the sum of the later gaps, or the product of the later ratios
+        gaps = np.array([roll['gap'] for roll in rolls])
+        ratios = np.array([roll['ratio'] for roll in rolls])
+        offsets = np.r_[np.cumsum(gaps[::-1])[::-1], 0.0]
+        factors = np.r_[np.cumprod(ratios[::-1])[::-1], 1.0]
+
+        frames = []
+        for position, contract in enumerate(contracts):
+            ns, columns = self.read_segment(contract)
+            keep = (ns >= bounds[position]) & (ns < bounds[position + 1])
+            segment = pd.DataFrame({column: values[keep] for column, values in columns.items()},
+                                   index=pd.DatetimeIndex(ns[keep], name='timestamp').tz_localize('UTC').tz_convert(EXCHANGE_TZ))
+            for column in ('open', 'high', 'low', 'close'):
+                if adjustment == 'difference':
+                    segment[column] += offsets[position]
+                elif adjustment == 'ratio':
+                    segment[column] *= factors[position]
+            segment['contract'] = contract['tradingsymbol']
+            frames.append(segment)
+        if not frames:
+            return pd.DataFrame(columns=CANDLE_COLUMNS + ['contract'])
+        return pd.concat(frames)
+
+
+def upstox_fetch_day():
+    """fetch_day backed by the Upstox historical API through the on-disk candle cache."""
+    import upstox_client
+    from dotenv import load_dotenv
+    from upstox_client.api import history_api
+    from upstox_client.rest import ApiException
+    from utils.candle_cache import CachedHistoryApi
+
+    load_dotenv()
+    api_config = upstox_client.Configuration()
+    api_config.access_token = os.getenv("UPSTOX_ACCESS_TOKEN")
+    api = CachedHistoryApi(history_api.HistoryApi(upstox_client.ApiClient(api_config)))
+
+    def fetch_day(instrument_key, day):
+        try:
+            response = api.get_historical_candle_data(instrument_key, "1minute", str(day), "v2")
+            return response.data.candles if response.data else []
+        except ApiException as e:
+            if e.status == 404:
+                return []
+            logger.error(f"API Exception for {instrument_key} on {day}: {e.reason}")
+            return None
+    return fetch_day
+
+
+# --- Build / refresh a continuous series ---
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
+    symbol = sys.argv[1] if len(sys.argv) > 1 else "GOLDM"
+    exchange = sys.argv[2] if len(sys.argv) > 2 else "MCX_FO"
+
+    series = ContinuousFuture(symbol, exchange, upstox_fetch_day())
+    manifest = series.sync()
+    for roll in manifest['rolls']:
+        logger.info(f"Roll {roll['roll_day']}: {roll['from']} -> {roll['to']}, gap {roll['gap']:+.2f} ({roll['ratio']:.5f}x)")
+    continuous = series.load('difference', manifest)
+    output_file = f"{symbol.lower()}_continuous_1m_data.csv"
+    continuous.to_csv(output_file)
+    logger.info(f"Saved {len(continuous)} back-adjusted bars across {continuous['contract'].nunique() if len(continuous) else 0} contracts to {output_file}")
@@ -0,0 +1,209 @@
+# FILE: corporate_actions.py
+"""
+Split, bonus and dividend adjustment for the stored candle series. Raw candles are cut into
+segments at every ex-date and cached as .npz files next to a manifest that holds each segment's
+cumulative price/volume factor; adjusted candles are produced at load time by multiplying each
+segment by its factor. When a new action arrives only the one segment containing its ex-date is
+split and rewritten - every other segment just gets a new factor in the manifest.
+
+Factors are backward (the latest prices stay as traded):
+    split a->b face value      price x b/a, volume x a/b
+    bonus a:b (a new per b)    price x b/(a+b), volume x (a+b)/b
+    dividend D                 price x (1 - D / last close before the ex-date), volume unchanged
+
+    python corporate_actions.py <data.csv> [SYMBOL]    # build/refresh the cache and show the adjustments
+"""
+import hashlib
+import json
+import logging
+import os
+import sys
+import numpy as np
+import pandas as pd
+from data_loader import PRICE_COLUMNS, COUNT_COLUMNS, load_candles, symbol_from_filename
+from market_calendar import EXCHANGE_TZ, IST_OFFSET_SECONDS
+
+logger = logging.getLogger(__name__)
+
+ACTIONS_FILE = "corporate_actions.json"
+CACHE_DIR = "adjusted_cache"
+MANIFEST_FILE = "manifest.json"
+ACTION_TYPES = ('SPLIT', 'BONUS', 'DIVIDEND')
+
+
+def load_actions(path=ACTIONS_FILE):
+    """Returns {symbol: [action, ...]} with each symbol's actions sorted by ex-date."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        actions = json.load(f)
+    return {symbol: sorted(entries, key=lambda action: action['ex_date']) for symbol, entries in actions.items()}
+
+
+def add_action(symbol, ex_date, action_type, value, path=ACTIONS_FILE):
+    """Records a new corporate action (value: dividend amount, or [a, b] for splits/bonuses) and returns all actions."""
+    if action_type not in ACTION_TYPES:
+        raise ValueError(f"Unknown action type {action_type!r}; expected one of {ACTION_TYPES}.")
+    actions = load_actions(path)
+    entry = {'ex_date': str(pd.Timestamp(ex_date).date()), 'type': action_type, 'value': value}
+    if entry not in actions.setdefault(symbol, []):
+        actions[symbol] = sorted(actions[symbol] + [entry], key=lambda action: action['ex_date'])
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(actions, f, indent=2)
+        os.replace(temp_path, path)
+    return actions
+
+
+def ex_date_ns(action):
+    """UTC epoch ns of the ex-date's local midnight: bars before it are adjusted, bars from it on are not."""
+    return int(np.datetime64(action['ex_date'], 'D').astype('datetime64[ns]').astype(np.int64)) - IST_OFFSET_SECONDS * 10**9
+
+
+def action_factors(action, close_before):
+    """(price factor, volume factor) of one action; close_before is the last raw close before its ex-date."""
+    if action['type'] == 'DIVIDEND':
+        if not close_before or close_before <= action['value']:
+            return 1.0, 1.0
+        return 1.0 - action['value'] / close_before, 1.0
+    a, b = action['value']
+    price_factor = b / a if action['type'] == 'SPLIT' else b / (a + b)
+    return price_factor, 1.0 / price_factor
+
+
+def actions_fingerprint(actions):
+    return hashlib.sha256(json.dumps(actions, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class AdjustedStore:
+    """Segment cache of one symbol's raw candles plus the factors that turn them into adjusted candles."""
+
+    def __init__(self, symbol, cache_dir=CACHE_DIR):
+        self.symbol = symbol
+        self.directory = os.path.join(cache_dir, symbol)
+        self.manifest_path = os.path.join(self.directory, MANIFEST_FILE)
+
+    # --- Manifest and segment files ---
+    def read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, manifest):
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def _write_segment(self, ns, columns):
+        name = f"segment_{ns[0]}_{ns[-1]}.npz"
+        np.savez(os.path.join(self.directory, name), timestamp=ns, **columns)
+        return {'file': name, 'start_ns': int(ns[0]), 'end_ns': int(ns[-1]), 'rows': len(ns), 'last_close': float(columns['close'][-1])}
+
+    def _read_segment(self, segment):
+        with np.load(os.path.join(self.directory, segment['file'])) as data:
+            return data['timestamp'], {column: data[column] for column in data.files if column != 'timestamp'}
+
+    def _split_into_segments(self, ns, columns, boundaries):
+        """Cuts sorted bars at each boundary (bars >= boundary go to the next segment) and writes the pieces."""
+        segments = []
+        cuts = np.searchsorted(ns, np.asarray(boundaries, dtype=np.int64), side='left')
+        for start, end in zip(np.r_[0, cuts], np.r_[cuts, len(ns)]):
+            if end > start:
+                segments.append(self._write_segment(ns[start:end], {column: values[start:end] for column, values in columns.items()}))
+        return segments
+
+    # --- Build / incremental update ---
+    def sync(self, raw_path, actions):
+        """
+        Brings the cache in line with the raw file and the symbol's actions. A changed raw file (or a
+        removed action) rebuilds everything; a new action only splits the segment holding its ex-date.
+        Returns the manifest.
+        """
+        stat = os.stat(raw_path)
+        source = {'path': os.path.abspath(raw_path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+        manifest = self.read_manifest()
+        boundaries = sorted({ex_date_ns(action) for action in actions})
+
+        if manifest is None or manifest['source'] != source or not set(manifest['boundaries']) <= set(boundaries):
+            os.makedirs(self.directory, exist_ok=True)
+            for name in os.listdir(self.directory):
+                if name.endswith('.npz'):
+                    os.remove(os.path.join(self.directory, name))
+            df = load_candles(raw_path, compact=False, symbol=self.symbol)
+            ns = df.index.tz_convert('UTC').as_unit('ns').asi8
+            columns = {column: df[column].to_numpy() for column in PRICE_COLUMNS + COUNT_COLUMNS}
+            segments = self._split_into_segments(ns, columns, boundaries)
+            logger.info(f"{self.symbol}: built {len(segments)} adjustment segments from {raw_path}")
+        else:
+            segments = manifest['segments']
+            for boundary in sorted(set(boundaries) - set(manifest['boundaries'])):
+                # Only the segment that straddles the new ex-date is rewritten
+                for position, segment in enumerate(segments):
+                    if segment['start_ns'] < boundary <= segment['end_ns']:
+                        ns, columns = self._read_segment(segment)
+                        pieces = self._split_into_segments(ns, columns, [boundary])
+                        os.remove(os.path.join(self.directory, segment['file']))
+                        segments = segments[:position] + pieces + segments[position + 1:]
+                        logger.info(f"{self.symbol}: split segment {segment['file']} at new ex-date")
+                        break
+
+        manifest = {'symbol': self.symbol, 'source': source, 'boundaries': boundaries,
+                    'actions_version': actions_fingerprint(actions),
+                    'segments': self._with_factors(segments, actions)}
+        self._write_manifest(manifest)
+        return manifest
+
+    @staticmethod
+    def _with_factors(segments, actions):
+        """Cumulative backward factors per segment: the product of every action with an ex-date after it."""
+        starts = np.array([segment['start_ns'] for segment in segments], dtype=np.int64)
+        price = np.ones(len(segments))
+        volume = np.ones(len(segments))
+        for action in actions:
+            boundary = ex_date_ns(action)
+            before = starts < boundary
+            previous = np.flatnonzero(before)
+            close_before = segments[previous[-1]]['last_close'] if len(previous) else None
+            price_factor, volume_factor = action_factors(action, close_before)
+            price[before] *= price_factor
+            volume[before] *= volume_factor
+        return [{**segment, 'price_factor': float(p), 'volume_factor': float(v)} for segment, p, v in zip(segments, price, volume)]
+
+    # --- Adjusted view ---
+    def load(self, manifest=None):
+        """Adjusted candles: each cached segment multiplied by its factors, indexed like load_candles."""
+        manifest = manifest or self.read_manifest()
+        timestamps, columns = [], {column: [] for column in PRICE_COLUMNS + COUNT_COLUMNS}
+        for segment in manifest['segments']:
+            ns, values = self._read_segment(segment)
+            timestamps.append(ns)
+            for column in PRICE_COLUMNS:
+                columns[column].append(values[column] * segment['price_factor'])
+            columns['volume'].append(np.rint(values['volume'] * segment['volume_factor']).astype(values['volume'].dtype))
+            columns['oi'].append(values['oi'])
+        index = pd.DatetimeIndex(np.concatenate(timestamps), name='timestamp').tz_localize('UTC').tz_convert(EXCHANGE_TZ)
+        return pd.DataFrame({column: np.concatenate(parts) for column, parts in columns.items()}, index=index)
+
+
+def load_adjusted_candles(path, symbol=None, actions_path=ACTIONS_FILE, cache_dir=CACHE_DIR):
+    """Candles adjusted for the symbol's corporate actions, served from (and kept in sync with) the segment cache."""
+    symbol = symbol or symbol_from_filename(path)
+    store = AdjustedStore(symbol, cache_dir)
+    manifest = store.sync(path, load_actions(actions_path).get(symbol, []))
+    return store.load(manifest)
+
+
+# --- Build the cache and show the adjustment ---
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
+    data_file = sys.argv[1] if len(sys.argv) > 1 else "reliance_2yr_1m_data.csv"
+    symbol = sys.argv[2] if len(sys.argv) > 2 else symbol_from_filename(data_file)
+
+    store = AdjustedStore(symbol)
+    manifest = store.sync(data_file, load_actions().get(symbol, []))
+    for segment in manifest['segments']:
+        start, end = (pd.Timestamp(segment[key], tz='UTC').tz_convert(EXCHANGE_TZ) for key in ('start_ns', 'end_ns'))
+        logger.info(f"{start:%Y-%m-%d} -> {end:%Y-%m-%d}: {segment['rows']:>7} bars, price x {segment['price_factor']:.6f}, volume x {segment['volume_factor']:.4f}")
@@ -0,0 +1,185 @@
+# FILE: data_quality.py
+"""
+Vectorized quality checks for stored 1-minute candles. One sweep per symbol flags every bar with a
+bitmask (duplicates, out-of-order rows, OHLC invariant violations, zero volume, outlier returns,
+bad prints, bars outside the exchange session) and counts missing minutes against the trading
+calendar, producing a per-day report. repair_candles turns the flags into a cleaned frame.
+
+    python data_quality.py [file.csv ...]     # report on the portfolio files (or the given ones)
+"""
+import logging
+import sys
+import time
+import numpy as np
+import pandas as pd
+from data_loader import PRICE_COLUMNS, symbol_from_filename
+from market_calendar import NSE_CALENDAR, IST_OFFSET_SECONDS, to_utc_ns
+
+logger = logging.getLogger(__name__)
+
+# --- Per-bar issue flags (bitmask in the quality_flags column) ---
+DUPLICATE = 1
+OUT_OF_ORDER = 2
+OHLC_VIOLATION = 4
+ZERO_VOLUME = 8
+OUTLIER_RETURN = 16
+BAD_PRINT = 32
+OFF_SESSION = 64
+FLAG_NAMES = {DUPLICATE: 'duplicates', OUT_OF_ORDER: 'out_of_order', OHLC_VIOLATION: 'ohlc_violations', ZERO_VOLUME: 'zero_volume',
+              OUTLIER_RETURN: 'outlier_returns', BAD_PRINT: 'bad_prints', OFF_SESSION: 'off_session'}
+
+OUTLIER_MADS = 15.0 # |return - median| beyond this many robust standard deviations is an outlier
+DAY_NS = 86400 * 10**9
+DEFAULT_FILES = ["reliance_2yr_1m_data.csv", "infy_2yr_1m_data.csv", "hdfcbank_2yr_1m_data.csv"]
+REPORT_FILE = "data_quality_report.csv"
+
+
+def read_raw_candles(path):
+    """Reads a candle CSV in file order (no sorting or de-duplication, so the checks see the file as stored)."""
+    df = pd.read_csv(path, usecols=['timestamp_text'] + PRICE_COLUMNS + ['volume'])
+    df.index = pd.DatetimeIndex(pd.to_datetime(df.pop('timestamp_text'), format='ISO8601'), name='timestamp')
+    return df
+
+
+def validate_candles(df, calendar=NSE_CALENDAR, outlier_mads=OUTLIER_MADS):
+    """
+    Checks one symbol's candles. Returns (checked, daily): `checked` is the frame stably sorted by time
+    with a quality_flags bitmask column, `daily` has one row per session day (including days with no
+    bars at all) with expected/present/missing bar counts and a count per issue type.
+    """
+    ns_raw = to_utc_ns(df.index)
+    n = len(ns_raw)
+    out_of_order = np.zeros(n, dtype=bool)
+    out_of_order[1:] = ns_raw[1:] < ns_raw[:-1]
+
+    order = np.argsort(ns_raw, kind='stable')
+    checked = df.iloc[order].copy()
+    ns = ns_raw[order]
+    o, h, l, c = (checked[column].to_numpy(dtype=np.float64) for column in PRICE_COLUMNS)
+    volume = checked['volume'].to_numpy(dtype=np.float64)
+    flags = np.zeros(n, dtype=np.int16)
+    flags[out_of_order[order]] |= OUT_OF_ORDER
+
+    # Later copies of a timestamp are the duplicates (the fetchers keep the first one)
+    duplicate = np.zeros(n, dtype=bool)
+    duplicate[1:] = ns[1:] == ns[:-1]
+    flags[duplicate] |= DUPLICATE
+
+    finite = np.isfinite(o) & np.isfinite(h) & np.isfinite(l) & np.isfinite(c)
+    with np.errstate(invalid='ignore'):
+        ohlc_bad = ~finite | (l <= 0) | (h < np.maximum(o, c)) | (l > np.minimum(o, c))
+        flags[ohlc_bad] |= OHLC_VIOLATION
+        flags[~(volume > 0)] |= ZERO_VOLUME
+
+    local_day = (ns + IST_OFFSET_SECONDS * 10**9) // DAY_NS
+    day_values = local_day.astype('datetime64[D]')
+    covered = (day_values >= np.datetime64(calendar.start)) & (day_values <= np.datetime64(calendar.end))
+    in_session = calendar.session_of_ns(ns) >= 0
+    flags[covered & ~in_session] |= OFF_SESSION
+
+    # Returns between consecutive usable bars of the same day, scored against a robust (median/MAD) scale
+    usable = ~duplicate & ~ohlc_bad
+    bars = np.flatnonzero(usable)
+    if len(bars) > 2:
+        log_close = np.log(c[bars])
+        same_day = local_day[bars][1:] == local_day[bars][:-1]
+        returns = np.diff(log_close)[same_day]
+        median = np.median(returns) if len(returns) else 0.0
+        scale = 1.4826 * np.median(np.abs(returns - median)) if len(returns) else 0.0
+        if scale > 0:
+            score = np.zeros(len(bars) - 1)
+            score[same_day] = (returns - median) / scale
+            extreme = np.abs(score) > outlier_mads
+            flags[bars[1:][extreme]] |= OUTLIER_RETURN
+            # A print that jumps and immediately reverts is a bad tick, not a real move
+            spike = extreme[:-1] & extreme[1:] & (np.sign(score[:-1]) != np.sign(score[1:]))
+            flags[bars[1:-1][spike]] |= BAD_PRINT
+
+    checked['quality_flags'] = flags
+    return checked, daily_report(local_day, flags, in_session | ~covered, calendar)
+
+
+def daily_report(local_day, flags, counts_as_session, calendar=NSE_CALENDAR):
+    """Per-day counts of bars, missing minutes and each issue type (session days without any bar included)."""
+    data_days, inverse = np.unique(local_day, return_inverse=True)
+    if len(data_days):
+        span = np.arange(data_days[0], data_days[-1] + 1)
+        session_days = span[calendar.expected_minutes_for(span.astype('datetime64[D]')) > 0]
+        days = np.union1d(data_days, session_days)
+    else:
+        days = data_days
+    slot = np.searchsorted(days, data_days)[inverse]
+
+    report = pd.DataFrame({'date': days.astype('datetime64[D]')})
+    report['expected_bars'] = calendar.expected_minutes_for(report['date'].to_numpy())
+    report['bars'] = np.bincount(slot, minlength=len(days))
+    session_bars = counts_as_session & (flags & DUPLICATE == 0)
+    report['missing_bars'] = np.maximum(report['expected_bars'] - np.bincount(slot, weights=session_bars, minlength=len(days)).astype(np.int64), 0)
+    for flag, name in FLAG_NAMES.items():
+        report[name] = np.bincount(slot, weights=(flags & flag) != 0, minlength=len(days)).astype(np.int64)
+    report['clean_bars'] = np.bincount(slot, weights=flags == 0, minlength=len(days)).astype(np.int64)
+    report['clean_pct'] = 100 * report['clean_bars'] / np.maximum(report['bars'], 1)
+    report['date'] = report['date'].dt.date
+    return report
+
+
+def repair_candles(checked, fill_gaps=False, calendar=NSE_CALENDAR):
+    """
+    Builds a cleaned frame from validate_candles output: drops duplicates, off-session bars, bad prints
+    and unrepairable rows, and clamps high/low to contain open/close. With fill_gaps=True every missing
+    session minute gets a flat bar at the previous close with zero volume (marked in a 'filled' column).
+    """
+    flags = checked['quality_flags'].to_numpy()
+    o, h, l, c = (checked[column].to_numpy(dtype=np.float64) for column in PRICE_COLUMNS)
+    repairable = np.isfinite(o) & np.isfinite(h) & np.isfinite(l) & np.isfinite(c) & (np.minimum(o, c) > 0)
+    keep = ((flags & (DUPLICATE | OFF_SESSION | BAD_PRINT)) == 0) & repairable
+    repaired = checked[keep].drop(columns=['quality_flags'])
+    repaired['high'] = np.maximum.reduce([repaired['high'], repaired['open'], repaired['close']])
+    repaired['low'] = np.minimum.reduce([repaired['low'], repaired['open'], repaired['close']])
+    if not fill_gaps or repaired.empty:
+        return repaired
+
+    grid = []
+    for day in repaired.index.normalize().unique().date:
+        bounds = calendar.session_bounds(day)
+        if bounds:
+            grid.append(pd.date_range(bounds[0], bounds[1], freq='min', inclusive='left').tz_convert(repaired.index.tz))
+    full_index = grid[0].append(grid[1:]) if grid else repaired.index
+    filled = repaired.reindex(full_index.union(repaired.index))
+    missing = filled['close'].isna().to_numpy()
+    previous_close = filled['close'].ffill().bfill()
+    for column in PRICE_COLUMNS:
+        filled[column] = filled[column].fillna(previous_close)
+    filled['volume'] = filled['volume'].fillna(0)
+    filled['filled'] = missing
+    return filled
+
+
+def validate_files(paths):
+    """Runs the checks over many symbol files. Returns (per-symbol summary, per-day report for all symbols)."""
+    summaries, reports = [], []
+    for path in paths:
+        symbol = symbol_from_filename(path)
+        _, daily = validate_candles(read_raw_candles(path))
+        daily.insert(0, 'symbol', symbol)
+        reports.append(daily)
+        totals = daily.drop(columns=['symbol', 'date', 'clean_pct']).sum()
+        summaries.append({'symbol': symbol, 'days': len(daily), **totals.to_dict(),
+                          'clean_pct': 100 * totals['clean_bars'] / max(totals['bars'], 1)})
+    return pd.DataFrame(summaries), pd.concat(reports, ignore_index=True)
+
+
+# --- Universe Quality Report ---
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
+    files = sys.argv[1:] or DEFAULT_FILES
+
+    started = time.perf_counter()
+    summary, report = validate_files(files)
+    logger.info(f"Validated {len(files)} files ({int(summary['bars'].sum())} bars) in {time.perf_counter() - started:.2f}s")
+    print(summary.to_string(index=False))
+
+    report.to_csv(REPORT_FILE, index=False)
+    worst = report[report['expected_bars'] > 0].sort_values('clean_pct').head(10)
+    logger.info(f"Per-day report written to {REPORT_FILE}. Worst days:")
+    print(worst.to_string(index=False))
@@ -0,0 +1,206 @@
+# FILE: indicators.py
+"""
+Built-in NumPy indicator kernels (session VWAP, SMA, Bollinger Bands) used by strategy_logic.py
+instead of the pandas_ta DataFrame accessor. Every kernel is O(n) via prefix sums, accumulates in
+float64, and can write into a caller-supplied output buffer (float64 or float32).
+"""
+import sys
+import numpy as np
+
+
+def _output(out, n, dtype):
+    """Returns the preallocated output buffer, or a fresh one of the requested dtype."""
+    if out is None:
+        return np.empty(n, dtype=dtype)
+    if out.shape != (n,):
+        raise ValueError(f"Output buffer has shape {out.shape}, expected ({n},)")
+    return out
+
+
+def _rolling_sum(values, length):
+    """Trailing window sums via prefix sums; a window containing NaN (or not yet full) is NaN."""
+    missing = np.isnan(values)
+    prefix = np.cumsum(np.where(missing, 0.0, values))
+    sums = prefix.copy()
+    sums[length:] -= prefix[:-length]
+    sums[:length - 1] = np.nan
+    if missing.any():
+        missing_prefix = np.cumsum(missing)
+        missing_count = missing_prefix.copy()
+        missing_count[length:] -= missing_prefix[:-length]
+        sums[missing_count > 0] = np.nan
+    return sums
+
+
+def sma(values, length, out=None, dtype=np.float64):
+    """Simple moving average over the last `length` values (NaN until the window is full)."""
+    values = np.asarray(values, dtype=np.float64)
+    result = _output(out, len(values), dtype)
+    if length > len(values):
+        result[:] = np.nan
+        return result
+    result[:] = _rolling_sum(values, length) / length
+    return result
+
+
+def rolling_mean_std(values, length, ddof=0, out_mean=None, out_std=None, dtype=np.float64):
+    """
+    Rolling mean and standard deviation. The values are centred on their mean before the
+    sum-of-squares prefix is taken, which keeps the cancellation error far below a price tick.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    mean = _output(out_mean, n, dtype)
+    std = _output(out_std, n, dtype)
+    if length > n or length - ddof <= 0:
+        mean[:] = np.nan
+        std[:] = np.nan
+        return mean, std
+
+    shift = np.nanmean(values) if n else 0.0
+    centred = values - shift
+    sums = _rolling_sum(centred, length)
+    squares = _rolling_sum(centred * centred, length)
+    variance = (squares - sums * sums / length) / (length - ddof)
+    mean[:] = sums / length + shift
+    std[:] = np.sqrt(np.clip(variance, 0.0, None))
+    return mean, std
+
+
+def bollinger_bands(close, length=20, num_std=2.0, ddof=0, out=None, dtype=np.float64):
+    """
+    Bollinger Bands as (lower, middle, upper), matching pandas_ta.bbands (SMA middle, ddof=0).
+    `out` may be a (3, n) buffer that receives the three bands in that order.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    if out is None:
+        out = np.empty((3, n), dtype=dtype)
+    elif out.shape != (3, n):
+        raise ValueError(f"Output buffer has shape {out.shape}, expected (3, {n})")
+    lower, middle, upper = out
+    _, deviation = rolling_mean_std(close, length, ddof=ddof, out_mean=middle, out_std=upper, dtype=dtype)
+    # 'upper' briefly holds the deviation so no temporary array is needed
+    np.multiply(deviation, num_std, out=upper)
+    np.subtract(middle, upper, out=lower)
+    np.add(middle, upper, out=upper)
+    return lower, middle, upper
+
+
+def session_vwap(high, low, close, volume, session_starts, out=None, dtype=np.float64):
+    """
+    Session-anchored VWAP of the typical price (H+L+C)/3, matching pandas_ta's VWAP_D.
+    session_starts holds the first bar offset of every session followed by the total bar count.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    volume = np.asarray(volume, dtype=np.float64)
+    n = len(high)
+    result = _output(out, n, dtype)
+    if n == 0:
+        return result
+
+    weighted = (high + np.asarray(low, dtype=np.float64) + np.asarray(close, dtype=np.float64)) / 3.0 * volume
+    cum_weighted = np.cumsum(weighted)
+    cum_volume = np.cumsum(volume)
+
+    # Subtract each session's opening prefix so the sums restart every day
+    lengths = np.diff(session_starts)
+    first = np.asarray(session_starts[:-1])
+    weighted_base = np.repeat(np.where(first > 0, cum_weighted[first - 1], 0.0), lengths)
+    volume_base = np.repeat(np.where(first > 0, cum_volume[first - 1], 0.0), lengths)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result[:] = (cum_weighted - weighted_base) / (cum_volume - volume_base)
+    return result
+
+
+def session_starts_for(index):
+    """Returns the session boundary offsets of a sorted tz-aware minute index (one session per local day)."""
+    if not index.is_monotonic_increasing:
+        raise ValueError("Indicators need the bars sorted by timestamp.")
+    days = index.normalize().asi8
+    return np.concatenate(([0], np.flatnonzero(np.diff(days)) + 1, [len(index)])).astype(np.int64)
+
+
+def compare_with_pandas_ta(df, length=20, num_std=2.0, rtol=1e-9, atol=1e-6):
+    """Checks the kernels against pandas_ta on a candle DataFrame; returns the max abs error per indicator."""
+    import pandas_ta  # noqa: F401  (registers the .ta accessor)
+
+    reference = df[['open', 'high', 'low', 'close', 'volume']].astype('float64').copy()
+    reference.ta.vwap(append=True)
+    reference.ta.sma(length=length, append=True)
+    reference.ta.bbands(length=length, std=num_std, append=True)
+
+    ours = {
+        'VWAP_D': session_vwap(df['high'], df['low'], df['close'], df['volume'], session_starts_for(df.index)),
+        f'SMA_{length}': sma(df['close'], length),
+    }
+    ours[f'BBL_{length}_{num_std}'], ours[f'BBM_{length}_{num_std}'], ours[f'BBU_{length}_{num_std}'] = bollinger_bands(df['close'], length, num_std)
+
+    errors = {}
+    for column, values in ours.items():
+        expected = reference[column].to_numpy()
+        if not np.allclose(values, expected, rtol=rtol, atol=atol, equal_nan=True):
+            raise AssertionError(f"{column} differs from pandas_ta")
+        errors[column] = float(np.nanmax(np.abs(values - expected)))
+    return errors
+
+
+def compare_with_pandas(df, length=20, num_std=2.0, rtol=1e-9, atol=1e-6):
+    """
+    Checks the kernels against plain pandas references (rolling mean/std, per-day cumulative sums),
+    which need no optional package; returns the max abs error per indicator.
+    """
+    import pandas as pd
+
+    close = df['close'].astype('float64')
+    typical = (df['high'].astype('float64') + df['low'] + close) / 3.0
+    volume = df['volume'].astype('float64')
+    day = pd.Series(df.index.normalize(), index=df.index)
+    rolling = close.rolling(length)
+    middle, deviation = rolling.mean(), rolling.std(ddof=0)
+    reference = {
+        'VWAP_D': (typical * volume).groupby(day).cumsum() / volume.groupby(day).cumsum(),
+        f'SMA_{length}': middle,
+        f'BBL_{length}_{num_std}': middle - num_std * deviation,
+        f'BBM_{length}_{num_std}': middle,
+        f'BBU_{length}_{num_std}': middle + num_std * deviation,
+    }
+    ours = [session_vwap(df['high'], df['low'], df['close'], df['volume'], session_starts_for(df.index)),
+            sma(df['close'], length), *bollinger_bands(df['close'], length, num_std)]
+
+    errors = {}
+    for (column, expected), values in zip(reference.items(), ours):
+        expected = expected.to_numpy()
+        if not np.allclose(values, expected, rtol=rtol, atol=atol, equal_nan=True):
+            raise AssertionError(f"{column} differs from the pandas reference")
+        errors[column] = float(np.nanmax(np.abs(values - expected)))
+    return errors
+
+
+def check_candles(df, label):
+    """Runs every numerical check on one candle frame; the pandas_ta comparison is skipped when it is not installed."""
+    for column, error in compare_with_pandas(df).items():
+        print(f"{label}: {column:<14} max abs error vs pandas: {error:.3e}")
+    try:
+        errors = compare_with_pandas_ta(df)
+    except ImportError:
+        print(f"{label}: pandas_ta not installed, skipping the pandas_ta comparison")
+    else:
+        for column, error in errors.items():
+            print(f"{label}: {column:<14} max abs error vs pandas_ta: {error:.3e}")
+
+    # float32 mode writing into preallocated buffers
+    buffers = np.empty((3, len(df)), dtype=np.float32)
+    bollinger_bands(df['close'], 20, 2.0, out=buffers)
+    reference = bollinger_bands(df['close'], 20, 2.0)
+    print(f"{label}: float32 Bollinger max abs error: {np.nanmax(np.abs(buffers - np.array(reference))):.3e}")
+
+
+# --- Numerical Checks (generated candles, plus any candle CSVs given) ---
+if __name__ == "__main__":
+    from strategy_parity import synthetic_candles
+    from data_loader import load_candles
+
+    check_candles(synthetic_candles(), "synthetic")
+    for data_file in sys.argv[1:]:
+        check_candles(load_candles(data_file), data_file)
@@ -1,28 +1,30 @@
 import os
 import logging
 import sys
-import time
 import json
-from datetime import datetime, date
+import math
+import time
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import pandas as pd
 import upstox_client
+import urllib3
 from upstox_client.api import history_api
 from upstox_client.rest import ApiException
 from utils.notifications import send_email, send_mobile_alert
+from agent_clock import SystemClock
+from agent_scheduler import MinuteScheduler
+from agent_metrics import AgentMetrics, start_metrics_server
+from market_calendar import NSE_CALENDAR, EXCHANGE_TZ
+from paper_broker import PaperBroker, RandomLatency, FractionSlippage, VolumeParticipation, BUY, SELL, MARKET, LIMIT, STOP, FILLED, to_seconds
+from risk_engine import RiskEngine, RiskLimits
+from strategies import OrbStrategy
 
 # --- Load .env and Set up Logger ---
 load_dotenv()
 logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# --- Configure API ---
-ACCESS_TOKEN = os.getenv("UPSTOX_ACCESS_TOKEN")
-api_config = upstox_client.Configuration()
-api_config.access_token = ACCESS_TOKEN
-api_client = upstox_client.ApiClient(api_config)
-api_instance = history_api.HistoryApi(api_client)
-
 # --- Agent Configuration ---
 # NOTE: Switched back to the profitable NSE key for HDFCBANK from our backtest
 INSTRUMENT_KEY = "NSE_EQ|INE040A01034"
@@ -35,153 +37,389 @@ VIRTUAL_CAPITAL = 100000.0 # Our starting paper trading capital
 STOP_LOSS_PERCENT = 0.02
 TAKE_PROFIT_PERCENT = 0.04
 
-# --- Agent State (The Agent's Memory) ---
-today = date.today()
-opening_range_high = 0
-opening_range_low = float('inf')
-trade_taken_today = False
-
-# --- Added paper trading state variables ---
-eod_report_sent = False
-position_open = False
-entry_price = 0
-stop_loss_price = 0
-take_profit_price = 0
-trade_journal = []
-
-logger.info("--- Live ORB Agent Initialized ---")
-logger.info(f"Today's date: {today}. Waiting for market open...")
-
-# --- Main Agent Loop ---
-while True:
-    try:
-        # Check if it's a new day, and if so, reset the state
-        if date.today() != today:
-            today = date.today()
-            opening_range_high = 0
-            opening_range_low = float('inf')
-            trade_taken_today = False
-            
-            # --- Reset paper trading state for new day ---
-            eod_report_sent = False
-            position_open = False
-            entry_price = 0
-            stop_loss_price = 0
-            take_profit_price = 0
-            trade_journal = []
-            
-            logger.info(f"--- New Day Detected: {today}. Agent state has been reset. ---")
-
-        current_time = datetime.now().time()
-        market_open_time = datetime.strptime("09:15", "%H:%M").time()
-        range_end_time = datetime.strptime("09:45", "%H:%M").time() # 9:15 + 30 mins
-        market_close_time = datetime.strptime("15:30", "%H:%M").time()
-        
-        # Only run during market hours
-        if market_open_time <= current_time < market_close_time:
-            # Fetch the latest 1-minute candle
-            instrument_key = INSTRUMENT_KEY
-            api_response = api_instance.get_intra_day_candle_data(instrument_key, "1minute", "v2")
-            latest_candle = api_response.data.candles[-1]
-            # Column order: timestamp, open, high, low, close, volume, oi
-            latest_high = latest_candle[2]
-            latest_low = latest_candle[3]
-            latest_close = latest_candle[4]
-
-            signal = "HOLD"
-
-            # --- Live Trade Management Section ---
-            if position_open:
-                exit_reason = None
-                exit_price = 0
-                # Check for Stop-Loss
-                if latest_low <= stop_loss_price:
-                    exit_reason, exit_price = "STOP_LOSS", stop_loss_price
-                # Check for Take-Profit
-                elif latest_high >= take_profit_price:
-                    exit_reason, exit_price = "TAKE_PROFIT", take_profit_price
-    
-                if exit_reason:
-                    pnl = (exit_price - entry_price) * shares # <-- CORRECTED P&L CALCULATION
-                    logger.info(f"!!! {exit_reason} TRIGGERED !!! Exiting trade. P&L: Rs.{pnl:,.2f}")
-                    send_mobile_alert("trade_alert", STOCK_SYMBOL, pnl, exit_reason)
-                    trade_journal.append(f"{exit_reason} Exit at {exit_price:.2f}. P&L: {pnl:,.2f}")
-                    position_open = False
-
-            # --- Agent Logic ---
-            # 1. During the opening range window, just record the high and low
-            if current_time < range_end_time:
-                opening_range_high = max(opening_range_high, latest_high)
-                opening_range_low = min(opening_range_low, latest_low)
-                signal = "DEFINING_RANGE"
-            
-            # 2. After the opening range, check for breakouts
-            # --- MODIFIED: Added condition to check if position is not already open ---
-            elif not trade_taken_today and not position_open:
-                if latest_high > opening_range_high:
-                    signal = "BUY"
-                    entry_price = opening_range_high
-                    shares = VIRTUAL_CAPITAL / entry_price # <-- CORRECTED: Calculate position size
-                    stop_loss_price = entry_price * (1 - STOP_LOSS_PERCENT)
-                    take_profit_price = entry_price * (1 + TAKE_PROFIT_PERCENT)
-                    position_open = True
-                    trade_taken_today = True
-                    trade_journal.append(f"BUY Entry at {entry_price:.2f} for {shares:.2f} shares.")
-                    logger.info(trade_journal[-1])
-                    
-                elif latest_low < opening_range_low:
-                    signal = "SELL"
-                    trade_taken_today = True # Take only one trade per day
-                    # Note: Currently only handling long trades (BUY then SELL)
-                    logger.info("SELL Signal detected but logic is for long trades only. Holding.")
-            
-            # --- Broadcast Status for Dashboard ---
-            status = {
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'close_price': latest_close,
-                'current_signal': signal,
-                'opening_range_high': opening_range_high,
-                'opening_range_low': opening_range_low,
-                'trade_taken_today': trade_taken_today,
-                # --- Added paper trading status fields ---
-                'position_open': position_open,
-                'entry_price': entry_price,
-                'stop_loss_price': stop_loss_price,
-                'take_profit_price': take_profit_price,
-                'trade_journal': trade_journal
-            }
-            with open(STATUS_FILE, 'w') as f:
-                json.dump(status, f)
-            
-            logger.info(f"Status Updated: Signal={signal}, OR High={opening_range_high:.2f}, OR Low={opening_range_low:.2f}")
-
-        # --- End-of-day report logic ---
-        elif current_time > market_close_time and not eod_report_sent:
-            # Send end-of-day report
-            subject = f"ORB Agent EOD Report - {today}"
-            body = f"""
-            ORB Agent End-of-Day Report for {today}
-            
-            Final Status:
-            - Opening Range High: {opening_range_high:.2f}
-            - Opening Range Low: {opening_range_low:.2f}
-            - Trade Taken Today: {trade_taken_today}
-            - Position Open: {position_open}
-            
-            Trade Journal:
-            {chr(10).join(trade_journal) if trade_journal else 'No trades today'}
-            """
-            
+# --- Paper execution (paper_broker.py) ---
+USE_PAPER_BROKER = False # Route entries/exits through the simulated broker instead of assuming fills at the range high
+PAPER_SLIPPAGE = 0.0005
+PAPER_PARTICIPATION = 0.1 # Max share of a minute's volume the paper orders can fill
+
+# --- Pre-trade risk limits (risk_engine.py) ---
+MAX_ORDER_NOTIONAL = 150000.0
+MAX_SYMBOL_NOTIONAL = 150000.0
+MAX_GROSS_EXPOSURE = 300000.0
+MAX_OPEN_POSITIONS = 5
+MAX_DAILY_LOSS = 5000.0 # New entries are blocked for the day once realized + unrealized P&L reaches -5,000
+
+# --- Instrumentation ---
+METRICS_PORT = 9108 # Prometheus scrape endpoint at http://127.0.0.1:9108/metrics
+METRICS_SUMMARY_FILE = "agent_metrics.json"
+
+# --- Candles ---
+CANDLE_DURATION = timedelta(minutes=1) # A candle stamped T closes, and is final, at T + 1 minute
+
+
+class OrbAgent:
+    """
+    The live agent's memory and decision logic (range tracking, breakout entry, SL/TP exits).
+    It never looks at the wall clock itself, so the replay harness can drive it from stored candles.
+    """
+
+    def __init__(self, today, alert=send_mobile_alert, email=send_email, broker=None, risk=None):
+        self.alert = alert
+        self.email = email
+        self.trades = [] # Structured record of every trade, kept across days
+        # With a broker, orders are sent to it and the position only changes when it reports fills
+        self.broker = broker
+        self.last_bar_seconds = None
+        if broker is not None:
+            broker.subscribe(self.on_fill)
+        # Breakout decisions come from the shared ORB definition, evaluated incrementally
+        self.strategy = OrbStrategy(RANGE_MINUTES).stream()
+        # Optional RiskEngine: entries are checked against it and every fill/price is fed to it
+        self.risk = risk
+        self.reset(today)
+
+    def reset(self, today):
+        """Resets the agent state for a new trading day."""
+        # A position still open at the reset is dropped by the live agent, so record that explicitly
+        if self.trades and 'exit_reason' not in self.trades[-1]:
+            self.trades[-1].update({'exit_time': None, 'exit_price': None, 'profit': None, 'exit_reason': 'DAY_RESET'})
+        if self.risk is not None:
+            self.risk.close_out(STOCK_SYMBOL)
+            self.risk.new_day()
+
+        self.today = today
+        # Today's session from the exchange calendar (None on holidays); special sessions open late
+        self.session = NSE_CALENDAR.session_times(today)
+        self.opening_range_high = 0
+        self.opening_range_low = float('inf')
+        self.trade_taken_today = False
+
+        # --- Reset paper trading state for new day ---
+        self.eod_report_sent = False
+        self.position_open = False
+        self.entry_price = 0
+        self.shares = 0
+        self.stop_loss_price = 0
+        self.take_profit_price = 0
+        self.trade_journal = []
+        self.exit_orders = []
+        if self.broker is not None:
+            self.broker.cancel_all(INSTRUMENT_KEY)
+
+    def on_candle(self, current_time, candle, candle_time=None, closed=None):
+        """
+        Runs the trade management and breakout logic on the latest candle and returns the signal.
+        The range/breakout phase follows the candle's own timestamp; a candle already seen is not fed to the strategy again.
+        `closed` is today's completed candles up to and including this one (default: just this one) for the paper broker.
+        """
+        # Column order: timestamp, open, high, low, close, volume, oi
+        latest_high = candle[2]
+        latest_low = candle[3]
+        latest_close = candle[4]
+
+        signal = "HOLD"
+        if self.risk is not None:
+            self.risk.on_price(STOCK_SYMBOL, candle[4])
+
+        # --- Paper broker: completed bars are matched against the working orders (fills arrive via on_fill) ---
+        if self.broker is not None:
+            self.feed_broker(closed if closed is not None else [candle])
+
+        # --- Live Trade Management Section ---
+        if self.position_open and self.broker is None:
+            exit_reason = None
+            exit_price = 0
+            # Check for Stop-Loss
+            if latest_low <= self.stop_loss_price:
+                exit_reason, exit_price = "STOP_LOSS", self.stop_loss_price
+            # Check for Take-Profit
+            elif latest_high >= self.take_profit_price:
+                exit_reason, exit_price = "TAKE_PROFIT", self.take_profit_price
+
+            if exit_reason:
+                pnl = (exit_price - self.entry_price) * self.shares
+                logger.info(f"!!! {exit_reason} TRIGGERED !!! Exiting trade. P&L: Rs.{pnl:,.2f}")
+                self.alert("trade_alert", STOCK_SYMBOL, pnl, exit_reason)
+                self.trade_journal.append(f"{exit_reason} Exit at {exit_price:.2f}. P&L: {pnl:,.2f}")
+                self.trades[-1].update({'exit_time': candle_time, 'exit_price': exit_price, 'profit': pnl, 'exit_reason': exit_reason})
+                self.position_open = False
+                if self.risk is not None:
+                    self.risk.on_fill(STOCK_SYMBOL, SELL, self.shares, exit_price)
+
+        # --- Agent Logic: the same OrbStrategy the backtests run, advanced one bar at a time ---
+        strategy_signal = self.strategy.update(candle_time if candle_time is not None else candle[0], *candle[1:6])
+        state = self.strategy.values
+        if not math.isnan(state['range_high']):
+            self.opening_range_high, self.opening_range_low = state['range_high'], state['range_low']
+
+        # 1. During the opening range window, the strategy only records the high and low
+        if not state['after_range']:
+            signal = "DEFINING_RANGE"
+
+        # 2. After the opening range, act on the strategy's breakout signal (at most one per day)
+        elif strategy_signal == "BUY" and not self.position_open:
+            self.trade_taken_today = True
+            # Entered at the signal candle's close, like the backtester
+            if self.veto_entry(VIRTUAL_CAPITAL / latest_close, latest_close):
+                signal = "VETOED"
+
+            elif self.broker is not None:
+                signal = "BUY"
+                # Sent at the candle's close; the fill (price, time, quantity) comes back from the broker
+                order = self.broker.submit(INSTRUMENT_KEY, BUY, VIRTUAL_CAPITAL / latest_close, MARKET,
+                                           timestamp=self.last_bar_seconds + 60, tag="ENTRY")
+                self.trade_journal.append(f"BUY order {order.order_id} sent for {order.quantity:.2f} shares.")
+                logger.info(self.trade_journal[-1])
+
+            else:
+                signal = "BUY"
+                self.entry_price = latest_close
+                self.shares = VIRTUAL_CAPITAL / self.entry_price
+                self.stop_loss_price = self.entry_price * (1 - STOP_LOSS_PERCENT)
+                self.take_profit_price = self.entry_price * (1 + TAKE_PROFIT_PERCENT)
+                self.position_open = True
+                self.trade_journal.append(f"BUY Entry at {self.entry_price:.2f} for {self.shares:.2f} shares.")
+                self.trades.append({'entry_time': candle_time, 'entry_price': self.entry_price, 'shares': self.shares})
+                logger.info(self.trade_journal[-1])
+                if self.risk is not None:
+                    self.risk.on_fill(STOCK_SYMBOL, BUY, self.shares, self.entry_price)
+
+        elif strategy_signal == "SELL":
+            signal = "SELL"
+            self.trade_taken_today = True # Take only one trade per day
+            # Note: Currently only handling long trades (BUY then SELL)
+            logger.info("SELL Signal detected but logic is for long trades only. Holding.")
+
+        return signal
+
+    def feed_broker(self, closed):
+        """
+        Sends the broker every completed candle it has not matched yet, oldest first and each exactly once,
+        so resting SL/TP orders see each minute's full high and low, including minutes the agent never decided on.
+        """
+        start = len(closed)
+        while start and (self.last_bar_seconds is None or to_seconds(closed[start - 1][0]) > self.last_bar_seconds):
+            start -= 1
+        for candle in closed[start:]:
+            self.last_bar_seconds = to_seconds(candle[0])
+            self.broker.on_bar(INSTRUMENT_KEY, self.last_bar_seconds, candle[1], candle[2], candle[3], candle[4], candle[5])
+
+    def veto_entry(self, shares, price):
+        """True if the risk engine refuses the entry (the day's breakout is then skipped)."""
+        if self.risk is None:
+            return False
+        reason = self.risk.check_order(STOCK_SYMBOL, BUY, shares, price)
+        if reason is not None:
+            self.trade_journal.append(f"BUY entry vetoed by risk engine: {reason}.")
+            logger.warning(self.trade_journal[-1])
+        return reason is not None
+
+    def on_fill(self, fill, order):
+        """Paper broker fill: opens the position (and its SL/TP orders) or closes it."""
+        if self.risk is not None:
+            self.risk.on_fill(STOCK_SYMBOL, fill.side, fill.quantity, fill.price)
+        candle_time = pd.Timestamp(fill.timestamp, unit='s', tz='UTC').tz_convert(EXCHANGE_TZ)
+        if order.tag == "ENTRY":
+            if not self.position_open:
+                self.trades.append({'entry_time': candle_time})
+            self.position_open = True
+            self.entry_price = order.avg_price
+            self.shares = order.filled
+            self.trades[-1].update({'entry_price': self.entry_price, 'shares': self.shares})
+            if order.status == FILLED:
+                self.stop_loss_price = self.entry_price * (1 - STOP_LOSS_PERCENT)
+                self.take_profit_price = self.entry_price * (1 + TAKE_PROFIT_PERCENT)
+                self.exit_orders = [
+                    self.broker.submit(INSTRUMENT_KEY, SELL, self.shares, STOP, self.stop_loss_price, fill.timestamp, "STOP_LOSS"),
+                    self.broker.submit(INSTRUMENT_KEY, SELL, self.shares, LIMIT, self.take_profit_price, fill.timestamp, "TAKE_PROFIT")]
+                self.trade_journal.append(f"BUY Entry at {self.entry_price:.2f} for {self.shares:.2f} shares.")
+                logger.info(self.trade_journal[-1])
+        elif order.status == FILLED:
+            exit_reason, exit_price = order.tag, order.avg_price
+            for other in self.exit_orders:
+                self.broker.cancel(other.order_id)
+            pnl = (exit_price - self.entry_price) * self.shares
+            logger.info(f"!!! {exit_reason} TRIGGERED !!! Exiting trade. P&L: Rs.{pnl:,.2f}")
+            self.alert("trade_alert", STOCK_SYMBOL, pnl, exit_reason)
+            self.trade_journal.append(f"{exit_reason} Exit at {exit_price:.2f}. P&L: {pnl:,.2f}")
+            self.trades[-1].update({'exit_time': candle_time, 'exit_price': exit_price, 'profit': pnl, 'exit_reason': exit_reason})
+            self.position_open = False
+
+    def status(self, now, close_price, signal):
+        """Builds the status dictionary broadcast to the dashboard."""
+        return {
+            'timestamp': now.strftime('%Y-%m-%d %H:%M:%S'),
+            'close_price': close_price,
+            'current_signal': signal,
+            'opening_range_high': self.opening_range_high,
+            'opening_range_low': self.opening_range_low,
+            'trade_taken_today': self.trade_taken_today,
+            # --- Added paper trading status fields ---
+            'position_open': self.position_open,
+            'entry_price': self.entry_price,
+            'stop_loss_price': self.stop_loss_price,
+            'take_profit_price': self.take_profit_price,
+            'trade_journal': self.trade_journal,
+            'risk': self.risk.snapshot() if self.risk is not None else None
+        }
+
+    def send_eod_report(self):
+        """Sends the end-of-day email report once per day."""
+        subject = f"ORB Agent EOD Report - {self.today}"
+        body = f"""
+        ORB Agent End-of-Day Report for {self.today}
+
+        Final Status:
+        - Opening Range High: {self.opening_range_high:.2f}
+        - Opening Range Low: {self.opening_range_low:.2f}
+        - Trade Taken Today: {self.trade_taken_today}
+        - Position Open: {self.position_open}
+
+        Trade Journal:
+        {chr(10).join(self.trade_journal) if self.trade_journal else 'No trades today'}
+        """
+
+        try:
+            self.email(subject, body)
+            self.eod_report_sent = True
+            logger.info("EOD report sent successfully")
+        except Exception as email_error:
+            logger.error(f"Failed to send EOD report: {email_error}")
+
+
+def candle_minute(candle):
+    """The naive exchange-local minute a candle is stamped with (Upstox sends ISO strings with +05:30)."""
+    stamp = datetime.fromisoformat(candle[0]) if isinstance(candle[0], str) else candle[0]
+    return stamp.replace(tzinfo=None, second=0, microsecond=0)
+
+
+def closed_candles(candles, now):
+    """Drops the trailing candle(s) still forming at `now`: a candle stamped T is final only from T + 1 minute."""
+    end = len(candles)
+    while end and candle_minute(candles[end - 1]) + CANDLE_DURATION > now:
+        end -= 1
+    return candles[:end]
+
+
+def run_cycle(agent, clock, fetch_candles, status_file=STATUS_FILE, backfill_minutes=(), metrics=None):
+    """
+    One iteration of the agent loop: day rollover, candle processing, status broadcast and EOD report.
+    fetch_candles(now) returns today's candles in time order. The agent decides on the candle that
+    closed at the latest minute boundary, never on the one still forming; candles that closed at any
+    backfill_minutes the scheduler missed are replayed first, in order.
+    """
+    # Check if it's a new day, and if so, reset the state
+    if clock.today() != agent.today:
+        agent.reset(clock.today())
+        logger.info(f"--- New Day Detected: {agent.today}. Agent state has been reset. ---")
+
+    now = clock.now()
+    current_time = now.time()
+    if agent.session is None:
+        return None # Exchange holiday or weekend
+    market_open_time, market_close_time, _ = agent.session
+    # The last candle of the session closes at the close, so it is decided on just after it
+    decisions_end = datetime.combine(agent.today, market_close_time) + CANDLE_DURATION
+
+    # Only run during market hours
+    if market_open_time <= current_time and now < decisions_end:
+        # Fetch today's 1-minute candles, keeping only the ones that have closed
+        candles = closed_candles(fetch_candles(now), now)
+        if not candles:
+            return None
+
+        # --- Backfill any minutes the scheduler missed (each boundary closed the candle before it) ---
+        if backfill_minutes:
+            wanted = set(minute - CANDLE_DURATION for minute in backfill_minutes if minute.date() == agent.today)
+            for position in range(max(len(candles) - len(backfill_minutes) - 1, 0), len(candles) - 1):
+                candle = candles[position]
+                minute = candle_minute(candle)
+                if minute in wanted and market_open_time <= minute.time():
+                    agent.on_candle(minute.time(), candle, candle_time=candle[0], closed=candles[:position + 1])
+                    logger.info(f"Backfilled missed candle {minute:%H:%M}")
+
+        latest_candle = candles[-1]
+        signal = agent.on_candle(current_time, latest_candle, candle_time=latest_candle[0], closed=candles)
+
+        # --- Broadcast Status for Dashboard ---
+        if status_file:
+            write_started = time.perf_counter()
+            with open(status_file, 'w') as f:
+                json.dump(agent.status(now, latest_candle[4], signal), f)
+            if metrics:
+                metrics.status_write.observe(time.perf_counter() - write_started)
+
+        logger.info(f"Status Updated: Signal={signal}, OR High={agent.opening_range_high:.2f}, OR Low={agent.opening_range_low:.2f}")
+        return signal
+
+    # --- End-of-day report logic ---
+    elif current_time > market_close_time and not agent.eod_report_sent:
+        agent.send_eod_report()
+    return None
+
+
+def main(clock=None):
+    """Runs the live agent against the Upstox API."""
+    clock = clock or SystemClock()
+    scheduler = MinuteScheduler(clock)
+
+    # --- Configure API ---
+    api_config = upstox_client.Configuration()
+    api_config.access_token = os.getenv("UPSTOX_ACCESS_TOKEN")
+    if os.getenv("UPSTOX_API_BASE"):
+        api_config.host = os.getenv("UPSTOX_API_BASE") # e.g. a local mock_upstox_server.py
+    api_client = upstox_client.ApiClient(api_config)
+    api_instance = history_api.HistoryApi(api_client)
+
+    metrics = AgentMetrics()
+    start_metrics_server(metrics.registry, METRICS_PORT)
+
+    def fetch_candles(now):
+        with metrics.api_latency.time():
+            api_response = api_instance.get_intra_day_candle_data(INSTRUMENT_KEY, "1minute", "v2")
+        return sorted(api_response.data.candles, key=lambda candle: candle[0])
+
+    def timed(send):
+        def wrapper(*args):
+            with metrics.alert_latency.time():
+                return send(*args)
+        return wrapper
+
+    broker = PaperBroker(RandomLatency(), FractionSlippage(PAPER_SLIPPAGE), VolumeParticipation(PAPER_PARTICIPATION)) if USE_PAPER_BROKER else None
+    risk = RiskEngine(RiskLimits(MAX_ORDER_NOTIONAL, MAX_SYMBOL_NOTIONAL, MAX_GROSS_EXPOSURE, MAX_OPEN_POSITIONS, MAX_DAILY_LOSS))
+    agent = OrbAgent(clock.today(), alert=timed(send_mobile_alert), email=timed(send_email), broker=broker, risk=risk)
+    logger.info("--- Live ORB Agent Initialized ---")
+    logger.info(f"Today's date: {agent.today}. Waiting for market open...")
+    logger.info(f"Metrics at http://127.0.0.1:{METRICS_PORT}/metrics, summary in {METRICS_SUMMARY_FILE}")
+
+    # --- Main Agent Loop ---
+    while True:
+        # Wake just after each minute boundary; missed boundaries come back as skipped minutes
+        tick = scheduler.wait()
+        cycle_started = time.perf_counter()
+        metrics.skipped_minutes.inc(len(tick.skipped_minutes))
+        try:
+            signal = run_cycle(agent, clock, fetch_candles, backfill_minutes=tick.skipped_minutes, metrics=metrics)
+            if signal is not None:
+                metrics.signal_latency.observe(scheduler.record_decision(tick))
+                logger.info(f"Wake lateness {scheduler.wake_lateness} | Close-to-decision {scheduler.decision_latency}")
+        except ApiException as e:
+            metrics.api_errors.inc()
+            logger.error(f"Upstox API Exception: {e.reason}")
+        except (urllib3.exceptions.HTTPError, ConnectionError, TimeoutError) as e:
+            # Connection failures and timeouts never reach an HTTP status, but are API errors all the same
+            metrics.api_errors.inc()
+            logger.error(f"Upstox API connection error: {e}")
+        except Exception as e:
+            logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+        finally:
+            metrics.cycles.inc()
+            metrics.cycle_duration.observe(time.perf_counter() - cycle_started)
             try:
-                send_email(subject, body)
-                eod_report_sent = True
-                logger.info("EOD report sent successfully")
-            except Exception as email_error:
-                logger.error(f"Failed to send EOD report: {email_error}")
-
-    except ApiException as e:
-        logger.error(f"Upstox API Exception: {e.reason}")
-    except Exception as e:
-        logger.error(f"An unexpected error occurred: {e}", exc_info=True)
-    finally:
-        time.sleep(60) # Wait for the next minute
\ No newline at end of file
+                metrics.registry.write_summary(METRICS_SUMMARY_FILE)
+            except OSError as e:
+                logger.warning(f"Could not write metrics summary: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# FILE: market_calendar.py
+"""
+NSE trading calendar: regular sessions, exchange holidays and special sessions (Muhurat trading,
+Saturday/Sunday budget sessions). Every session's open and close are precomputed once, at import,
+as UTC epoch-nanosecond arrays, so "which session does this timestamp belong to" is a single
+searchsorted over the whole index, and the live agent's per-minute checks are a dict lookup.
+
+Holiday lists follow the NSE circulars for 2023-2026. Outside those years the calendar falls back to
+Monday-Friday regular sessions (it cannot know the holidays), and days with data are always given a
+session, so the backtests never drop bars the exchange actually printed.
+"""
+from datetime import date, datetime, time, timedelta
+import numpy as np
+import pandas as pd
+
+EXCHANGE_TZ = 'Asia/Kolkata'
+IST_OFFSET_SECONDS = 5 * 3600 + 30 * 60 # IST has no daylight saving, so the offset is fixed
+
+MARKET_OPEN = time(9, 15)
+MARKET_CLOSE = time(15, 30)
+MARKET_OPEN_SECONDS = 9 * 3600 + 15 * 60
+MARKET_CLOSE_SECONDS = 15 * 3600 + 30 * 60
+
+REGULAR = 'REGULAR'
+MUHURAT = 'MUHURAT'
+SPECIAL = 'SPECIAL'
+
+# --- NSE equity segment trading holidays (weekdays only; weekends are closed anyway) ---
+NSE_HOLIDAYS = {
+    2023: ['2023-01-26', '2023-03-07', '2023-03-30', '2023-04-04', '2023-04-07', '2023-04-14', '2023-05-01',
+           '2023-06-29', '2023-08-15', '2023-09-19', '2023-10-02', '2023-10-24', '2023-11-14', '2023-11-27',
+           '2023-12-25'],
+    2024: ['2024-01-22', '2024-01-26', '2024-03-08', '2024-03-25', '2024-03-29', '2024-04-11', '2024-04-17',
+           '2024-05-01', '2024-05-20', '2024-06-17', '2024-07-17', '2024-08-15', '2024-10-02', '2024-11-01',
+           '2024-11-15', '2024-11-20', '2024-12-25'],
+    2025: ['2025-02-26', '2025-03-14', '2025-03-31', '2025-04-10', '2025-04-14', '2025-04-18', '2025-05-01',
+           '2025-08-15', '2025-08-27', '2025-10-02', '2025-10-21', '2025-10-22', '2025-11-05', '2025-12-25'],
+    2026: ['2026-01-15', '2026-01-26', '2026-03-03', '2026-03-26', '2026-03-31', '2026-04-03', '2026-04-14',
+           '2026-05-01', '2026-05-28', '2026-06-26', '2026-09-14', '2026-10-02', '2026-10-20', '2026-11-10',
+           '2026-11-24', '2026-12-25'],
+}
+
+# --- Sessions outside the regular timetable: date -> (open, close, kind); these override holidays ---
+SPECIAL_SESSIONS = {
+    '2023-11-12': (time(18, 15), time(19, 15), MUHURAT),
+    '2024-01-20': (MARKET_OPEN, MARKET_CLOSE, SPECIAL), # Saturday, full session in place of the 2024-01-22 closure
+    '2024-11-01': (time(18, 0), time(19, 0), MUHURAT),
+    '2025-02-01': (MARKET_OPEN, MARKET_CLOSE, SPECIAL), # Union Budget, Saturday
+    '2025-10-21': (time(13, 45), time(14, 45), MUHURAT),
+    '2026-02-01': (MARKET_OPEN, MARKET_CLOSE, SPECIAL), # Union Budget, Sunday
+    '2026-11-08': (time(18, 0), time(19, 0), MUHURAT), # provisional until the exchange circular
+}
+
+CALENDAR_START = date(2023, 1, 1)
+CALENDAR_END = date(2026, 12, 31)
+
+
+def _seconds(t):
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+def to_utc_ns(timestamps):
+    """Epoch nanoseconds (UTC) for tz-aware or naive exchange-local timestamps."""
+    index = pd.DatetimeIndex(timestamps)
+    if index.tz is None:
+        return index.as_unit('ns').asi8 - IST_OFFSET_SECONDS * 10**9
+    return index.tz_convert('UTC').as_unit('ns').asi8
+
+
+class TradingCalendar:
+    """Precomputed session table for one exchange. Sessions are open-inclusive, close-exclusive."""
+
+    def __init__(self, start=CALENDAR_START, end=CALENDAR_END, holidays=NSE_HOLIDAYS, special_sessions=SPECIAL_SESSIONS):
+        self.start, self.end = start, end
+        closed = {date.fromisoformat(day) for days in holidays.values() for day in days}
+        special = {date.fromisoformat(day): session for day, session in special_sessions.items()}
+
+        sessions = {}
+        day = start
+        while day <= end:
+            if day in special:
+                sessions[day] = special[day]
+            elif day.weekday() < 5 and day not in closed:
+                sessions[day] = (MARKET_OPEN, MARKET_CLOSE, REGULAR)
+            day += timedelta(days=1)
+        self.sessions = sessions # date -> (open time, close time, kind), for the scalar lookups
+
+        days = sorted(sessions)
+        self.days = np.array(days, dtype='datetime64[D]')
+        self.open_seconds = np.array([_seconds(sessions[day][0]) for day in days], dtype=np.int64)
+        self.close_seconds = np.array([_seconds(sessions[day][1]) for day in days], dtype=np.int64)
+        self.kinds = np.array([sessions[day][2] for day in days], dtype=object)
+        midnight_utc_ns = self.days.astype('datetime64[ns]').astype(np.int64) - IST_OFFSET_SECONDS * 10**9
+        self.open_ns = midnight_utc_ns + self.open_seconds * 10**9
+        self.close_ns = midnight_utc_ns + self.close_seconds * 10**9
+
+    # --- Scalar lookups (live agent, fetchers) ---
+    def covers(self, day):
+        return self.start <= day <= self.end
+
+    def session_times(self, day):
+        """(open time, close time, kind) for a day, or None if the exchange is closed."""
+        if isinstance(day, datetime):
+            day = day.date()
+        if self.covers(day):
+            return self.sessions.get(day)
+        return (MARKET_OPEN, MARKET_CLOSE, REGULAR) if day.weekday() < 5 else None
+
+    def is_trading_day(self, day):
+        return self.session_times(day) is not None
+
+    def trading_days(self, start, end):
+        """Every trading day from start to end, inclusive."""
+        days = []
+        day = start
+        while day <= end:
+            if self.is_trading_day(day):
+                days.append(day)
+            day += timedelta(days=1)
+        return days
+
+    def session_bounds(self, day):
+        """Tz-aware (open, close) Timestamps for a day, or None if the exchange is closed."""
+        session = self.session_times(day)
+        if session is None:
+            return None
+        return tuple(pd.Timestamp(datetime.combine(day, t)).tz_localize(EXCHANGE_TZ) for t in session[:2])
+
+    # --- Vectorized lookups (backtests, validators) ---
+    def session_of(self, timestamps):
+        """Position in self.days of the session each timestamp falls in, or -1 outside every session (and outside the covered years)."""
+        return self.session_of_ns(to_utc_ns(timestamps))
+
+    def session_of_ns(self, ns):
+        """session_of for UTC epoch nanoseconds."""
+        position = np.searchsorted(self.open_ns, ns, side='right') - 1
+        inside = (position >= 0) & (ns < self.close_ns[np.maximum(position, 0)])
+        return np.where(inside, position, -1)
+
+    def is_trading_minute(self, timestamps):
+        return self.session_of(timestamps) >= 0
+
+    def open_seconds_for(self, days, default=MARKET_OPEN_SECONDS):
+        """
+        Session open (seconds after local midnight) for each day in an array of dates. Days the table
+        has no session for (outside the covered years, or data the exchange printed anyway) get `default`.
+        """
+        days = np.asarray(days, dtype='datetime64[D]')
+        position = np.minimum(np.searchsorted(self.days, days), len(self.days) - 1)
+        known = self.days[position] == days
+        return np.where(known, self.open_seconds[position], default).astype(np.int64)
+
+    def expected_minutes_for(self, days):
+        """
+        Number of 1-minute bars each day's session should have: 0 on holidays and weekends, and a
+        regular 375 for weekdays outside the covered years.
+        """
+        days = np.asarray(days, dtype='datetime64[D]')
+        position = np.minimum(np.searchsorted(self.days, days), len(self.days) - 1)
+        known = self.days[position] == days
+        covered = (days >= np.datetime64(self.start)) & (days <= np.datetime64(self.end))
+        weekday = (days.astype(np.int64) + 3) % 7 # 1970-01-01 was a Thursday
+        regular = (MARKET_CLOSE_SECONDS - MARKET_OPEN_SECONDS) // 60
+        session_minutes = (self.close_seconds[position] - self.open_seconds[position]) // 60
+        return np.where(known, session_minutes, np.where(~covered & (weekday < 5), regular, 0)).astype(np.int64)
+
+
+NSE_CALENDAR = TradingCalendar()
@@ -0,0 +1,371 @@
+# FILE: mock_upstox_server.py
+"""
+Local stand-in for the Upstox market-data API, for testing the scanner and the live agent without
+market hours or an access token. Serves the same JSON shapes as the v2 API:
+
+    GET /v2/market-quote/ohlc?instrument_key=K1,K2,...&interval=I1
+    GET /v2/market-quote/ltp?instrument_key=K1,K2,...
+    GET /v2/historical-candle/intraday/{instrument_key}/1minute
+    GET /v2/historical-candle/{instrument_key}/1minute/{to_date}[/{from_date}]
+
+Quotes come from per-instrument random walks advanced once per wall-clock minute (QuoteBook), or from
+the candle sessions when a CandleBook is used for both. Candle sessions are synthetic random walks or
+days cut from the stored 1-minute CSVs, served on a clock: the intraday endpoint returns the candles
+that have closed by clock.now() plus the forming one as its opening print (never a stored candle's
+final prices before they exist), so with a ScaledClock a whole session plays out in minutes.
+A FaultInjector adds latency, random 500s, a 429 rate limit and timed 503 outages to every request.
+
+    python mock_upstox_server.py [port] [--speed 60] [--recorded hdfcbank_2yr_1m_data.csv ...]
+                                 [--latency-ms 50 --jitter-ms 20 --error-rate 0.01 --rate-limit 50]
+
+Point the scanner at http://127.0.0.1:<port>, and the live agent with UPSTOX_API_BASE=http://127.0.0.1:<port>.
+"""
+import argparse
+import json
+import logging
+import random
+import sys
+import threading
+import time
+import zlib
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+import numpy as np
+from agent_clock import SystemClock, ScaledClock
+from data_loader import load_candles
+from market_calendar import NSE_CALENDAR, EXCHANGE_TZ
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+MAX_KEYS_PER_REQUEST = 500 # Same limit as the real quote endpoints
+MINUTE_VOLATILITY = 0.0015
+CANDLE_INTERVAL = "1minute" # The only interval the candle endpoints serve
+CANDLE_SECONDS = 60
+IST_SUFFIX = "+05:30"
+
+
+class QuoteBook:
+    """Per-instrument random walks: the current minute's open/high/low/close and the session open."""
+
+    def __init__(self, seed=7, minute_seconds=60.0):
+        self.seed = seed
+        self.minute_seconds = minute_seconds
+        self.lock = threading.Lock()
+        self.state = {} # key -> [minute, open, high, low, close, day_open, rng]
+
+    def _minute(self):
+        return int(time.time() // self.minute_seconds)
+
+    def quote(self, key):
+        """Returns (open, high, low, last) of the current minute's bar plus the session open."""
+        minute = self._minute()
+        with self.lock:
+            entry = self.state.get(key)
+            if entry is None:
+                rng = np.random.default_rng(self.seed + zlib.crc32(key.encode()))
+                price = float(np.round(rng.uniform(50, 5000), 2))
+                entry = [minute - 1, price, price, price, price, price, rng]
+                self.state[key] = entry
+            # Roll the walk forward one bar per elapsed minute (capped, so a long idle gap stays cheap)
+            steps = min(minute - entry[0], 30)
+            rng = entry[6]
+            for _ in range(steps):
+                bar_open = entry[4]
+                path = bar_open * np.exp(np.cumsum(rng.normal(0, MINUTE_VOLATILITY / 2, 4)))
+                entry[1:5] = [bar_open, max(bar_open, path.max()), min(bar_open, path.min()), path[-1]]
+            entry[0] = minute
+            return tuple(round(value, 2) for value in entry[1:6])
+
+
+def quote_payload(book, keys, with_ohlc):
+    data = {}
+    for key in keys:
+        bar_open, high, low, last, _ = book.quote(key)
+        quote = {'last_price': last, 'instrument_token': key}
+        if with_ohlc:
+            quote['ohlc'] = {'open': bar_open, 'high': high, 'low': low, 'close': last}
+        data[key.replace('|', ':')] = quote
+    return {'status': 'success', 'data': data}
+
+
+# --- Candle sessions (intraday and historical endpoints) ---
+class SyntheticCandles:
+    """A deterministic random-walk session for any (instrument key, day): same key and day, same candles."""
+
+    def __init__(self, seed=7):
+        self.seed = seed
+
+    def session(self, key, day):
+        """(seconds after midnight of each candle, float64 array of open/high/low/close/volume) for the day's session."""
+        session = NSE_CALENDAR.session_times(day)
+        if session is None:
+            return np.empty(0, dtype=np.int64), np.empty((0, 5))
+        open_seconds = session[0].hour * 3600 + session[0].minute * 60
+        minutes = ((session[1].hour * 3600 + session[1].minute * 60) - open_seconds) // 60
+        key_seed = self.seed + zlib.crc32(key.encode())
+        base = np.random.default_rng(key_seed).uniform(50, 5000) # Same starting level as the QuoteBook walk
+        rng = np.random.default_rng([key_seed, day.toordinal()])
+        day_open = base * np.exp(rng.normal(0, 0.01))
+        # Four steps per bar: open -> ... -> close, so the high and low sit inside the bar's own path
+        path = day_open * np.exp(np.cumsum(rng.normal(0, MINUTE_VOLATILITY / 2, minutes * 4))).reshape(minutes, 4)
+        close = path[:, -1]
+        bar_open = np.concatenate(([day_open], close[:-1]))
+        values = np.column_stack((bar_open, np.maximum(bar_open, path.max(axis=1)), np.minimum(bar_open, path.min(axis=1)),
+                                  close, rng.integers(1000, 50000, minutes)))
+        return open_seconds + 60 * np.arange(minutes, dtype=np.int64), values
+
+
+class RecordedCandles:
+    """
+    Sessions cut from stored 1-minute candle CSVs. Every (key, day) replays one recorded session,
+    picked by a hash of both, re-dated to the requested day, so hundreds of keys can be served from a
+    few files and each still sees real intraday price and volume paths.
+    """
+
+    def __init__(self, paths):
+        self.sessions = []
+        for path in paths:
+            df = load_candles(path)
+            local = df.index.tz_convert(EXCHANGE_TZ)
+            seconds = (local.hour * 3600 + local.minute * 60 + local.second).to_numpy(dtype=np.int64)
+            values = df[['open', 'high', 'low', 'close', 'volume']].to_numpy(dtype=np.float64)
+            days = local.normalize().asi8
+            starts = np.flatnonzero(np.diff(days, prepend=days[0] - 1))
+            for start, end in zip(starts, np.append(starts[1:], len(days))):
+                self.sessions.append((seconds[start:end], values[start:end]))
+        if not self.sessions:
+            raise ValueError(f"No candles in {paths}")
+        logger.info(f"Loaded {len(self.sessions)} recorded sessions from {len(paths)} file(s)")
+
+    def session(self, key, day):
+        if NSE_CALENDAR.session_times(day) is None:
+            return np.empty(0, dtype=np.int64), np.empty((0, 5))
+        return self.sessions[(zlib.crc32(key.encode()) + day.toordinal()) % len(self.sessions)]
+
+
+def candle_rows(day, seconds, values):
+    """Candles in the API's row format, oldest first: [timestamp, open, high, low, close, volume, oi]."""
+    prices = np.round(values[:, :4], 2).tolist()
+    volumes = values[:, 4].astype(np.int64).tolist()
+    prefix = day.isoformat()
+    return [[f"{prefix}T{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}{IST_SUFFIX}", *price, volume, 0]
+            for second, price, volume in zip(seconds.tolist(), prices, volumes)]
+
+
+class CandleBook:
+    """
+    Serves candle sessions on a clock. Today's sessions are formatted once and cached, so an intraday
+    request is a binary search plus a slice; historical days are built on demand and not kept.
+    """
+
+    def __init__(self, source=None, clock=None):
+        self.source = source or SyntheticCandles()
+        self.clock = clock or SystemClock()
+        self.lock = threading.Lock()
+        self.day = None
+        self.today_sessions = {} # key -> (seconds, rows)
+
+    def _today(self, key, day):
+        with self.lock:
+            if day != self.day:
+                self.day, self.today_sessions = day, {}
+            cached = self.today_sessions.get(key)
+        if cached is None:
+            seconds, values = self.source.session(key, day)
+            cached = (seconds, candle_rows(day, seconds, values))
+            with self.lock:
+                self.today_sessions[key] = cached
+        return cached
+
+    def _opened(self, key):
+        """
+        Today's rows that have opened by now, oldest first. Closed candles are served as stored; the one
+        still forming only as its opening print (volume pro rata to the elapsed seconds), because its
+        stored high, low and close are not known yet at `now`.
+        """
+        now = self.clock.now()
+        seconds, rows = self._today(key, now.date())
+        elapsed = now.hour * 3600 + now.minute * 60 + now.second
+        opened = int(np.searchsorted(seconds, elapsed, side='right'))
+        if opened == 0 or seconds[opened - 1] + CANDLE_SECONDS <= elapsed:
+            return rows[:opened]
+        stamp, bar_open, _, _, _, volume, oi = rows[opened - 1]
+        forming = [stamp, bar_open, bar_open, bar_open, bar_open, volume * (elapsed - int(seconds[opened - 1])) // CANDLE_SECONDS, oi]
+        return rows[:opened - 1] + [forming]
+
+    def intraday(self, key):
+        return self._opened(key)[::-1] # Newest first, like the real endpoint
+
+    def historical(self, key, to_day, from_day):
+        """Complete sessions from from_day to to_day (never today's), newest first."""
+        to_day = min(to_day, self.clock.now().date() - timedelta(days=1))
+        rows = []
+        for day in reversed(NSE_CALENDAR.trading_days(from_day, to_day)):
+            rows.extend(candle_rows(day, *self.source.session(key, day))[::-1])
+        return rows
+
+    def quote(self, key):
+        """Same shape as QuoteBook.quote: the current candle's (open, high, low, last) plus the session open."""
+        opened = self._opened(key)
+        if not opened:
+            _, rows = self._today(key, self.clock.now().date())
+            if not rows:
+                return (0.0,) * 5
+            return (rows[0][1],) * 5 # Before the open, only the opening price is quoted
+        _, bar_open, high, low, last = opened[-1][:5]
+        return bar_open, high, low, last, opened[0][1]
+
+
+# --- Fault injection ---
+class FaultInjector:
+    """
+    Per-request latency (fixed plus uniform jitter), random 500 errors, a token-bucket rate limit
+    answered with 429s, and outages during which every request gets a 503. All in wall-clock seconds,
+    whatever clock the candles run on.
+    """
+
+    def __init__(self, latency_seconds=0.0, jitter_seconds=0.0, error_rate=0.0, rate_limit=None, seed=11):
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit # requests per second, burst of one second's worth
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.tokens = rate_limit or 0.0
+        self.refilled = time.monotonic()
+        self.down_until = 0.0
+        self.counts = {'requests': 0, 'throttled': 0, 'errors': 0, 'outage': 0}
+
+    def fail_for(self, seconds):
+        """Starts an outage: every request in the next `seconds` is answered with a 503."""
+        with self.lock:
+            self.down_until = time.monotonic() + seconds
+
+    def admit(self):
+        """Applies the faults to one request: None to serve it, or (status, message) to fail it."""
+        with self.lock:
+            self.counts['requests'] += 1
+            now = time.monotonic()
+            if now < self.down_until:
+                self.counts['outage'] += 1
+                return 503, "Service Unavailable"
+            if self.rate_limit:
+                self.tokens = min(self.rate_limit, self.tokens + (now - self.refilled) * self.rate_limit)
+                self.refilled = now
+                if self.tokens < 1.0:
+                    self.counts['throttled'] += 1
+                    return 429, "Too Many Requests"
+                self.tokens -= 1.0
+            delay = self.latency_seconds + self.rng.uniform(0, self.jitter_seconds)
+            failed = self.rng.random() < self.error_rate
+            if failed:
+                self.counts['errors'] += 1
+        if delay > 0:
+            time.sleep(delay)
+        return (500, "Internal Server Error") if failed else None
+
+
+def make_handler(book, candles, faults=None):
+    class MockHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1' # keep-alive, like the real API
+        disable_nagle_algorithm = True # headers and body go out as separate writes; without this each keep-alive request stalls ~40 ms on delayed ACKs
+
+        def _send(self, status, payload):
+            body = json.dumps(payload, separators=(',', ':')).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _error(self, status, message):
+            self._send(status, {'status': 'error', 'errors': [{'message': message}]})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [unquote(part) for part in url.path.split('/')[2:]] # after '/v2/'
+            if faults is not None:
+                failure = faults.admit()
+                if failure is not None:
+                    self._error(*failure)
+                    return
+            if parts[:1] == ['market-quote'] and parts[1:] in (['ohlc'], ['ltp']):
+                self._quotes(url, with_ohlc=parts[1] == 'ohlc')
+            elif parts[:2] == ['historical-candle', 'intraday'] and len(parts) == 4:
+                self._candles(parts[3], lambda: candles.intraday(parts[2]))
+            elif parts[:1] == ['historical-candle'] and len(parts) in (4, 5):
+                # Without a from_date the fetchers ask for the one session ending at to_date
+                try:
+                    to_day = date.fromisoformat(parts[3])
+                    from_day = date.fromisoformat(parts[4]) if len(parts) == 5 else to_day
+                except ValueError:
+                    self._error(400, "Invalid date")
+                    return
+                self._candles(parts[2], lambda: candles.historical(parts[1], to_day, from_day))
+            else:
+                self._error(404, "Not Found")
+
+        def _quotes(self, url, with_ohlc):
+            keys = [key for value in parse_qs(url.query).get('instrument_key', []) for key in value.split(',') if key]
+            if not keys or len(keys) > MAX_KEYS_PER_REQUEST:
+                self._error(400, f"Between 1 and {MAX_KEYS_PER_REQUEST} instrument keys are allowed")
+                return
+            self._send(200, quote_payload(book, keys, with_ohlc))
+
+        def _candles(self, interval, fetch):
+            if interval != CANDLE_INTERVAL:
+                self._error(400, f"Only the {CANDLE_INTERVAL} interval is served by the mock")
+                return
+            self._send(200, {'status': 'success', 'data': {'candles': fetch()}})
+
+        def log_message(self, *args):
+            pass
+
+    return MockHandler
+
+
+def start_mock_server(port=DEFAULT_PORT, host="127.0.0.1", book=None, candles=None, faults=None):
+    """Starts the mock API on a daemon thread and returns the server (port=0 picks a free port)."""
+    server = ThreadingHTTPServer((host, port), make_handler(book or QuoteBook(), candles or CandleBook(), faults))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-upstox", daemon=True).start()
+    return server
+
+
+def session_clock(speed, day=None):
+    """A ScaledClock that starts at the open of the latest trading session on or before `day` (default today)."""
+    day = day or date.today()
+    while NSE_CALENDAR.session_times(day) is None:
+        day -= timedelta(days=1)
+    return ScaledClock(datetime.combine(day, NSE_CALENDAR.session_times(day)[0]), speed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local mock of the Upstox quote and candle endpoints")
+    parser.add_argument('port', nargs='?', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--speed', type=float, help="play the latest session from its open, this many times faster than real time")
+    parser.add_argument('--recorded', nargs='+', metavar='CSV', help="serve sessions cut from these candle CSVs instead of synthetic walks")
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with a 500")
+    parser.add_argument('--rate-limit', type=float, help="requests per second before 429s")
+    args = parser.parse_args(argv)
+
+    candles = CandleBook(RecordedCandles(args.recorded) if args.recorded else SyntheticCandles(),
+                         session_clock(args.speed) if args.speed else SystemClock())
+    faults = FaultInjector(args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate, args.rate_limit)
+    # On a sped-up clock the quotes follow the candle sessions too
+    server = start_mock_server(args.port, book=candles if args.speed else None, candles=candles, faults=faults)
+    logger.info(f"Mock Upstox API on http://127.0.0.1:{server.server_address[1]} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,246 @@
+# FILE: orb_scanner.py
+"""
+Universe-wide Opening Range Breakout scanner. Instead of one live agent per symbol polling the
+intraday candle endpoint, it pulls the current 1-minute OHLC and LTP for up to 500 instruments per
+request from the multi-instrument quote endpoint, folds them into per-symbol opening ranges held in
+flat NumPy arrays, and after the range closes ranks every breakout across the universe once a minute.
+
+    python orb_scanner.py                              # live, NSE equities from upstox_complete_instruments.csv
+    python orb_scanner.py --mock 1800                  # against mock_upstox_server.py with 1,800 synthetic keys
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import requests
+from dotenv import load_dotenv
+from agent_clock import SystemClock
+from agent_scheduler import MinuteScheduler
+from market_calendar import NSE_CALENDAR
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+API_BASE_URL = "https://api.upstox.com"
+OHLC_PATH = "/v2/market-quote/ohlc"
+MAX_KEYS_PER_REQUEST = 500
+REQUEST_WORKERS = 4
+REQUEST_TIMEOUT_SECONDS = 10
+INSTRUMENT_FILE = "upstox_complete_instruments.csv"
+SCANNER_STATUS_FILE = "scanner_status.json"
+RANGE_MINUTES = 30
+TOP_N = 20
+
+
+class RangeStore:
+    """Opening range, last price and first-breakout state for every instrument, one array slot per key."""
+
+    def __init__(self, keys):
+        self.keys = np.asarray(keys, dtype=object)
+        self.position = {key: i for i, key in enumerate(self.keys)}
+        self.reset()
+
+    def reset(self):
+        n = len(self.keys)
+        self.range_high = np.full(n, -np.inf)
+        self.range_low = np.full(n, np.inf)
+        self.last_price = np.full(n, np.nan)
+        self.breakout = np.zeros(n, dtype=np.int8) # +1 broke above, -1 broke below, 0 not yet (one signal per day)
+        self.breakout_price = np.full(n, np.nan)
+        self.breakout_time = np.full(n, None, dtype=object)
+
+    def positions_for(self, keys):
+        return np.fromiter((self.position.get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+
+    def update_range(self, positions, high, low):
+        np.maximum.at(self.range_high, positions, high)
+        np.minimum.at(self.range_low, positions, low)
+
+    def update_prices(self, positions, last_price, now):
+        """Records the latest prices and latches the first breakout of each symbol's range."""
+        self.last_price[positions] = last_price
+        has_range = np.isfinite(self.range_high) & np.isfinite(self.range_low)
+        fresh = (self.breakout == 0) & has_range
+        above = fresh & (self.last_price > self.range_high)
+        below = fresh & (self.last_price < self.range_low)
+        self.breakout[above] = 1
+        self.breakout[below] = -1
+        new = above | below
+        self.breakout_price[new] = self.last_price[new]
+        self.breakout_time[new] = now
+        return int(new.sum())
+
+    def ranked(self, top_n=TOP_N):
+        """Breakouts so far, strongest move beyond the range (as % of the range width) first."""
+        chosen = np.flatnonzero(self.breakout != 0)
+        if not len(chosen):
+            return pd.DataFrame(columns=['instrument_key', 'signal', 'range_high', 'range_low', 'last_price', 'move_pct', 'strength', 'breakout_time'])
+        high, low, last = self.range_high[chosen], self.range_low[chosen], self.last_price[chosen]
+        direction = self.breakout[chosen]
+        edge = np.where(direction > 0, high, low)
+        move = direction * (last - edge)
+        width = np.maximum(high - low, 1e-9)
+        order = np.argsort(-(move / width), kind='stable')[:top_n]
+        return pd.DataFrame({
+            'instrument_key': self.keys[chosen][order],
+            'signal': np.where(direction[order] > 0, 'BUY', 'SELL'),
+            'range_high': high[order],
+            'range_low': low[order],
+            'last_price': last[order],
+            'move_pct': (move / edge * 100)[order],
+            'strength': (move / width)[order],
+            'breakout_time': self.breakout_time[chosen][order],
+        })
+
+
+class QuoteClient:
+    """Fetches OHLC/LTP quotes for any number of keys in concurrent batches over a keep-alive session."""
+
+    def __init__(self, base_url=API_BASE_URL, access_token=None, batch_size=MAX_KEYS_PER_REQUEST, workers=REQUEST_WORKERS):
+        self.url = base_url.rstrip('/') + OHLC_PATH
+        self.batch_size = batch_size
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Accept': 'application/json'})
+        if access_token:
+            self.session.headers['Authorization'] = f"Bearer {access_token}"
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="quotes")
+
+    def _fetch_batch(self, keys):
+        response = self.session.get(self.url, params={'instrument_key': ','.join(keys), 'interval': 'I1'}, timeout=REQUEST_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        quotes = response.json()['data'].values()
+        tokens, high, low, last = [], [], [], []
+        for quote in quotes:
+            ohlc = quote.get('ohlc') or {}
+            tokens.append(quote['instrument_token'])
+            last.append(quote.get('last_price', np.nan))
+            high.append(ohlc.get('high', np.nan))
+            low.append(ohlc.get('low', np.nan))
+        return tokens, high, low, last
+
+    def fetch(self, keys):
+        """Returns (instrument_keys, high, low, last_price) for every key that came back, in no particular order."""
+        batches = [keys[i:i + self.batch_size] for i in range(0, len(keys), self.batch_size)]
+        tokens, high, low, last = [], [], [], []
+        for batch_tokens, batch_high, batch_low, batch_last in self.pool.map(self._fetch_batch, batches):
+            tokens.extend(batch_tokens)
+            high.extend(batch_high)
+            low.extend(batch_low)
+            last.extend(batch_last)
+        return tokens, np.asarray(high, dtype=np.float64), np.asarray(low, dtype=np.float64), np.asarray(last, dtype=np.float64)
+
+
+def load_universe_keys(path=INSTRUMENT_FILE, exchange="NSE_EQ", instrument_type="EQ"):
+    """Instrument keys of every listed equity in the Upstox instrument master."""
+    df = pd.read_csv(path, usecols=['instrument_key', 'exchange', 'instrument_type'])
+    df.columns = df.columns.str.strip()
+    selected = df[(df['exchange'] == exchange) & (df['instrument_type'] == instrument_type)]
+    return selected['instrument_key'].dropna().unique().tolist()
+
+
+def synthetic_keys(count):
+    return [f"NSE_EQ|MOCK{i:05d}" for i in range(count)]
+
+
+def scan_once(store, client, now, minutes_open, range_minutes=RANGE_MINUTES):
+    """
+    One scanner cycle: fetch every quote, then grow the ranges or latch breakouts. Like OrbStrategy
+    and the kernel, the range runs through the bar that opens range_minutes into the session (09:15
+    to 09:45 inclusive for 30), and breakouts count from the next bar on.
+    Returns (phase, new breakouts, fetch seconds).
+    """
+    started = time.perf_counter()
+    tokens, high, low, last = client.fetch(store.keys.tolist())
+    fetch_seconds = time.perf_counter() - started
+
+    positions = store.positions_for(tokens)
+    known = positions >= 0
+    positions, high, low, last = positions[known], high[known], low[known], last[known]
+
+    if minutes_open <= range_minutes:
+        valid = np.isfinite(high) & np.isfinite(low)
+        store.update_range(positions[valid], high[valid], low[valid])
+        store.last_price[positions] = last
+        return "DEFINING_RANGE", 0, fetch_seconds
+    return "SCANNING", store.update_prices(positions, last, now), fetch_seconds
+
+
+def write_scanner_status(path, now, phase, store, ranked):
+    status = {
+        'timestamp': now.strftime('%Y-%m-%d %H:%M:%S'),
+        'phase': phase,
+        'universe': len(store.keys),
+        'breakouts_up': int((store.breakout > 0).sum()),
+        'breakouts_down': int((store.breakout < 0).sum()),
+        'top': json.loads(ranked.assign(breakout_time=ranked['breakout_time'].astype(str)).to_json(orient='records')),
+    }
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(status, f)
+    os.replace(temp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Universe-wide ORB breakout scanner")
+    parser.add_argument('--base-url', default=os.getenv("UPSTOX_API_BASE", API_BASE_URL))
+    parser.add_argument('--mock', type=int, metavar='N', help="scan N synthetic keys against a local mock_upstox_server.py")
+    parser.add_argument('--top', type=int, default=TOP_N)
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    if args.mock:
+        keys = synthetic_keys(args.mock)
+        base_url = args.base_url if args.base_url != API_BASE_URL else "http://127.0.0.1:8765"
+    else:
+        keys = load_universe_keys()
+        base_url = args.base_url
+
+    clock = SystemClock()
+    scheduler = MinuteScheduler(clock)
+    store = RangeStore(keys)
+    client = QuoteClient(base_url, access_token=os.getenv("UPSTOX_ACCESS_TOKEN"))
+    today = clock.today()
+    session = NSE_CALENDAR.session_times(today)
+    # The mock session opens when the scanner starts, so it can be exercised at any time of day
+    session_open = clock.now().replace(second=0, microsecond=0) if args.mock or not session else datetime.combine(today, session[0])
+    logger.info(f"--- ORB Scanner: {len(keys)} instruments, {-(-len(keys) // MAX_KEYS_PER_REQUEST)} requests per cycle via {base_url} ---")
+
+    while True:
+        scheduler.wait()
+        now = clock.now()
+        if clock.today() != today:
+            today = clock.today()
+            store.reset()
+            session = NSE_CALENDAR.session_times(today)
+            session_open = datetime.combine(today, session[0]) if session else now
+            logger.info(f"--- New Day Detected: {today}. Ranges reset. ---")
+        if not args.mock and not (session and session[0] <= now.time() < session[1]):
+            continue
+        try:
+            cycle_started = time.perf_counter()
+            minutes_open = int((now - session_open).total_seconds() // 60)
+            phase, new_breakouts, fetch_seconds = scan_once(store, client, now, minutes_open)
+            ranked = store.ranked(args.top)
+            write_scanner_status(SCANNER_STATUS_FILE, now, phase, store, ranked)
+            logger.info(f"{phase}: fetched {len(keys)} quotes in {fetch_seconds:.2f}s, cycle {time.perf_counter() - cycle_started:.2f}s, "
+                        f"{new_breakouts} new breakouts, {int((store.breakout != 0).sum())} total")
+            if new_breakouts:
+                print(ranked.to_string(index=False))
+        except requests.RequestException as e:
+            logger.error(f"Quote request failed: {e}")
+        except Exception as e:
+            logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,408 @@
+# FILE: paper_broker.py
+"""
+Paper execution engine. Orders are submitted without blocking and reach the simulated exchange after
+a latency model's delay; each instrument has an in-memory book of resting limit and stop orders that
+is matched against every incoming bar (or tick, as a bar with open = high = low = close).
+
+- Latency: an order only trades in bars that end after it becomes active.
+- Fills: market orders fill at the bar open, limits at their price (or a better open), and stops at
+  the trigger (or a worse open). Per bar, each instrument can fill at most `participation` x the bar's
+  volume. Anything left rests, as a partial fill, until the next bar.
+- Slippage: market and triggered-stop fills move against the order by a fixed fraction, plus an impact
+  term that grows with the filled share of the bar's volume.
+
+submit() returns an Order at once. Fills arrive through subscribe() callbacks, and order.future
+resolves when the order is done (filled, cancelled or rejected). Both the live agent (OrbAgent(broker=...))
+and the backtester (calculate_performance_paper) can route orders through it.
+
+    python paper_broker.py [orders] [instruments]    # throughput benchmark
+"""
+import heapq
+import itertools
+import logging
+import random
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import Future
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BUY, SELL = 'BUY', 'SELL'
+MARKET, LIMIT, STOP = 'MARKET', 'LIMIT', 'STOP' # STOP is a stop-market (SL-M) order
+OPEN, PARTIAL, FILLED, CANCELLED, REJECTED = 'OPEN', 'PARTIAL', 'FILLED', 'CANCELLED', 'REJECTED'
+DONE_STATES = (FILLED, CANCELLED, REJECTED)
+BAR_SECONDS = 60
+
+Fill = namedtuple('Fill', ['order_id', 'instrument', 'side', 'quantity', 'price', 'timestamp', 'tag'])
+
+
+def to_seconds(timestamp):
+    """Epoch seconds for the broker clock from a number, an ISO string, a datetime or a pandas Timestamp."""
+    if isinstance(timestamp, (int, float, np.number)):
+        return float(timestamp)
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return timestamp.timestamp()
+
+
+# --- Models ---
+class FixedLatency:
+    def __init__(self, seconds=0.2):
+        self.seconds = seconds
+
+    def __call__(self, order):
+        return self.seconds
+
+
+class RandomLatency:
+    """Base latency plus exponential jitter, e.g. a 150 ms round trip with an occasional slow ack."""
+
+    def __init__(self, base_seconds=0.15, mean_jitter_seconds=0.05, seed=7):
+        self.base_seconds = base_seconds
+        self.mean_jitter_seconds = mean_jitter_seconds
+        self.rng = random.Random(seed)
+
+    def __call__(self, order):
+        return self.base_seconds + self.rng.expovariate(1.0 / self.mean_jitter_seconds)
+
+
+class FractionSlippage:
+    """Fill price moved against the order by `fraction` plus `impact` x (filled quantity / bar volume)."""
+
+    def __init__(self, fraction=0.0005, impact=0.0):
+        self.fraction = fraction
+        self.impact = impact
+
+    def __call__(self, price, side, quantity, volume):
+        cost = self.fraction + (self.impact * quantity / volume if self.impact and volume else 0.0)
+        return price * (1 + cost) if side == BUY else price * (1 - cost)
+
+
+class VolumeParticipation:
+    """At most `participation` of each bar's volume is available to this broker's orders (None: no cap)."""
+
+    def __init__(self, participation=0.1):
+        self.participation = participation
+
+    def capacity(self, volume):
+        if self.participation is None or volume is None:
+            return float('inf')
+        return self.participation * volume
+
+
+# --- Orders and books ---
+class Order:
+    __slots__ = ('order_id', 'instrument', 'side', 'quantity', 'order_type', 'price', 'tag', 'submitted_at',
+                 'active_at', 'status', 'filled', 'avg_price', 'brokerage', 'future')
+
+    def __init__(self, order_id, instrument, side, quantity, order_type, price, tag, submitted_at, active_at):
+        self.order_id = order_id
+        self.instrument = instrument
+        self.side = side
+        self.quantity = quantity
+        self.order_type = order_type
+        self.price = price # limit price, or trigger price for stops
+        self.tag = tag
+        self.submitted_at = submitted_at
+        self.active_at = active_at
+        self.status = OPEN
+        self.filled = 0.0
+        self.avg_price = 0.0
+        self.brokerage = 0.0
+        self.future = Future()
+
+    @property
+    def remaining(self):
+        return self.quantity - self.filled
+
+    def __repr__(self):
+        return (f"Order({self.order_id} {self.side} {self.quantity:g} {self.instrument} {self.order_type}"
+                f"{'' if self.price is None else f' @{self.price:.2f}'} {self.status} filled={self.filled:g})")
+
+
+class OrderBook:
+    """One instrument's working orders: in-flight (latency) orders, market orders and priced resting orders."""
+
+    def __init__(self):
+        self.in_flight = [] # heap of (active_at, seq, order)
+        self.market = deque()
+        # Priced heaps, best first: buy limits by highest price, sell limits by lowest,
+        # buy stops by lowest trigger, sell stops by highest trigger
+        self.buy_limits, self.sell_limits, self.buy_stops, self.sell_stops = [], [], [], []
+
+    def rest(self, order, seq):
+        if order.order_type == MARKET:
+            self.market.append(order)
+        elif order.order_type == LIMIT:
+            heapq.heappush(*((self.buy_limits, (-order.price, seq, order)) if order.side == BUY else (self.sell_limits, (order.price, seq, order))))
+        else:
+            heapq.heappush(*((self.buy_stops, (order.price, seq, order)) if order.side == BUY else (self.sell_stops, (-order.price, seq, order))))
+
+    def working(self):
+        return len(self.in_flight) + len(self.market) + len(self.buy_limits) + len(self.sell_limits) + len(self.buy_stops) + len(self.sell_stops)
+
+
+class PaperBroker:
+    def __init__(self, latency=None, slippage=None, fill_model=None, brokerage_per_order=0.0):
+        self.latency = latency or FixedLatency(0.0)
+        self.slippage = slippage or FractionSlippage(0.0)
+        self.fill_model = fill_model or VolumeParticipation(None)
+        self.brokerage_per_order = brokerage_per_order
+        self.books = {}
+        self.orders = {}
+        self.positions = {} # instrument -> net quantity
+        self.cash_flow = 0.0 # cash paid/received for fills, net of brokerage
+        self.subscribers = []
+        self.lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self.fills = 0
+
+    def subscribe(self, callback):
+        """callback(fill, order) is called for every fill, after the order's state is updated."""
+        self.subscribers.append(callback)
+
+    def book(self, instrument):
+        book = self.books.get(instrument)
+        if book is None:
+            book = self.books[instrument] = OrderBook()
+        return book
+
+    # --- Order entry ---
+    def submit(self, instrument, side, quantity, order_type=MARKET, price=None, timestamp=0.0, tag=None):
+        """Queues an order (it trades once its latency has elapsed) and returns it immediately."""
+        now = to_seconds(timestamp)
+        order = Order(next(self._ids), instrument, side, float(quantity), order_type, price, tag, now, now)
+        with self.lock:
+            self.orders[order.order_id] = order
+            if quantity <= 0 or side not in (BUY, SELL) or (order_type != MARKET and price is None):
+                self._finish(order, REJECTED)
+                return order
+            order.active_at = now + self.latency(order)
+            heapq.heappush(self.book(instrument).in_flight, (order.active_at, next(self._seq), order))
+        return order
+
+    def cancel(self, order_id):
+        """Cancels the unfilled remainder of an order. Returns False if it was already done."""
+        with self.lock:
+            order = self.orders.get(order_id)
+            if order is None or order.status in DONE_STATES:
+                return False
+            # Cancelled orders stay in their heap and are dropped lazily when they surface
+            self._finish(order, CANCELLED)
+            return True
+
+    def cancel_all(self, instrument=None):
+        with self.lock:
+            for order in list(self.orders.values()):
+                if order.status not in DONE_STATES and (instrument is None or order.instrument == instrument):
+                    self._finish(order, CANCELLED)
+
+    def _finish(self, order, status):
+        order.status = status
+        del self.orders[order.order_id] # Only working orders are kept
+        order.future.set_result(order)
+
+    # --- Market data ---
+    def on_bar(self, instrument, timestamp, open_, high, low, close, volume=None, bar_seconds=BAR_SECONDS):
+        """Matches the instrument's working orders against one bar starting at `timestamp`. Returns the fills."""
+        start = to_seconds(timestamp)
+        end = start + bar_seconds
+        book = self.books.get(instrument)
+        if book is None or not book.working():
+            return []
+        fills = []
+        with self.lock:
+            while book.in_flight and book.in_flight[0][0] < end:
+                _, seq, order = heapq.heappop(book.in_flight)
+                if order.status not in DONE_STATES:
+                    book.rest(order, seq)
+            capacity = [self.fill_model.capacity(volume)]
+
+            # Market orders take the open, then stops that the bar's range triggers, then limits it touches
+            while book.market and capacity[0] > 0:
+                order = book.market[0]
+                if order.status not in DONE_STATES:
+                    self._fill(order, self.slippage(open_, order.side, order.remaining, volume), start, capacity, volume, fills)
+                if order.status in DONE_STATES:
+                    book.market.popleft()
+            self._match(book.buy_stops, lambda key: high >= key, lambda trigger: max(trigger, open_), True, start, capacity, volume, fills)
+            self._match(book.sell_stops, lambda key: low <= -key, lambda trigger: min(trigger, open_), True, start, capacity, volume, fills)
+            self._match(book.buy_limits, lambda key: low <= -key, lambda limit: min(limit, open_), False, start, capacity, volume, fills)
+            self._match(book.sell_limits, lambda key: high >= key, lambda limit: max(limit, open_), False, start, capacity, volume, fills)
+        return fills
+
+    def on_tick(self, instrument, timestamp, price, volume=None):
+        return self.on_bar(instrument, timestamp, price, price, price, price, volume, bar_seconds=0)
+
+    def _match(self, heap, crosses, fill_price, slipped, timestamp, capacity, volume, fills):
+        while heap and capacity[0] > 0:
+            key, _, order = heap[0]
+            if order.status in DONE_STATES:
+                heapq.heappop(heap)
+                continue
+            if not crosses(key):
+                return
+            price = fill_price(order.price)
+            if slipped:
+                price = self.slippage(price, order.side, order.remaining, volume)
+            self._fill(order, price, timestamp, capacity, volume, fills)
+            if order.status in DONE_STATES:
+                heapq.heappop(heap)
+            elif slipped:
+                # A triggered stop is a market order from now on, so its remainder queues with them
+                heapq.heappop(heap)
+                self.books[order.instrument].market.append(order)
+
+    def _fill(self, order, price, timestamp, capacity, volume, fills):
+        quantity = min(order.remaining, capacity[0])
+        capacity[0] -= quantity
+        order.avg_price = (order.avg_price * order.filled + price * quantity) / (order.filled + quantity)
+        if order.filled == 0:
+            order.brokerage = self.brokerage_per_order
+            self.cash_flow -= self.brokerage_per_order
+        order.filled += quantity
+        signed = quantity if order.side == BUY else -quantity
+        self.positions[order.instrument] = self.positions.get(order.instrument, 0.0) + signed
+        self.cash_flow -= signed * price
+        self.fills += 1
+        fill = Fill(order.order_id, order.instrument, order.side, quantity, price, timestamp, order.tag)
+        fills.append(fill)
+        if order.remaining <= 1e-9:
+            self._finish(order, FILLED)
+        else:
+            order.status = PARTIAL
+        for callback in self.subscribers:
+            callback(fill, order)
+
+
+# --- Backtester route ---
+def calculate_performance_paper(df_with_signals, starting_cash, brokerage, slippage, stop_loss_pct, take_profit_pct,
+                                broker=None, instrument="SYMBOL", bar_seconds=BAR_SECONDS):
+    """
+    calculate_performance_with_exits with every order routed through a PaperBroker: entries are
+    market orders sent at the signal bar's close (so they fill on a later bar), exits are a resting
+    stop-loss and take-profit pair (one cancels the other), opposite signals send a market exit.
+    Returns (cash, df_trades) in the same shape as the other performance engines.
+    """
+    broker = broker or PaperBroker(slippage=FractionSlippage(slippage), brokerage_per_order=brokerage)
+    starts = df_with_signals.index.tz_convert('UTC').as_unit('ns').asi8 / 1e9 if df_with_signals.index.tz is not None \
+        else df_with_signals.index.as_unit('ns').asi8 / 1e9
+    bars = df_with_signals[['open', 'high', 'low', 'close', 'volume']].to_numpy(dtype=np.float64)
+    signals = df_with_signals['signal'].to_numpy()
+    index = df_with_signals.index
+
+    cash = starting_cash
+    state = {'entry': None, 'exits': [], 'trade': None, 'position': 0.0}
+    trades = []
+
+    def on_fill(fill, order):
+        nonlocal cash
+        cash -= (fill.quantity * fill.price) if fill.side == BUY else -(fill.quantity * fill.price)
+        if order.filled == fill.quantity:
+            cash -= order.brokerage
+        trade = state['trade']
+        if order.tag == 'ENTRY':
+            state['position'] += fill.quantity
+            if trade is None:
+                trade = state['trade'] = {'entry_date': bar_time[0], 'entry_price': 0.0, 'shares': 0.0, 'exit_value': 0.0, 'exit_shares': 0.0}
+            trade['entry_price'] = order.avg_price
+            trade['shares'] = order.filled
+        else:
+            state['position'] -= fill.quantity
+            trade['exit_value'] += fill.quantity * fill.price
+            trade['exit_shares'] += fill.quantity
+            if state['position'] <= 1e-9:
+                exit_price = trade['exit_value'] / trade['exit_shares']
+                trades.append({'entry_date': trade['entry_date'], 'entry_price': trade['entry_price'], 'shares': trade['shares'],
+                               'exit_date': bar_time[0], 'exit_price': exit_price,
+                               'profit': (exit_price - trade['entry_price']) * trade['shares'], 'exit_reason': order.tag})
+                state['trade'] = None
+                state['position'] = 0.0
+                for other in state['exits']:
+                    broker.cancel(other.order_id)
+                state['exits'] = []
+
+    broker.subscribe(on_fill)
+    bar_time = [None]
+    for i in range(len(bars)):
+        bar_time[0] = index[i]
+        open_, high, low, close, volume = bars[i]
+        broker.on_bar(instrument, starts[i], open_, high, low, close, volume, bar_seconds)
+        decided_at = starts[i] + bar_seconds
+
+        # Protect whatever the entry has filled so far with a stop-loss/take-profit pair for that quantity
+        entry = state['entry']
+        if entry is not None and state['position'] > 0 and state['trade'] is not None:
+            protected = sum(order.remaining for order in state['exits'] if order.tag == 'STOP_LOSS')
+            if abs(protected - state['position']) > 1e-9:
+                for order in state['exits']:
+                    broker.cancel(order.order_id)
+                entry_price = state['trade']['entry_price']
+                state['exits'] = [
+                    broker.submit(instrument, SELL, state['position'], STOP, entry_price * (1 - stop_loss_pct), decided_at, 'STOP_LOSS'),
+                    broker.submit(instrument, SELL, state['position'], LIMIT, entry_price * (1 + take_profit_pct), decided_at, 'TAKE_PROFIT')]
+        if entry is not None and entry.status in DONE_STATES and state['position'] <= 0:
+            state['entry'] = None
+
+        signal = signals[i]
+        if signal == "SELL" and state['position'] > 0:
+            for order in state['exits'] + ([entry] if entry is not None else []):
+                broker.cancel(order.order_id)
+            state['exits'] = [broker.submit(instrument, SELL, state['position'], MARKET, None, decided_at, 'OPPOSITE_SIGNAL')]
+        elif signal == "BUY" and state['entry'] is None and state['position'] <= 0:
+            quantity = (cash - brokerage) / (close * (1 + slippage))
+            state['entry'] = broker.submit(instrument, BUY, quantity, MARKET, None, decided_at, 'ENTRY')
+
+    # Close out whatever is still open at the last close, like the other engines
+    broker.cancel_all(instrument)
+    if state['trade'] is not None and state['position'] > 0:
+        last_price = bars[-1, 3]
+        cash += state['position'] * last_price
+        trade = state['trade']
+        exit_value = trade['exit_value'] + state['position'] * last_price
+        exit_price = exit_value / trade['shares']
+        trades.append({'entry_date': trade['entry_date'], 'entry_price': trade['entry_price'], 'shares': trade['shares'],
+                       'exit_date': index[-1], 'exit_price': exit_price,
+                       'profit': (exit_price - trade['entry_price']) * trade['shares'], 'exit_reason': 'END_OF_DATA'})
+    return cash, pd.DataFrame(trades, columns=['entry_date', 'entry_price', 'shares', 'exit_date', 'exit_price', 'profit', 'exit_reason'])
+
+
+# --- Throughput benchmark ---
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
+    num_orders = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    num_instruments = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    rng = np.random.default_rng(7)
+    instruments = [f"NSE_EQ|SYN{i:05d}" for i in range(num_instruments)]
+    prices = rng.uniform(100, 3000, num_instruments)
+    broker = PaperBroker(RandomLatency(), FractionSlippage(0.0005, impact=0.1), VolumeParticipation(0.1), brokerage_per_order=10.0)
+    types = rng.choice([MARKET, LIMIT, STOP], num_orders, p=[0.4, 0.4, 0.2])
+    sides = rng.choice([BUY, SELL], num_orders)
+    owners = rng.integers(0, num_instruments, num_orders)
+    offsets = rng.normal(0, 0.003, num_orders)
+    quantities = rng.integers(1, 500, num_orders)
+
+    orders_per_bar = max(num_orders // 375, 1)
+    started = time.perf_counter()
+    now = 0.0
+    for position in range(0, num_orders, orders_per_bar):
+        for k in range(position, min(position + orders_per_bar, num_orders)):
+            owner = owners[k]
+            reference = prices[owner] * (1 + offsets[k])
+            broker.submit(instruments[owner], sides[k], quantities[k], types[k], None if types[k] == MARKET else reference, now)
+        prices *= np.exp(rng.normal(0, 0.0015, num_instruments))
+        for owner, instrument in enumerate(instruments):
+            price = prices[owner]
+            broker.on_bar(instrument, now, price, price * 1.002, price * 0.998, price, 20000)
+        now += BAR_SECONDS
+    elapsed = time.perf_counter() - started
+    working = sum(book.working() for book in broker.books.values())
+    logger.info(f"{num_orders} orders on {num_instruments} instruments over {-(-num_orders // orders_per_bar)} bars: "
+                f"{broker.fills} fills in {elapsed:.2f}s ({num_orders / elapsed:,.0f} orders/s), {len(broker.orders)} still working")
@@ -0,0 +1,185 @@
+# FILE: performance_analytics.py
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def build_equity_curve(df_bars, df_trades, starting_cash, brokerage):
+    """
+    Rebuilds the bar-by-bar portfolio value implied by calculate_performance_with_exits.
+    Returns a DataFrame indexed like df_bars with 'equity', 'cash', 'shares' and 'in_position'.
+    """
+    n = len(df_bars)
+    close = df_bars['close'].to_numpy(dtype=np.float64)
+
+    if df_trades is None or df_trades.empty:
+        equity = np.full(n, float(starting_cash))
+        return pd.DataFrame({'equity': equity, 'cash': equity, 'shares': np.zeros(n), 'in_position': np.zeros(n, dtype=bool)}, index=df_bars.index)
+
+    entry_idx = df_bars.index.get_indexer(df_trades['entry_date'])
+    exit_idx = df_bars.index.get_indexer(df_trades['exit_date'])
+    shares = df_trades['shares'].to_numpy(dtype=np.float64)
+    exit_price = df_trades['exit_price'].to_numpy(dtype=np.float64)
+
+    # The engine goes all-in, so cash is zero while holding and the whole exit value afterwards
+    exit_fee = np.where(df_trades['exit_reason'].to_numpy() == 'END_OF_DATA', 0.0, brokerage)
+    cash_after_exit = shares * exit_price - exit_fee
+
+    # Position flag: +1 on the entry bar, -1 on the exit bar (the exit bar is already flat)
+    position_delta = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(position_delta, entry_idx, 1)
+    np.add.at(position_delta, exit_idx, -1)
+    in_position = np.cumsum(position_delta[:n]) > 0
+
+    # END_OF_DATA exits happen on the last bar, which still counts as held in the engine
+    eod_exit = df_trades['exit_reason'].to_numpy() == 'END_OF_DATA'
+    if eod_exit.any():
+        in_position[exit_idx[eod_exit]] = True
+
+    # Forward-fill the shares held and the flat cash balance with cumulative index tricks
+    last_entry = np.full(n, -1, dtype=np.int64)
+    last_entry[entry_idx] = np.arange(len(entry_idx))
+    last_entry = np.maximum.accumulate(last_entry)
+    held_shares = np.where(in_position, shares[np.clip(last_entry, 0, None)], 0.0)
+
+    last_exit = np.full(n, -1, dtype=np.int64)
+    last_exit[exit_idx] = np.arange(len(exit_idx))
+    last_exit = np.maximum.accumulate(last_exit)
+    flat_cash = np.where(last_exit >= 0, cash_after_exit[np.clip(last_exit, 0, None)], float(starting_cash))
+    cash = np.where(in_position, 0.0, flat_cash)
+
+    equity = cash + held_shares * close
+    if eod_exit.any():
+        equity[exit_idx[eod_exit]] = cash_after_exit[eod_exit]
+
+    return pd.DataFrame({'equity': equity, 'cash': cash, 'shares': held_shares, 'in_position': in_position}, index=df_bars.index)
+
+
+def trade_excursions(df_bars, df_trades):
+    """Computes the maximum adverse and favourable excursion of each trade as a fraction of entry price."""
+    if df_trades is None or df_trades.empty:
+        return np.array([]), np.array([])
+
+    high = df_bars['high'].to_numpy(dtype=np.float64)
+    low = df_bars['low'].to_numpy(dtype=np.float64)
+    entry_idx = df_bars.index.get_indexer(df_trades['entry_date'])
+    exit_idx = df_bars.index.get_indexer(df_trades['exit_date'])
+    entry_price = df_trades['entry_price'].to_numpy(dtype=np.float64)
+
+    # reduceat over [entry, exit] segments; a sentinel keeps exit + 1 a valid index
+    bounds = np.empty(2 * len(entry_idx), dtype=np.int64)
+    bounds[0::2] = entry_idx
+    bounds[1::2] = exit_idx + 1
+    segment_low = np.minimum.reduceat(np.append(low, np.inf), bounds)[0::2]
+    segment_high = np.maximum.reduceat(np.append(high, -np.inf), bounds)[0::2]
+
+    mae = segment_low / entry_price - 1
+    mfe = segment_high / entry_price - 1
+    return mae, mfe
+
+
+def _period_table(equity, trades, keys, trade_keys):
+    """Aggregates end-of-period equity returns and trade P&L for one calendar grouping."""
+    period_equity = equity.groupby(keys).last()
+    opening_equity = equity.groupby(keys).first()
+    table = pd.DataFrame({'ending_equity': period_equity})
+    table['return_pct'] = (period_equity / period_equity.shift(1).fillna(opening_equity.iloc[0]) - 1) * 100
+
+    if trades is not None and not trades.empty:
+        grouped = trades['profit'].groupby(trade_keys)
+        table['num_trades'] = grouped.size()
+        table['profit'] = grouped.sum()
+        table['win_rate'] = (trades['profit'] > 0).groupby(trade_keys).mean() * 100
+    else:
+        table['num_trades'] = 0
+        table['profit'] = 0.0
+        table['win_rate'] = 0.0
+    return table.fillna({'num_trades': 0, 'profit': 0.0, 'win_rate': 0.0})
+
+
+def compute_performance_metrics(df_bars, df_trades, starting_cash, brokerage, risk_free_rate=0.0):
+    """
+    Computes the full performance report for one backtest run in a single pass over the equity curve.
+    Returns (metrics dict, equity curve DataFrame, daily table, monthly table).
+    """
+    curve = build_equity_curve(df_bars, df_trades, starting_cash, brokerage)
+    equity = curve['equity']
+    equity_values = equity.to_numpy()
+
+    # --- Drawdown ---
+    running_peak = np.maximum.accumulate(equity_values)
+    drawdown = equity_values / running_peak - 1
+    curve['drawdown'] = drawdown
+
+    # --- Daily returns for Sharpe / Sortino ---
+    day_keys = equity.index.date
+    daily_equity = equity.groupby(day_keys).last()
+    daily_returns = daily_equity.pct_change().fillna(daily_equity.iloc[0] / starting_cash - 1).to_numpy()
+    excess = daily_returns - risk_free_rate / TRADING_DAYS_PER_YEAR
+    volatility = excess.std(ddof=1) if len(excess) > 1 else 0.0
+    downside = excess[excess < 0]
+    downside_deviation = np.sqrt((downside ** 2).sum() / len(excess)) if len(excess) else 0.0
+    annualizer = np.sqrt(TRADING_DAYS_PER_YEAR)
+
+    # --- Trade statistics ---
+    has_trades = df_trades is not None and not df_trades.empty
+    profits = df_trades['profit'].to_numpy(dtype=np.float64) if has_trades else np.array([])
+    wins = profits[profits > 0]
+    losses = profits[profits <= 0]
+    if has_trades:
+        hold_times = pd.to_datetime(df_trades['exit_date']) - pd.to_datetime(df_trades['entry_date'])
+        mae, mfe = trade_excursions(df_bars, df_trades)
+    else:
+        hold_times = pd.Series([], dtype='timedelta64[ns]')
+        mae, mfe = np.array([]), np.array([])
+
+    ending_equity = equity_values[-1] if len(equity_values) else float(starting_cash)
+    metrics = {
+        'starting_cash': float(starting_cash),
+        'ending_equity': float(ending_equity),
+        'total_profit': float(profits.sum()),
+        'return_pct': float((ending_equity / starting_cash - 1) * 100),
+        'num_trades': int(len(profits)),
+        'win_rate': float(len(wins) / len(profits) * 100) if len(profits) else 0.0,
+        'avg_win': float(wins.mean()) if len(wins) else 0.0,
+        'avg_loss': float(losses.mean()) if len(losses) else 0.0,
+        'profit_factor': float(wins.sum() / -losses.sum()) if losses.sum() < 0 else float('inf') if len(wins) else 0.0,
+        'max_drawdown_pct': float(drawdown.min() * 100) if len(drawdown) else 0.0,
+        'sharpe': float(excess.mean() / volatility * annualizer) if volatility > 0 else 0.0,
+        'sortino': float(excess.mean() / downside_deviation * annualizer) if downside_deviation > 0 else 0.0,
+        'exposure_pct': float(curve['in_position'].mean() * 100) if len(curve) else 0.0,
+        'avg_hold_minutes': float(hold_times.dt.total_seconds().mean() / 60) if has_trades else 0.0,
+        'avg_mae_pct': float(mae.mean() * 100) if len(mae) else 0.0,
+        'avg_mfe_pct': float(mfe.mean() * 100) if len(mfe) else 0.0,
+        'worst_mae_pct': float(mae.min() * 100) if len(mae) else 0.0,
+        'best_mfe_pct': float(mfe.max() * 100) if len(mfe) else 0.0,
+    }
+
+    # --- Calendar breakdowns (trades are attributed to the period they exit in) ---
+    exit_dates = pd.DatetimeIndex(df_trades['exit_date']) if has_trades else pd.DatetimeIndex([])
+    trades_by_exit = df_trades.set_index(exit_dates) if has_trades else None
+    daily = _period_table(equity, trades_by_exit, day_keys, exit_dates.date if has_trades else None)
+    # Integer yyyymm keys: strftime over every bar dominates the runtime on long minute series
+    month_keys = equity.index.year * 100 + equity.index.month
+    exit_month_keys = exit_dates.year * 100 + exit_dates.month if has_trades else None
+    monthly = _period_table(equity, trades_by_exit, month_keys, exit_month_keys)
+    monthly.index = [f"{key // 100}-{key % 100:02d}" for key in monthly.index]
+    daily.index.name = 'date'
+    monthly.index.name = 'month'
+
+    return metrics, curve, daily, monthly
+
+
+def summarize_sweep(runs):
+    """
+    Collects the metrics of many runs (e.g. a parameter sweep or a portfolio of symbols) into one table.
+    Each run is a dict of labels (symbol, parameters...) plus the metrics dict returned above.
+    """
+    return pd.DataFrame([{**run['labels'], **run['metrics']} for run in runs])
+
+
+def format_metrics(metrics):
+    """Returns the metrics as aligned report lines for the logger."""
+    return [f"{name.replace('_', ' ').title():<26}{value:,.2f}" if isinstance(value, float) else f"{name.replace('_', ' ').title():<26}{value}"
+            for name, value in metrics.items()]
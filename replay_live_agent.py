@@ -0,0 +1,159 @@
+# FILE: replay_live_agent.py
+"""
+Replays stored 1-minute candles through the live ORB agent (live_agent_orb.run_cycle) on a virtual
+clock, then diffs the agent's trades against the backtester's so any live/backtest divergence shows
+up without waiting for market hours.
+"""
+import logging
+import sys
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import live_agent_orb
+from live_agent_orb import OrbAgent, run_cycle
+from agent_clock import VirtualClock
+from market_calendar import NSE_CALENDAR
+from data_loader import load_candles
+from strategy_kernels import run_orb_strategy_fast, calculate_performance_fast
+from paper_broker import PaperBroker, FixedLatency, FractionSlippage, VolumeParticipation, calculate_performance_paper
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+HISTORICAL_DATA_FILE = "hdfcbank_2yr_1m_data.csv"
+POLL_OFFSET_SECONDS = 5 # How long after each minute boundary the replayed agent "wakes up"
+PRICE_TOLERANCE = 0.01
+PAPER_LATENCY_SECONDS = 0.2 # Order latency for --paper-broker runs (fixed, so live and backtest see the same delays)
+
+
+def make_paper_broker():
+    return PaperBroker(FixedLatency(PAPER_LATENCY_SECONDS), FractionSlippage(live_agent_orb.PAPER_SLIPPAGE),
+                       VolumeParticipation(live_agent_orb.PAPER_PARTICIPATION))
+
+
+class CandleTape:
+    """Serves the stored candles the way the intraday endpoint would at a given virtual time."""
+
+    def __init__(self, df):
+        local_index = df.index.tz_convert('Asia/Kolkata')
+        self.timestamps = local_index
+        self.naive_ns = local_index.tz_localize(None).as_unit('ns').asi8
+        self.values = df[['open', 'high', 'low', 'close', 'volume', 'oi']].to_numpy(dtype=np.float64)
+        self._day = None
+
+    def candles_until(self, now):
+        """
+        Returns today's candles that have closed by `now`, oldest first. The stored candles hold their
+        final OHLC, so serving the minute still forming would hand the agent prices from the future.
+        """
+        closed_by = np.datetime64(now - timedelta(minutes=1), 'ns').astype(np.int64)
+        position = np.searchsorted(self.naive_ns, closed_by, side='right')
+        day = now.date()
+        if self._day != day:
+            self._day = day
+            start = np.searchsorted(self.naive_ns, np.datetime64(day, 'ns').astype(np.int64))
+            end = np.searchsorted(self.naive_ns, np.datetime64(day + timedelta(days=1), 'ns').astype(np.int64))
+            self._day_start = start
+            self._day_candles = [[self.timestamps[i], *self.values[i]] for i in range(start, end)]
+        return self._day_candles[:max(position - self._day_start, 0)]
+
+    def session_days(self):
+        return sorted(set(self.timestamps.date))
+
+
+def replay(df, poll_offset_seconds=POLL_OFFSET_SECONDS, broker=None):
+    """Drives the live agent (optionally trading through a paper broker) through every stored session and returns its structured trades."""
+    tape = CandleTape(df)
+    days = tape.session_days()
+    clock = VirtualClock(datetime.combine(days[0], datetime.min.time()))
+    agent = OrbAgent(clock.today(), alert=lambda *args: None, email=lambda *args: None, broker=broker)
+
+    for day in days:
+        session = NSE_CALENDAR.session_times(day)
+        if session is None:
+            continue # The live agent sits out exchange holidays, so the diff reports them as BACKTEST_ONLY
+        # Jump the virtual clock to the open, then tick once a minute until just past the close
+        clock.set(datetime.combine(day, session[0]) + timedelta(seconds=poll_offset_seconds))
+        session_end = datetime.combine(day, session[1]) + timedelta(minutes=1)
+        while clock.now() <= session_end:
+            run_cycle(agent, clock, tape.candles_until, status_file=None)
+            clock.sleep(60)
+
+    agent.reset(agent.today) # closes out the record of any position left open
+    return pd.DataFrame(agent.trades, columns=['entry_time', 'entry_price', 'shares', 'exit_time', 'exit_price', 'profit', 'exit_reason'])
+
+
+def diff_trades(live_trades, backtest_trades, price_tolerance=PRICE_TOLERANCE):
+    """
+    Lines up live and backtest trades by entry day and flags every difference.
+    status is MATCH, DIVERGED, LIVE_ONLY or BACKTEST_ONLY; 'differences' names the fields that disagree.
+    """
+    live = live_trades.rename(columns={'entry_time': 'entry', 'exit_time': 'exit'}).copy()
+    backtest = backtest_trades.rename(columns={'entry_date': 'entry', 'exit_date': 'exit'}).copy()
+    for frame in (live, backtest):
+        frame['day'] = [pd.Timestamp(t).date() for t in frame['entry']]
+    columns = ['day', 'entry', 'entry_price', 'exit', 'exit_price', 'exit_reason']
+    merged = pd.merge(live[columns], backtest[columns], on='day', how='outer', suffixes=('_live', '_backtest'), indicator=True).sort_values('day')
+
+    def compare(row):
+        if row['_merge'] == 'left_only':
+            return 'LIVE_ONLY', ''
+        if row['_merge'] == 'right_only':
+            return 'BACKTEST_ONLY', ''
+        differences = []
+        if pd.Timestamp(row['entry_live']) != pd.Timestamp(row['entry_backtest']):
+            differences.append('entry_time')
+        if abs(row['entry_price_live'] - row['entry_price_backtest']) > price_tolerance:
+            differences.append('entry_price')
+        if row['exit_reason_live'] != row['exit_reason_backtest']:
+            differences.append('exit_reason')
+        elif pd.Timestamp(row['exit_live']) != pd.Timestamp(row['exit_backtest']):
+            differences.append('exit_time')
+        return ('DIVERGED' if differences else 'MATCH'), ','.join(differences)
+
+    outcome = merged.apply(compare, axis=1, result_type='expand') if len(merged) else pd.DataFrame(columns=[0, 1])
+    merged['status'] = outcome[0]
+    merged['differences'] = outcome[1]
+    return merged.drop(columns=['_merge']).reset_index(drop=True)
+
+
+def backtest_trades_for(df, broker=None):
+    """Runs the backtester with the live agent's parameters on the same candles (through `broker` if given)."""
+    bars = df.copy()
+    bars['signal'] = run_orb_strategy_fast(bars, range_minutes=live_agent_orb.RANGE_MINUTES)
+    if broker is not None:
+        _, trades = calculate_performance_paper(bars, live_agent_orb.VIRTUAL_CAPITAL, 0.0, live_agent_orb.PAPER_SLIPPAGE,
+                                                live_agent_orb.STOP_LOSS_PERCENT, live_agent_orb.TAKE_PROFIT_PERCENT,
+                                                broker=broker, instrument=live_agent_orb.INSTRUMENT_KEY)
+        return trades
+    _, trades = calculate_performance_fast(bars, live_agent_orb.VIRTUAL_CAPITAL, 0.0, 0.0,
+                                           live_agent_orb.STOP_LOSS_PERCENT, live_agent_orb.TAKE_PROFIT_PERCENT)
+    return trades
+
+
+# --- Replay and Divergence Report ---
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger(live_agent_orb.__name__).setLevel(logging.WARNING) # the agent logs every minute
+
+    # --paper-broker sends both the replayed agent's and the backtester's orders through paper_broker.py
+    use_paper_broker = "--paper-broker" in sys.argv
+    arguments = [argument for argument in sys.argv[1:] if not argument.startswith("--")]
+    data_file = arguments[0] if arguments else HISTORICAL_DATA_FILE
+    df_history = load_candles(data_file)
+    logger.info(f"Replaying {len(df_history)} candles from {data_file} through the live agent"
+                f"{' with paper execution' if use_paper_broker else ''}...")
+
+    started = time.perf_counter()
+    live_trades = replay(df_history, broker=make_paper_broker() if use_paper_broker else None)
+    logger.info(f"Replayed {df_history.index.normalize().nunique()} sessions in {time.perf_counter() - started:.2f}s; "
+                f"live agent took {len(live_trades)} trades.")
+
+    report = diff_trades(live_trades, backtest_trades_for(df_history, make_paper_broker() if use_paper_broker else None))
+    logger.info("Live vs backtest trade comparison:")
+    print(report['status'].value_counts())
+    divergent = report[report['status'] != 'MATCH']
+    if not divergent.empty:
+        logger.warning(f"{len(divergent)} of {len(report)} trade days diverge. First few:")
+        print(divergent.head(10).to_string())
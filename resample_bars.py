@@ -0,0 +1,150 @@
+# FILE: resample_bars.py
+"""
+Session-aligned N-minute bars built from the stored 1-minute candles. Buckets start at each day's
+session open (so 5-minute bars are 9:15, 9:20, ... and Muhurat sessions align to their own open),
+and are aggregated with np.*.reduceat in one pass: first open, max high, min low, last close,
+summed volume, last OI and a volume-weighted VWAP of the 1-minute typical prices.
+
+Derived timeframes are materialized as pickles in bars_cache/. Loading an unchanged timeframe never
+touches the CSV; when the CSV has grown, only the bars from the last (possibly partial) bucket on
+are re-aggregated and appended.
+
+    python resample_bars.py <data.csv> [minutes ...]
+"""
+import logging
+import os
+import pickle
+import sys
+import time
+import numpy as np
+import pandas as pd
+from data_loader import load_candles, symbol_from_filename
+from market_calendar import NSE_CALENDAR, IST_OFFSET_SECONDS, to_utc_ns
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = "bars_cache"
+CACHE_VERSION = 1
+DAY_NS = 86400 * 10**9
+MINUTE_NS = 60 * 10**9
+
+
+def bucket_starts_ns(ns, minutes, calendar=NSE_CALENDAR):
+    """UTC epoch ns of the session-aligned N-minute bucket each 1-minute bar belongs to."""
+    local = ns + IST_OFFSET_SECONDS * 10**9
+    day_ns = local - local % DAY_NS
+    open_ns = calendar.open_seconds_for(day_ns.astype('datetime64[ns]').astype('datetime64[D]')) * 10**9
+    offset = local - day_ns - open_ns
+    width = minutes * MINUTE_NS
+    return day_ns + open_ns + np.floor_divide(offset, width) * width - IST_OFFSET_SECONDS * 10**9
+
+
+def resample_session_bars(df, minutes, calendar=NSE_CALENDAR):
+    """Aggregates a sorted 1-minute candle frame into session-aligned N-minute bars (indexed by bucket start)."""
+    if len(df) == 0:
+        return pd.DataFrame(columns=['open', 'high', 'low', 'close', 'volume', 'oi', 'vwap', 'bars'])
+    ns = to_utc_ns(df.index)
+    buckets = bucket_starts_ns(ns, minutes, calendar)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    last = np.r_[starts[1:], len(ns)] - 1
+
+    high = df['high'].to_numpy(dtype=np.float64)
+    low = df['low'].to_numpy(dtype=np.float64)
+    close = df['close'].to_numpy(dtype=np.float64)
+    volume = df['volume'].to_numpy(dtype=np.float64)
+    volume_sum = np.add.reduceat(volume, starts)
+    price_volume = np.add.reduceat((high + low + close) / 3 * volume, starts)
+
+    bars = pd.DataFrame({
+        'open': df['open'].to_numpy(dtype=np.float64)[starts],
+        'high': np.maximum.reduceat(high, starts),
+        'low': np.minimum.reduceat(low, starts),
+        'close': close[last],
+        'volume': volume_sum.astype(np.int64),
+        'oi': df['oi'].to_numpy()[last] if 'oi' in df else 0,
+        # Buckets with no volume fall back to their close
+        'vwap': np.divide(price_volume, volume_sum, out=close[last].copy(), where=volume_sum > 0),
+        'bars': np.diff(np.r_[starts, len(ns)]),
+    }, index=pd.DatetimeIndex(buckets[starts], name='timestamp').tz_localize('UTC').tz_convert(df.index.tz or 'UTC'))
+    return bars
+
+
+class BarCache:
+    """Materialized N-minute bars per (symbol, minutes), kept in sync with the 1-minute source file."""
+
+    def __init__(self, cache_dir=CACHE_DIR, calendar=NSE_CALENDAR):
+        self.cache_dir = cache_dir
+        self.calendar = calendar
+
+    def _path(self, symbol, minutes):
+        return os.path.join(self.cache_dir, f"{symbol}_{minutes}min.pkl")
+
+    def _read(self, symbol, minutes):
+        try:
+            with open(self._path(symbol, minutes), 'rb') as f:
+                entry = pickle.load(f)
+            return entry if entry.get('version') == CACHE_VERSION else None
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _write(self, symbol, minutes, entry):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(symbol, minutes)
+        with open(f"{path}.tmp", 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{path}.tmp", path)
+
+    def load(self, path, minutes, symbol=None, base=None):
+        """
+        N-minute bars for a candle file. An unchanged file is served straight from the cache; a grown
+        file re-aggregates only from the last cached bucket on. `base` can pass an already loaded
+        1-minute frame to avoid reading the CSV again.
+        """
+        symbol = symbol or symbol_from_filename(path)
+        stat = os.stat(path)
+        source = (stat.st_size, stat.st_mtime)
+        entry = self._read(symbol, minutes)
+        if entry is not None and entry['source'] == source:
+            return entry['bars']
+
+        base = load_candles(path, compact=False, symbol=symbol) if base is None else base
+        bars = None
+        if entry is not None and len(entry['bars']):
+            # Append-only update: the 1-minute rows before the last bucket must be exactly the ones already aggregated
+            tail_start = entry['bars'].index[-1]
+            cut = int(base.index.searchsorted(tail_start))
+            if cut == entry['rows_before_tail']:
+                fresh = resample_session_bars(base.iloc[cut:], minutes, self.calendar)
+                bars = pd.concat([entry['bars'].iloc[:-1], fresh])
+                logger.info(f"{symbol} {minutes}min: re-aggregated {len(base) - cut} new 1-minute rows")
+        if bars is None:
+            bars = resample_session_bars(base, minutes, self.calendar)
+            logger.info(f"{symbol} {minutes}min: built {len(bars)} bars from {len(base)} 1-minute rows")
+
+        rows_before_tail = int(base.index.searchsorted(bars.index[-1])) if len(bars) else 0
+        self._write(symbol, minutes, {'version': CACHE_VERSION, 'source': source, 'rows_before_tail': rows_before_tail, 'bars': bars})
+        return bars
+
+
+def load_bars(path, minutes, symbol=None, cache_dir=CACHE_DIR):
+    """Session-aligned N-minute bars for a candle file (1 returns the candles as stored)."""
+    if minutes == 1:
+        return load_candles(path, compact=False, symbol=symbol)
+    return BarCache(cache_dir).load(path, minutes, symbol)
+
+
+# --- Build the cached timeframes and time the loads ---
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
+    data_file = sys.argv[1] if len(sys.argv) > 1 else "hdfcbank_2yr_1m_data.csv"
+    timeframes = [int(value) for value in sys.argv[2:]] or [5, 15, 30, 60]
+
+    started = time.perf_counter()
+    base = load_candles(data_file, compact=False)
+    logger.info(f"1-minute base: {len(base)} rows loaded in {time.perf_counter() - started:.2f}s")
+    cache = BarCache()
+    for minutes in timeframes:
+        cache.load(data_file, minutes, base=base)
+        started = time.perf_counter()
+        bars = cache.load(data_file, minutes)
+        logger.info(f"{minutes:>3}min: {len(bars)} bars, cached load {1000 * (time.perf_counter() - started):.1f} ms")
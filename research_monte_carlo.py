@@ -0,0 +1,177 @@
+# FILE: research_monte_carlo.py
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+HISTORICAL_DATA_FILE = "hdfcbank_2yr_1m_data.csv"
+STARTING_CASH = 100000.0
+BROKERAGE_PER_TRADE = 10.0
+SLIPPAGE_PERCENT = 0.0005
+STOP_LOSS_PERCENT = 0.02
+TAKE_PROFIT_PERCENT = 0.04
+NUM_SIMULATIONS = 20000
+BATCH_SIZE = 2500
+
+
+def _closed_trade_equity(growth, exit_fee, fees, starting_cash):
+    """
+    Closed-trade equity after every trade of each path (one row per path), using the all-in
+    compounding of calculate_performance_with_exits: cash_k = (cash_(k-1) - brokerage) * exit/entry - exit_brokerage.
+    """
+    # cash_k = g_k * cash_(k-1) + c_k  =>  cash_k = P_k * (cash_0 + sum_j c_j / P_j)
+    offsets = -fees * growth - fees * exit_fee
+    compounded = np.cumprod(growth, axis=1)
+    return compounded * (starting_cash + np.cumsum(offsets / compounded, axis=1))
+
+
+def _max_drawdown_pct(equity, starting_cash):
+    """Deepest fall (%) of each equity path below its running peak, the starting cash included."""
+    running_peak = np.maximum(np.maximum.accumulate(equity, axis=1), starting_cash)
+    return ((equity / running_peak) - 1).min(axis=1) * 100
+
+
+def _simulate_batch(trade_returns, exit_fee_mask, starting_cash, brokerage, method, batch_size, seed,
+                    extra_slippage, slippage_jitter, brokerage_jitter):
+    """
+    Runs one batch of resampled equity paths. All paths in the batch are evaluated together with
+    cumulative products (see _closed_trade_equity).
+    """
+    rng = np.random.default_rng(seed)
+    num_trades = len(trade_returns)
+
+    # --- Resample the trade sequence ---
+    if method == "bootstrap":
+        picks = rng.integers(0, num_trades, size=(batch_size, num_trades))
+    elif method == "shuffle":
+        picks = np.argsort(rng.random((batch_size, num_trades)), axis=1)
+    else:
+        raise ValueError(f"Unknown resampling method: {method}")
+    growth = trade_returns[picks]
+    exit_fee = exit_fee_mask[picks].astype(np.float64)
+
+    # --- Optional cost perturbations ---
+    if extra_slippage or slippage_jitter:
+        entry_cost = np.clip(rng.normal(extra_slippage, slippage_jitter, growth.shape), 0, None)
+        exit_cost = np.clip(rng.normal(extra_slippage, slippage_jitter, growth.shape), 0, None)
+        growth = growth * (1 - exit_cost) / (1 + entry_cost)
+    fees = np.full(growth.shape, brokerage)
+    if brokerage_jitter:
+        fees = fees * (1 + rng.uniform(-brokerage_jitter, brokerage_jitter, growth.shape))
+
+    # --- Affine recursion solved with cumprod/cumsum ---
+    equity = _closed_trade_equity(growth, exit_fee, fees, starting_cash)
+    return equity[:, -1] - starting_cash, _max_drawdown_pct(equity, starting_cash)
+
+
+def _trade_inputs(df_trades):
+    """Per-trade growth factors and the mask of trades that paid exit brokerage."""
+    trade_returns = (df_trades['exit_price'] / df_trades['entry_price']).to_numpy(dtype=np.float64)
+    exit_fee_mask = (df_trades['exit_reason'] != 'END_OF_DATA').to_numpy()
+    return trade_returns, exit_fee_mask
+
+
+def monte_carlo_resample(df_trades, starting_cash, brokerage, num_simulations=NUM_SIMULATIONS, method="bootstrap",
+                         extra_slippage=0.0, slippage_jitter=0.0, brokerage_jitter=0.0,
+                         batch_size=BATCH_SIZE, workers=None, seed=42):
+    """
+    Resamples the trades DataFrame returned by calculate_performance_with_exits and returns a
+    DataFrame with the final P&L and max drawdown (%) of every simulated path.
+    method is "bootstrap" (draw with replacement) or "shuffle" (permute the order).
+    Drawdowns are measured on closed-trade equity, so they read shallower than the bar-level figure.
+    """
+    if df_trades is None or df_trades.empty:
+        raise ValueError("Monte Carlo needs at least one completed trade.")
+
+    trade_returns, exit_fee_mask = _trade_inputs(df_trades)
+
+    num_batches = -(-num_simulations // batch_size)
+    batch_sizes = [batch_size] * (num_batches - 1) + [num_simulations - batch_size * (num_batches - 1)]
+    seeds = np.random.SeedSequence(seed).spawn(num_batches)
+    jobs = [(trade_returns, exit_fee_mask, starting_cash, brokerage, method, size, child,
+             extra_slippage, slippage_jitter, brokerage_jitter) for size, child in zip(batch_sizes, seeds)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or num_batches == 1:
+        results = [_simulate_batch(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, num_batches)) as pool:
+            results = list(pool.map(_simulate_batch, *zip(*jobs)))
+
+    return pd.DataFrame({
+        'final_pnl': np.concatenate([pnl for pnl, _ in results]),
+        'max_drawdown_pct': np.concatenate([dd for _, dd in results]),
+    })
+
+
+def closed_trade_drawdown_pct(df_trades, starting_cash, brokerage):
+    """
+    Max drawdown (%) of the actual trade sequence on closed-trade equity: the figure the simulated
+    max_drawdown_pct values are comparable with (the bar-level drawdown also counts open-trade swings).
+    """
+    if df_trades is None or df_trades.empty:
+        return 0.0
+    trade_returns, exit_fee_mask = _trade_inputs(df_trades)
+    equity = _closed_trade_equity(trade_returns[np.newaxis, :], exit_fee_mask[np.newaxis, :].astype(np.float64),
+                                  np.full((1, len(trade_returns)), brokerage), starting_cash)
+    return float(_max_drawdown_pct(equity, starting_cash)[0])
+
+
+def summarize_simulations(simulations, actual_pnl=None, actual_drawdown_pct=None):
+    """
+    Returns the percentile table of the simulated distributions plus where the real run falls in them.
+    actual_drawdown_pct must be on closed-trade equity (closed_trade_drawdown_pct), like the simulations.
+    """
+    summary = simulations.quantile([0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99])
+    summary.index = [f"p{int(q * 100)}" for q in summary.index]
+    stats = {'probability_of_loss_pct': float((simulations['final_pnl'] < 0).mean() * 100)}
+    if actual_pnl is not None:
+        stats['actual_pnl_percentile'] = float((simulations['final_pnl'] < actual_pnl).mean() * 100)
+    if actual_drawdown_pct is not None:
+        stats['actual_drawdown_percentile'] = float((simulations['max_drawdown_pct'] < actual_drawdown_pct).mean() * 100)
+    return summary, stats
+
+
+# --- Robustness Check for ORB on HDFCBANK ---
+if __name__ == "__main__":
+    import time
+    from strategy_logic import run_orb_strategy, calculate_performance_with_exits
+    from performance_analytics import compute_performance_metrics
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        df_history = pd.read_csv(HISTORICAL_DATA_FILE)
+        df_history['timestamp'] = pd.to_datetime(df_history['timestamp_text'])
+        df_history = df_history.sort_values(by='timestamp').set_index('timestamp')
+        logger.info(f"Loaded {len(df_history)} rows of historical data.")
+
+        df_history['signal'] = run_orb_strategy(df_history, range_minutes=30)
+        ending_cash, df_trades = calculate_performance_with_exits(
+            df_history, STARTING_CASH, BROKERAGE_PER_TRADE,
+            SLIPPAGE_PERCENT, STOP_LOSS_PERCENT, TAKE_PROFIT_PERCENT
+        )
+        metrics, _, _, _ = compute_performance_metrics(df_history, df_trades, STARTING_CASH, BROKERAGE_PER_TRADE)
+        actual_drawdown_pct = closed_trade_drawdown_pct(df_trades, STARTING_CASH, BROKERAGE_PER_TRADE)
+        logger.info(f"Actual run: {len(df_trades)} trades, P&L Rs.{ending_cash - STARTING_CASH:,.2f}, "
+                    f"Max Drawdown {metrics['max_drawdown_pct']:.2f}% (closed-trade {actual_drawdown_pct:.2f}%)")
+
+        for method in ("bootstrap", "shuffle"):
+            started = time.perf_counter()
+            simulations = monte_carlo_resample(
+                df_trades, STARTING_CASH, BROKERAGE_PER_TRADE, method=method,
+                extra_slippage=SLIPPAGE_PERCENT / 2, slippage_jitter=SLIPPAGE_PERCENT / 2, brokerage_jitter=0.25
+            )
+            summary, stats = summarize_simulations(simulations, ending_cash - STARTING_CASH, actual_drawdown_pct)
+            logger.info(f"\n--- MONTE CARLO ({method.upper()}, {len(simulations)} paths in {time.perf_counter() - started:.2f}s) ---")
+            print(summary)
+            for name, value in stats.items():
+                logger.info(f"{name.replace('_', ' ').title():<30}{value:.2f}")
+
+    except Exception as e:
+        logger.error(f"An error occurred: {e}", exc_info=True)
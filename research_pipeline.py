@@ -0,0 +1,298 @@
+# FILE: research_pipeline.py
+"""
+Daily research flow as a DAG: download instruments -> fetch each symbol's history -> quality check and
+ORB backtest per symbol -> portfolio report. Every node declares its input files, output files, the
+source files its code lives in and its parameters; a node re-runs only when the fingerprint of those
+changed (or an output is missing/edited), and nodes whose dependencies are done run in parallel.
+
+Fingerprints use the upstream nodes' output *content*, so a node that re-runs but writes identical
+files stops the change from propagating: on a daily refresh where one symbol's file did not change,
+its quality and backtest nodes are skipped, and the report only re-runs if some metrics moved. The
+per-day work inside a node is incremental too (candle cache, adjusted/bars segment caches).
+
+    python research_pipeline.py [--jobs N] [--offline] [--dry-run] [--force backtest:]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = ".pipeline_state.json"
+OUTPUT_DIR = "pipeline_output"
+BACKTEST_PARAMS = {'range_minutes': 30, 'starting_cash': 100000.0, 'brokerage': 10.0, 'slippage_pct': 0.0005,
+                   'stop_loss_pct': 0.02, 'take_profit_pct': 0.04}
+BACKTEST_CODE = ("strategy_kernels.py", "performance_analytics.py", "market_calendar.py", "corporate_actions.py",
+                 "data_loader.py", "sweep_cluster.py")
+
+
+class Node:
+    """One pipeline step: an argv list run as a subprocess, or a module-level function called with `args`."""
+
+    def __init__(self, name, action, args=None, inputs=(), outputs=(), deps=(), code=(), params=None):
+        self.name = name
+        self.action = action
+        self.args = args or {}
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+        self.code = list(code)
+        self.params = params or {}
+
+    def describe(self):
+        return self.action if isinstance(self.action, list) else f"{self.action.__module__}.{self.action.__qualname__}"
+
+
+def _execute(action, args):
+    if isinstance(action, list):
+        subprocess.run(action, check=True)
+    else:
+        action(**args)
+
+
+class Pipeline:
+    def __init__(self, nodes, state_path=STATE_FILE):
+        self.nodes = {node.name: node for node in nodes}
+        self.state_path = state_path
+        self.order = self._topological_order()
+        try:
+            with open(state_path) as f:
+                self.state = json.load(f)
+        except (OSError, ValueError):
+            self.state = {}
+        self.state.setdefault('files', {})
+        self.state.setdefault('nodes', {})
+
+    def _topological_order(self):
+        order, visiting, done = [], set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline has a dependency cycle through {name!r}")
+            if name not in self.nodes:
+                raise ValueError(f"Unknown dependency {name!r}")
+            visiting.add(name)
+            for dep in self.nodes[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.nodes:
+            visit(name)
+        return order
+
+    def _save_state(self):
+        with open(f"{self.state_path}.tmp", 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(f"{self.state_path}.tmp", self.state_path)
+
+    # --- Fingerprints ---
+    def file_hash(self, path):
+        """Content hash of a file, re-read only when its size or mtime changed. None if it does not exist."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        cached = self.state['files'].get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        self.state['files'][path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def fingerprint(self, node):
+        missing = [path for path in node.inputs if self.file_hash(path) is None]
+        if missing:
+            raise FileNotFoundError(f"{node.name}: missing input(s) {missing}")
+        key = {'name': node.name, 'action': node.describe(), 'args': node.args, 'params': node.params,
+               'code': {path: self.file_hash(path) for path in node.code},
+               'inputs': {path: self.file_hash(path) for path in node.inputs}}
+        return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+    def staleness(self, node, force=False):
+        """Reason the node must run, or None if its outputs are up to date."""
+        record = self.state['nodes'].get(node.name)
+        if force:
+            return "forced"
+        if record is None:
+            return "never run"
+        if record['fingerprint'] != self.fingerprint(node):
+            return "inputs changed"
+        for path, recorded in record['outputs'].items():
+            current = self.file_hash(path)
+            if current is None:
+                return f"output {path} missing"
+            if current != recorded:
+                return f"output {path} modified"
+        return None
+
+    # --- Execution ---
+    def run(self, jobs=None, force=(), dry_run=False):
+        """Runs every stale node (dependencies first, independent ones in parallel). Returns {node: status}."""
+        forced = {name for name in self.nodes if any(name.startswith(prefix) for prefix in force)}
+        status = {}
+        if dry_run:
+            for name in self.order:
+                node = self.nodes[name]
+                upstream = [dep for dep in node.deps if status[dep] != 'fresh']
+                try:
+                    reason = f"upstream {upstream[0]} will run" if upstream else self.staleness(node, name in forced)
+                except FileNotFoundError as e:
+                    reason = str(e)
+                status[name] = 'stale' if reason else 'fresh'
+                logger.info(f"{name:<28} {'STALE (' + reason + ')' if reason else 'fresh'}")
+            return status
+
+        pending = list(self.order)
+        running = {}
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            while pending or running:
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for name in list(pending):
+                        node = self.nodes[name]
+                        if any(dep not in status for dep in node.deps):
+                            continue
+                        pending.remove(name)
+                        progressed = True
+                        if any(status[dep] in ('failed', 'blocked') for dep in node.deps):
+                            status[name] = 'blocked'
+                            logger.warning(f"{name}: blocked by a failed dependency")
+                            continue
+                        try:
+                            reason = self.staleness(node, name in forced)
+                        except FileNotFoundError as e:
+                            status[name] = 'failed'
+                            logger.error(str(e))
+                            continue
+                        if reason is None:
+                            status[name] = 'fresh'
+                            continue
+                        logger.info(f"{name}: running ({reason})")
+                        running[pool.submit(_execute, node.action, node.args)] = (name, self.fingerprint(node), time.perf_counter())
+
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name, fingerprint, node_started = running.pop(future)
+                    seconds = time.perf_counter() - node_started
+                    try:
+                        future.result()
+                        outputs = {path: self.file_hash(path) for path in self.nodes[name].outputs}
+                        missing = [path for path, value in outputs.items() if value is None]
+                        if missing:
+                            raise FileNotFoundError(f"did not write {missing}")
+                    except Exception as e:
+                        status[name] = 'failed'
+                        logger.error(f"{name}: failed after {seconds:.1f}s: {e}")
+                        continue
+                    status[name] = 'ran'
+                    self.state['nodes'][name] = {'fingerprint': fingerprint, 'outputs': outputs, 'seconds': round(seconds, 3),
+                                                 'finished_at': time.strftime('%Y-%m-%d %H:%M:%S')}
+                    self._save_state()
+                    logger.info(f"{name}: done in {seconds:.1f}s")
+
+        self._save_state()
+        counts = {kind: sum(1 for value in status.values() if value == kind) for kind in ('ran', 'fresh', 'failed', 'blocked')}
+        logger.info(f"Pipeline finished in {time.perf_counter() - started:.1f}s: {counts}")
+        return status
+
+
+# --- Node actions (module-level so they can run in worker processes) ---
+def fetch_symbol(symbol, instrument_key, output):
+    import research_fetch_portfolio_data as fetcher
+    fetcher.fetch_symbol_history(fetcher.make_history_api(), symbol, instrument_key, output)
+
+
+def check_quality(data_file, output):
+    from data_quality import validate_files
+    _, report = validate_files([data_file])
+    report.to_csv(output, index=False)
+
+
+def backtest_symbol(data_file, symbol, params, metrics_output, trades_output):
+    from corporate_actions import load_adjusted_candles
+    from sweep_cluster import evaluate_task
+    metrics, df_trades = evaluate_task(load_adjusted_candles(data_file, symbol), 'orb', params)
+    df_trades.to_csv(trades_output, index=False)
+    with open(metrics_output, 'w') as f:
+        json.dump({'symbol': symbol, 'params': params, 'metrics': metrics}, f, indent=2, default=float)
+
+
+def portfolio_report(metrics_files, output):
+    from performance_analytics import summarize_sweep
+    runs = []
+    for path in metrics_files:
+        with open(path) as f:
+            entry = json.load(f)
+        runs.append({'labels': {'symbol': entry['symbol']}, 'metrics': entry['metrics']})
+    summary = summarize_sweep(runs)
+    summary.to_csv(output, index=False)
+    print(summary[['symbol', 'return_pct', 'num_trades', 'win_rate', 'max_drawdown_pct', 'sharpe', 'exposure_pct']].to_string(index=False))
+
+
+def build_daily_pipeline(today=None, offline=False, output_dir=OUTPUT_DIR):
+    """The daily DAG. offline=True leaves out the download nodes and treats the data files as plain inputs."""
+    from research_fetch_portfolio_data import TARGET_STOCKS, output_filename_for
+    today = str(today or date.today())
+    nodes = []
+    if not offline:
+        nodes.append(Node("instruments", [sys.executable, os.path.join("utils", "util_download_instruments.py")],
+                          outputs=["upstox_complete_instruments.csv"], code=["utils/util_download_instruments.py"],
+                          params={'date': today}))
+
+    metrics_files = []
+    for symbol, instrument_key in TARGET_STOCKS.items():
+        data_file = output_filename_for(symbol)
+        fetch = [] if offline else [f"fetch:{symbol}"]
+        if not offline:
+            # Stale once per day; the candle cache makes the re-fetch cost one request per new session
+            nodes.append(Node(f"fetch:{symbol}", fetch_symbol, {'symbol': symbol, 'instrument_key': instrument_key, 'output': data_file},
+                              outputs=[data_file], code=["research_fetch_portfolio_data.py"], params={'date': today}))
+        lower = symbol.lower()
+        nodes.append(Node(f"quality:{symbol}", check_quality, {'data_file': data_file, 'output': f"{output_dir}/{lower}_quality.csv"},
+                          inputs=[data_file], outputs=[f"{output_dir}/{lower}_quality.csv"], deps=fetch,
+                          code=["data_quality.py", "market_calendar.py"]))
+        metrics_file = f"{output_dir}/{lower}_metrics.json"
+        metrics_files.append(metrics_file)
+        nodes.append(Node(f"backtest:{symbol}", backtest_symbol,
+                          {'data_file': data_file, 'symbol': symbol, 'params': BACKTEST_PARAMS,
+                           'metrics_output': metrics_file, 'trades_output': f"{output_dir}/{lower}_trades.csv"},
+                          inputs=[data_file, "corporate_actions.json"], outputs=[metrics_file, f"{output_dir}/{lower}_trades.csv"],
+                          deps=fetch, code=BACKTEST_CODE))
+
+    nodes.append(Node("report", portfolio_report, {'metrics_files': metrics_files, 'output': f"{output_dir}/portfolio_summary.csv"},
+                      inputs=metrics_files, outputs=[f"{output_dir}/portfolio_summary.csv"],
+                      deps=[f"backtest:{symbol}" for symbol in TARGET_STOCKS], code=["performance_analytics.py"]))
+    return nodes
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Run the daily research pipeline, re-executing only stale steps")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count())
+    parser.add_argument('--offline', action='store_true', help="skip the download steps and use the data files on disk")
+    parser.add_argument('--dry-run', action='store_true', help="only show which steps are stale")
+    parser.add_argument('--force', action='append', default=[], metavar='PREFIX', help="re-run steps whose name starts with PREFIX")
+    args = parser.parse_args()
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    pipeline = Pipeline(build_daily_pipeline(offline=args.offline))
+    status = pipeline.run(jobs=args.jobs, force=args.force, dry_run=args.dry_run)
+    sys.exit(1 if any(value in ('failed', 'blocked') for value in status.values()) else 0)
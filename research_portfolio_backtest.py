@@ -1,7 +1,13 @@
-import pandas as pd
 import logging
 import sys
 from strategy_logic import run_orb_strategy, calculate_performance_with_exits
+from strategy_kernels import run_orb_strategy_fast, calculate_performance_fast
+from data_loader import load_candles, frame_memory_mb, symbol_from_filename
+from backtest_profiler import profiler_from_args
+from corporate_actions import load_adjusted_candles, load_actions, actions_fingerprint
+from resample_bars import load_bars, resample_session_bars
+from performance_analytics import compute_performance_metrics, summarize_sweep, format_metrics
+from results_store import ResultsStore, code_version
 
 # --- Set up Logger ---
 logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -19,44 +25,100 @@ BROKERAGE_PER_TRADE = 10.0
 SLIPPAGE_PERCENT = 0.0005
 STOP_LOSS_PERCENT = 0.02 
 TAKE_PROFIT_PERCENT = 0.04
+COMPACT_LOAD = True # float32 prices / int32 volume for unadjusted 1-minute loads, see data_loader.py for the precision bound
+ADJUST_FOR_CORPORATE_ACTIONS = True # Split/bonus/dividend-adjusted prices from corporate_actions.json (float64)
+BAR_MINUTES = 1 # 5, 15, ... for session-aligned bars from resample_bars.py (cached in bars_cache/)
+USE_COMPILED_KERNELS = True # Numba-compiled ORB/exit loops (pure-Python fallback if Numba is missing)
+RANGE_MINUTES = 30
+RECORD_RESULTS = True # Record runs in backtest_results.db and skip ones already run on identical data/code
+
+orb_strategy = run_orb_strategy_fast if USE_COMPILED_KERNELS else run_orb_strategy
+performance_engine = calculate_performance_fast if USE_COMPILED_KERNELS else calculate_performance_with_exits
+
+# Run with --profile (or AITA_PROFILE=1) for per-stage timing/allocation reports
+profiler = profiler_from_args("research_portfolio_backtest")
+
+results_store = ResultsStore() if RECORD_RESULTS else None
+if results_store:
+    engine_version = code_version()
+    sweep_id = results_store.start_sweep("research_portfolio_backtest", engine_version)
+run_params = {'range_minutes': RANGE_MINUTES, 'stop_loss_pct': STOP_LOSS_PERCENT, 'take_profit_pct': TAKE_PROFIT_PERCENT,
+              'slippage_pct': SLIPPAGE_PERCENT, 'brokerage': BROKERAGE_PER_TRADE, 'starting_cash': STARTING_CASH,
+              'bar_minutes': BAR_MINUTES, 'adjusted': ADJUST_FOR_CORPORATE_ACTIONS, 'compiled_kernels': USE_COMPILED_KERNELS}
+# Adjusted and resampled bars are always float64, so the compact load only changes the inputs of plain 1-minute runs
+if not ADJUST_FOR_CORPORATE_ACTIONS and BAR_MINUTES == 1:
+    run_params['compact_load'] = COMPACT_LOAD
 
 # --- Main Loop ---
+portfolio_runs = []
 for stock_file in STOCKS_TO_TEST:
     logger.info(f"============================================================")
     logger.info(f"--- Starting Backtest for {stock_file.upper()} ---")
     logger.info(f"============================================================")
     
     try:
-        df_history = pd.read_csv(stock_file)
-        df_history['timestamp'] = pd.to_datetime(df_history['timestamp_text'])
-        df_history = df_history.sort_values(by='timestamp').set_index('timestamp')
-        
-        signals = run_orb_strategy(df_history, range_minutes=30)
-        df_history['signal'] = signals
-
-        ending_cash, df_trades = calculate_performance_with_exits(
-            df_history, STARTING_CASH, BROKERAGE_PER_TRADE, 
-            SLIPPAGE_PERCENT, STOP_LOSS_PERCENT, TAKE_PROFIT_PERCENT
-        )
-
-        total_profit = df_trades['profit'].sum()
-        num_trades = len(df_trades)
-        num_wins = len(df_trades[df_trades['profit'] > 0])
-        win_rate = (num_wins / num_trades) * 100 if num_trades > 0 else 0
+        symbol = symbol_from_filename(stock_file)
+        if results_store:
+            data_version = results_store.data_fingerprint(stock_file)
+            if ADJUST_FOR_CORPORATE_ACTIONS:
+                data_version += f"+{actions_fingerprint(load_actions().get(symbol, []))}"
+            previous = results_store.find_run(
+                results_store.run_fingerprint("orb", symbol, run_params, data_version, engine_version), sweep_id)
+            if previous:
+                run_id, metrics = previous
+                logger.info(f"Identical run already recorded (run {run_id}), skipping. Return: {metrics['return_pct']:.2f}%")
+                portfolio_runs.append({'labels': {'symbol': symbol}, 'metrics': metrics})
+                continue
+        if ADJUST_FOR_CORPORATE_ACTIONS:
+            with profiler.stage("adjusted_load", symbol):
+                df_history = load_adjusted_candles(stock_file, symbol)
+                if BAR_MINUTES > 1:
+                    df_history = resample_session_bars(df_history, BAR_MINUTES)
+        elif BAR_MINUTES > 1:
+            with profiler.stage("bars_load", symbol):
+                df_history = load_bars(stock_file, BAR_MINUTES, symbol)
+        else:
+            df_history = load_candles(stock_file, compact=COMPACT_LOAD, profiler=profiler)
+        logger.info(f"Loaded {len(df_history)} rows ({frame_memory_mb(df_history):.1f} MB in memory).")
         
+        with profiler.stage("signals", symbol):
+            signals = orb_strategy(df_history, range_minutes=RANGE_MINUTES)
+            df_history['signal'] = signals
+
+        with profiler.stage("performance", symbol):
+            ending_cash, df_trades = performance_engine(
+                df_history, STARTING_CASH, BROKERAGE_PER_TRADE, 
+                SLIPPAGE_PERCENT, STOP_LOSS_PERCENT, TAKE_PROFIT_PERCENT
+            )
+
+        with profiler.stage("analytics", symbol):
+            metrics, equity_curve, daily_report, monthly_report = compute_performance_metrics(
+                df_history, df_trades, STARTING_CASH, BROKERAGE_PER_TRADE
+            )
+        portfolio_runs.append({'labels': {'symbol': symbol}, 'metrics': metrics})
+        if results_store:
+            results_store.record_run(sweep_id, "orb", symbol, run_params, data_version, engine_version, metrics, df_trades)
+
         logger.info(f"\n--- PERFORMANCE REPORT FOR {stock_file.upper()} ---")
-        logger.info(f"Starting Portfolio Value: Rs.{STARTING_CASH:,.2f}")
-        logger.info(f"Ending Portfolio Value:   Rs.{ending_cash:,.2f}")
-        logger.info(f"Total Net Profit/Loss:    Rs.{total_profit:,.2f}")
-        logger.info(f"Return Over Period:       {total_profit / STARTING_CASH * 100:.2f}%")
-        logger.info("-" * 30)
-        logger.info(f"Total Trades Executed:    {num_trades}")
-        logger.info(f"Win Rate:                 {win_rate:.2f}%")
+        for line in format_metrics(metrics):
+            logger.info(line)
         logger.info("Exit Reasons:")
-        print(df_trades['exit_reason'].value_counts())
+        print(df_trades['exit_reason'].value_counts() if not df_trades.empty else "No trades")
+        logger.info("Monthly Breakdown:")
+        print(monthly_report)
         logger.info("--------------------------------\n\n")
 
     except FileNotFoundError:
         logger.error(f"Data file not found: {stock_file}. Please make sure it's in the project folder.")
     except Exception as e:
-        logger.error(f"An error occurred during backtest for {stock_file}: {e}", exc_info=True)
\ No newline at end of file
+        logger.error(f"An error occurred during backtest for {stock_file}: {e}", exc_info=True)
+
+# --- Portfolio Summary ---
+if portfolio_runs:
+    logger.info("--- PORTFOLIO SUMMARY ---")
+    print(summarize_sweep(portfolio_runs)[['symbol', 'return_pct', 'num_trades', 'win_rate', 'max_drawdown_pct', 'sharpe', 'exposure_pct']])
+
+# --- Profile Report ---
+if profiler.enabled:
+    profiler.log_summary(logger)
+    logger.info(f"Profile written to {profiler.write()}")
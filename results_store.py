@@ -0,0 +1,190 @@
+# FILE: results_store.py
+"""
+SQLite store for backtest results. Every run is recorded with its strategy, symbol, parameters,
+data fingerprint, code version, metrics and trades; parameters also go into an indexed name/value
+table so sweeps can be queried by any parameter. A run is identified by a fingerprint over all of
+those inputs, so re-running an identical (strategy, symbol, params, data, code) combination is
+answered from the store instead of being recomputed.
+
+    python results_store.py [metric]     # best parameters per symbol over the last 50 sweeps
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+RESULTS_DB = "backtest_results.db"
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+CODE_FILES = ("strategies.py", "strategy_logic.py", "strategy_kernels.py", "indicators.py", "performance_analytics.py",
+              "market_calendar.py", "data_loader.py", "resample_bars.py", "corporate_actions.py")
+METRIC_COLUMNS = ('ending_equity', 'return_pct', 'num_trades', 'win_rate', 'profit_factor', 'max_drawdown_pct',
+                  'sharpe', 'sortino', 'exposure_pct')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS sweeps (
+    id INTEGER PRIMARY KEY, name TEXT NOT NULL, started_at TEXT NOT NULL, code_version TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY, fingerprint TEXT NOT NULL UNIQUE, strategy TEXT NOT NULL, symbol TEXT NOT NULL,
+    params_json TEXT NOT NULL, data_fingerprint TEXT, code_version TEXT, created_at TEXT NOT NULL,
+    {', '.join(f'{column} REAL' for column in METRIC_COLUMNS)}, metrics_json TEXT
+);
+CREATE TABLE IF NOT EXISTS sweep_runs (
+    sweep_id INTEGER NOT NULL REFERENCES sweeps(id), run_id INTEGER NOT NULL REFERENCES runs(id), reused INTEGER NOT NULL,
+    PRIMARY KEY (sweep_id, run_id)
+);
+CREATE TABLE IF NOT EXISTS run_params (
+    run_id INTEGER NOT NULL REFERENCES runs(id), name TEXT NOT NULL, value_real REAL, value_text TEXT
+);
+CREATE TABLE IF NOT EXISTS trades (
+    run_id INTEGER NOT NULL REFERENCES runs(id), entry_date TEXT, exit_date TEXT, entry_price REAL, exit_price REAL,
+    shares REAL, profit REAL, exit_reason TEXT
+);
+CREATE TABLE IF NOT EXISTS data_files (
+    path TEXT PRIMARY KEY, size INTEGER, mtime REAL, sha256 TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_strategy_symbol ON runs(strategy, symbol);
+CREATE INDEX IF NOT EXISTS runs_symbol_return ON runs(symbol, return_pct);
+CREATE INDEX IF NOT EXISTS sweep_runs_run ON sweep_runs(run_id);
+CREATE INDEX IF NOT EXISTS run_params_name_value ON run_params(name, value_real, run_id);
+CREATE INDEX IF NOT EXISTS run_params_run ON run_params(run_id);
+CREATE INDEX IF NOT EXISTS trades_run ON trades(run_id);
+"""
+
+
+def _canonical(value):
+    """JSON-safe, order-independent form of a parameter dict (numpy scalars included)."""
+    return json.dumps(value, sort_keys=True, default=lambda item: item.item() if isinstance(item, np.generic) else str(item))
+
+
+def code_version(files=CODE_FILES):
+    """
+    Short hash of the strategy/engine sources, so a code change invalidates earlier results.
+    Relative paths are resolved against this package, not the working directory; a missing file
+    raises rather than silently dropping out of the hash.
+    """
+    digest = hashlib.sha256()
+    for path in files:
+        with open(os.path.join(CODE_DIR, path), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+class ResultsStore:
+    def __init__(self, path=RESULTS_DB):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    # --- Fingerprints ---
+    def data_fingerprint(self, path):
+        """Content hash of a data file, cached by (size, mtime) so unchanged files are not re-read."""
+        stat = os.stat(path)
+        absolute = os.path.abspath(path)
+        row = self.connection.execute("SELECT size, mtime, sha256 FROM data_files WHERE path = ?", (absolute,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime:
+            return row[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO data_files VALUES (?, ?, ?, ?)",
+                                    (absolute, stat.st_size, stat.st_mtime, digest.hexdigest()[:16]))
+        return digest.hexdigest()[:16]
+
+    @staticmethod
+    def run_fingerprint(strategy, symbol, params, data_fingerprint, code_version):
+        key = _canonical({'strategy': strategy, 'symbol': symbol, 'params': params, 'data': data_fingerprint, 'code': code_version})
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    # --- Writing ---
+    def start_sweep(self, name, code_version=None):
+        with self.connection:
+            cursor = self.connection.execute("INSERT INTO sweeps (name, started_at, code_version) VALUES (?, ?, ?)",
+                                             (name, time.strftime('%Y-%m-%d %H:%M:%S'), code_version))
+        return cursor.lastrowid
+
+    def find_run(self, fingerprint, sweep_id=None):
+        """Returns (run_id, metrics) of an identical earlier run, or None; links it into sweep_id when given."""
+        row = self.connection.execute("SELECT id, metrics_json FROM runs WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        if row is None:
+            return None
+        if sweep_id is not None:
+            with self.connection:
+                self.connection.execute("INSERT OR IGNORE INTO sweep_runs VALUES (?, ?, 1)", (sweep_id, row[0]))
+        return row[0], json.loads(row[1])
+
+    def record_run(self, sweep_id, strategy, symbol, params, data_fingerprint, code_version, metrics, df_trades=None):
+        """Stores one run (metrics, indexed parameters and trades) and returns its id."""
+        fingerprint = self.run_fingerprint(strategy, symbol, params, data_fingerprint, code_version)
+        metrics = json.loads(_canonical(metrics))
+        with self.connection:
+            # An upsert keeps the run's id, so its sweep_runs links stay valid; params and trades are rewritten below
+            values = {'strategy': strategy, 'symbol': symbol, 'params_json': _canonical(params), 'data_fingerprint': data_fingerprint,
+                      'code_version': code_version, 'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                      **{column: metrics.get(column) for column in METRIC_COLUMNS}, 'metrics_json': _canonical(metrics)}
+            self.connection.execute(
+                f"INSERT INTO runs (fingerprint, {', '.join(values)}) VALUES ({', '.join('?' * (1 + len(values)))}) "
+                f"ON CONFLICT(fingerprint) DO UPDATE SET {', '.join(f'{column} = excluded.{column}' for column in values)}",
+                (fingerprint, *values.values()))
+            run_id = self.connection.execute("SELECT id FROM runs WHERE fingerprint = ?", (fingerprint,)).fetchone()[0]
+            self.connection.execute("DELETE FROM run_params WHERE run_id = ?", (run_id,))
+            self.connection.executemany("INSERT INTO run_params VALUES (?, ?, ?, ?)", [
+                (run_id, name, float(value) if isinstance(value, (int, float, np.number)) else None, str(value))
+                for name, value in params.items()])
+            self.connection.execute("DELETE FROM trades WHERE run_id = ?", (run_id,))
+            if df_trades is not None and len(df_trades):
+                columns = ['entry_date', 'exit_date', 'entry_price', 'exit_price', 'shares', 'profit', 'exit_reason']
+                rows = df_trades.reindex(columns=columns)
+                rows = rows.astype({'entry_date': str, 'exit_date': str})
+                self.connection.executemany("INSERT INTO trades VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                            [(run_id, *row) for row in rows.itertuples(index=False, name=None)])
+            if sweep_id is not None:
+                self.connection.execute("INSERT OR IGNORE INTO sweep_runs VALUES (?, ?, 0)", (sweep_id, run_id))
+        return run_id
+
+    # --- Queries ---
+    def query(self, sql, params=()):
+        return pd.read_sql_query(sql, self.connection, params=params)
+
+    def best_params(self, strategy=None, metric='return_pct', last_sweeps=50, min_trades=1):
+        """The best run per symbol (by `metric`) across the last N sweeps, with its parameters."""
+        if metric not in METRIC_COLUMNS:
+            raise ValueError(f"metric must be one of {METRIC_COLUMNS}")
+        # SQLite returns the bare columns of the row that holds MAX(), so this is one pass over the recent runs
+        return self.query(f"""
+            WITH recent AS (SELECT id FROM sweeps ORDER BY id DESC LIMIT ?)
+            SELECT r.id AS run_id, r.strategy, r.symbol, r.params_json, MAX(r.{metric}) AS {metric}, r.num_trades, r.max_drawdown_pct
+            FROM sweep_runs sr JOIN runs r ON r.id = sr.run_id
+            WHERE sr.sweep_id IN (SELECT id FROM recent) AND r.num_trades >= ? AND (? IS NULL OR r.strategy = ?)
+            GROUP BY r.strategy, r.symbol ORDER BY {metric} DESC""", (last_sweeps, min_trades, strategy, strategy))
+
+    def runs_with_param(self, name, low, high, strategy=None):
+        """Runs whose numeric parameter `name` lies in [low, high] (served by the run_params index)."""
+        return self.query("""
+            SELECT r.id AS run_id, r.strategy, r.symbol, r.params_json, r.return_pct, r.sharpe, r.max_drawdown_pct
+            FROM run_params p JOIN runs r ON r.id = p.run_id
+            WHERE p.name = ? AND p.value_real BETWEEN ? AND ? AND (? IS NULL OR r.strategy = ?)
+            ORDER BY r.return_pct DESC""", (name, low, high, strategy, strategy))
+
+    def trades_for(self, run_id):
+        return self.query("SELECT * FROM trades WHERE run_id = ?", (run_id,))
+
+
+# --- Best parameters report ---
+if __name__ == "__main__":
+    metric = sys.argv[1] if len(sys.argv) > 1 else 'return_pct'
+    store = ResultsStore()
+    started = time.perf_counter()
+    best = store.best_params(metric=metric)
+    print(f"Best run per symbol by {metric} over the last 50 sweeps ({1000 * (time.perf_counter() - started):.1f} ms):")
+    print(best.to_string(index=False))
@@ -0,0 +1,222 @@
+# FILE: risk_engine.py
+"""
+Incremental portfolio risk for live trading. Per-symbol position, average price, last price and
+realized P&L are kept alongside running portfolio totals (gross/net exposure, unrealized and realized
+P&L, open position count). A fill or a price tick only touches its own symbol and applies the change
+in that symbol's contribution to the totals, so every update is O(1) whatever the number of
+positions, and check_order() can veto an entry inline, before it is sent, in microseconds.
+
+Limits: per-order notional, per-symbol notional, gross exposure, open positions and a daily loss
+limit. Once the day's P&L (realized + unrealized) hits the daily loss limit, new entries are refused
+until new_day(). Orders that reduce a position are always allowed.
+
+    python risk_engine.py    # latency benchmark and a check of the running totals against a full recompute
+"""
+import logging
+import sys
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BUY, SELL = 'BUY', 'SELL'
+
+# Per-symbol state, kept in a list for speed: [quantity, average price, last price, realized P&L]
+QUANTITY, AVG_PRICE, LAST_PRICE, REALIZED = range(4)
+
+
+class RiskLimits:
+    def __init__(self, max_order_notional=float('inf'), max_symbol_notional=float('inf'), max_gross_exposure=float('inf'),
+                 max_open_positions=10**9, max_daily_loss=float('inf')):
+        self.max_order_notional = max_order_notional
+        self.max_symbol_notional = max_symbol_notional
+        self.max_gross_exposure = max_gross_exposure
+        self.max_open_positions = max_open_positions
+        self.max_daily_loss = max_daily_loss
+
+
+class RiskEngine:
+    def __init__(self, limits=None):
+        self.limits = limits or RiskLimits()
+        self.symbols = {}
+        self.gross_exposure = 0.0 # sum of |quantity x last price|
+        self.net_exposure = 0.0 # sum of quantity x last price
+        self.unrealized = 0.0 # sum of quantity x (last price - average price)
+        self.realized = 0.0 # realized P&L since the engine started
+        self.day_start_realized = 0.0
+        self.day_start_unrealized = 0.0
+        self.open_positions = 0
+        self.halted = False
+        self.vetoes = 0
+
+    def _state(self, symbol, price):
+        state = self.symbols.get(symbol)
+        if state is None:
+            state = self.symbols[symbol] = [0.0, 0.0, price, 0.0]
+        return state
+
+    def _remove(self, state):
+        """Takes a symbol's contribution out of the running totals (re-added by _add after the update)."""
+        quantity, avg_price, last_price = state[QUANTITY], state[AVG_PRICE], state[LAST_PRICE]
+        self.gross_exposure -= abs(quantity * last_price)
+        self.net_exposure -= quantity * last_price
+        self.unrealized -= quantity * (last_price - avg_price)
+        self.open_positions -= quantity != 0.0
+
+    def _add(self, state):
+        quantity, avg_price, last_price = state[QUANTITY], state[AVG_PRICE], state[LAST_PRICE]
+        self.gross_exposure += abs(quantity * last_price)
+        self.net_exposure += quantity * last_price
+        self.unrealized += quantity * (last_price - avg_price)
+        self.open_positions += quantity != 0.0
+
+    # --- Updates ---
+    def on_price(self, symbol, price):
+        state = self.symbols.get(symbol)
+        if state is None:
+            return
+        price = float(price)
+        if state[QUANTITY]:
+            # Only the price-dependent totals move: O(1) arithmetic on the change
+            move = state[QUANTITY] * (price - state[LAST_PRICE])
+            self.net_exposure += move
+            self.unrealized += move
+            self.gross_exposure += abs(state[QUANTITY]) * (price - state[LAST_PRICE])
+        state[LAST_PRICE] = price
+        self._check_daily_loss()
+
+    def on_fill(self, symbol, side, quantity, price):
+        quantity, price = float(quantity), float(price)
+        state = self._state(symbol, price)
+        self._remove(state)
+        signed = quantity if side == BUY else -quantity
+        position = state[QUANTITY]
+        if position == 0 or (position > 0) == (signed > 0):
+            # Opening or adding: new volume-weighted average price
+            state[AVG_PRICE] = (state[AVG_PRICE] * position + price * signed) / (position + signed)
+            state[QUANTITY] = position + signed
+        else:
+            # Reducing, closing or flipping: realize P&L on the closed part
+            closed = min(abs(signed), abs(position))
+            pnl = closed * (price - state[AVG_PRICE]) * (1 if position > 0 else -1)
+            state[REALIZED] += pnl
+            self.realized += pnl
+            state[QUANTITY] = position + signed
+            if abs(state[QUANTITY]) < 1e-9:
+                state[QUANTITY] = 0.0
+                state[AVG_PRICE] = 0.0
+            elif (state[QUANTITY] > 0) != (position > 0):
+                state[AVG_PRICE] = price # Flipped: the remainder was opened at this fill
+        state[LAST_PRICE] = price
+        self._add(state)
+        self._check_daily_loss()
+
+    def close_out(self, symbol):
+        """Books a symbol's position as closed at its last price (e.g. a position dropped at the day reset)."""
+        state = self.symbols.get(symbol)
+        if state is not None and state[QUANTITY]:
+            self.on_fill(symbol, SELL if state[QUANTITY] > 0 else BUY, abs(state[QUANTITY]), state[LAST_PRICE])
+
+    def new_day(self):
+        """Starts a new daily loss window (positions carry over) and lifts a loss halt."""
+        self.day_start_realized = self.realized
+        self.day_start_unrealized = self.unrealized
+        self.halted = False
+
+    def daily_pnl(self):
+        return (self.realized - self.day_start_realized) + (self.unrealized - self.day_start_unrealized)
+
+    def _check_daily_loss(self):
+        if not self.halted and self.daily_pnl() <= -self.limits.max_daily_loss:
+            self.halted = True
+            logger.warning(f"Daily loss limit reached (P&L {self.daily_pnl():,.2f}); new entries are blocked for the day.")
+
+    # --- Pre-trade check ---
+    def check_order(self, symbol, side, quantity, price):
+        """None if the order may be sent, otherwise the reason it is vetoed. O(1)."""
+        state = self.symbols.get(symbol)
+        position = state[QUANTITY] if state is not None else 0.0
+        signed = quantity if side == BUY else -quantity
+        after = position + signed
+        if abs(after) <= abs(position) and (after == 0 or (after > 0) == (position > 0)):
+            return None # Reduces or closes the position
+        limits = self.limits
+        reason = None
+        notional = quantity * price
+        symbol_after = abs(after) * price
+        if self.halted:
+            reason = "daily loss limit reached"
+        elif notional > limits.max_order_notional:
+            reason = f"order notional {notional:,.0f} > {limits.max_order_notional:,.0f}"
+        elif symbol_after > limits.max_symbol_notional:
+            reason = f"{symbol} notional {symbol_after:,.0f} > {limits.max_symbol_notional:,.0f}"
+        elif self.gross_exposure - abs(position) * price + symbol_after > limits.max_gross_exposure:
+            reason = f"gross exposure would exceed {limits.max_gross_exposure:,.0f}"
+        elif position == 0 and self.open_positions >= limits.max_open_positions:
+            reason = f"{self.open_positions} positions open (limit {limits.max_open_positions})"
+        if reason is not None:
+            self.vetoes += 1
+        return reason
+
+    # --- Reporting / verification ---
+    def snapshot(self):
+        return {'gross_exposure': round(self.gross_exposure, 2), 'net_exposure': round(self.net_exposure, 2),
+                'unrealized_pnl': round(self.unrealized, 2), 'realized_pnl': round(self.realized, 2),
+                'daily_pnl': round(self.daily_pnl(), 2), 'open_positions': self.open_positions,
+                'halted': self.halted, 'vetoes': self.vetoes}
+
+    def recompute(self):
+        """The running totals recomputed from scratch, for checking the incremental updates."""
+        states = [state for state in self.symbols.values() if state[QUANTITY]]
+        return {'gross_exposure': sum(abs(s[QUANTITY] * s[LAST_PRICE]) for s in states),
+                'net_exposure': sum(s[QUANTITY] * s[LAST_PRICE] for s in states),
+                'unrealized': sum(s[QUANTITY] * (s[LAST_PRICE] - s[AVG_PRICE]) for s in states),
+                'realized': sum(s[REALIZED] for s in self.symbols.values()),
+                'open_positions': len(states)}
+
+
+# --- Latency benchmark and consistency check ---
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
+    num_symbols, num_events = 500, 500000
+    rng = np.random.default_rng(7)
+    symbols = [f"SYM{i:04d}" for i in range(num_symbols)]
+    prices = rng.uniform(100, 3000, num_symbols)
+    engine = RiskEngine(RiskLimits(max_order_notional=500000, max_symbol_notional=1000000, max_gross_exposure=50000000,
+                                   max_open_positions=400, max_daily_loss=float('inf')))
+
+    kinds = rng.random(num_events)
+    owners = rng.integers(0, num_symbols, num_events)
+    moves = np.exp(rng.normal(0, 0.001, num_events))
+    sides = rng.choice([BUY, SELL], num_events)
+    quantities = rng.integers(1, 300, num_events).astype(float)
+
+    timings = {'tick': [0.0, 0], 'check': [0.0, 0], 'fill': [0.0, 0]}
+    for k in range(num_events):
+        owner = owners[k]
+        symbol = symbols[owner]
+        if kinds[k] < 0.8:
+            prices[owner] *= moves[k]
+            started = time.perf_counter_ns()
+            engine.on_price(symbol, prices[owner])
+            timings['tick'][0] += time.perf_counter_ns() - started
+            timings['tick'][1] += 1
+        else:
+            started = time.perf_counter_ns()
+            vetoed = engine.check_order(symbol, sides[k], quantities[k], prices[owner])
+            timings['check'][0] += time.perf_counter_ns() - started
+            timings['check'][1] += 1
+            if vetoed is None:
+                started = time.perf_counter_ns()
+                engine.on_fill(symbol, sides[k], quantities[k], prices[owner])
+                timings['fill'][0] += time.perf_counter_ns() - started
+                timings['fill'][1] += 1
+
+    for name, (total_ns, count) in timings.items():
+        logger.info(f"{name:<11} {count:>7} events, {total_ns / count / 1000:.2f} us each")
+    full = engine.recompute()
+    logger.info(f"Incremental: {engine.snapshot()}")
+    logger.info("Recomputed:  " + ", ".join(f"{name}={value:,.2f}" for name, value in full.items()))
+    drift = max(abs(engine.gross_exposure - full['gross_exposure']), abs(engine.unrealized - full['unrealized']),
+                abs(engine.realized - full['realized']))
+    logger.info(f"Max drift between incremental and recomputed totals: {drift:.6f}")
@@ -0,0 +1,373 @@
+# FILE: strategies.py
+"""
+One definition per strategy, two evaluators. A Strategy declares its state as a list of features
+(running opening range, session VWAP, SMAs, previous-bar values, ...) and its decision as a rule
+over those features written with elementwise operators, so the same rule runs on whole arrays and
+on single floats. From that definition:
+
+- Strategy.signals(df) computes every feature over the whole frame with NumPy and applies the rule
+  once (backtests, sweeps);
+- Strategy.stream() returns a StrategyStream whose update(bar) advances every feature by one bar in
+  O(1) and applies the rule to the scalars (live agents).
+
+Each feature's streaming step does the same floating-point operations in the same order as its
+batch kernel (running sums are prefix differences in both), so batch and streaming signals over
+the same bars are identical, not just close. `python strategies.py [data.csv]` checks that, and
+checks the ORB signals against the compiled kernel (strategy_kernels.run_orb_strategy_fast);
+strategy_parity.py also holds them to the original ORB loop, on generated candles.
+"""
+import logging
+import math
+import sys
+import time
+from collections import deque
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+from indicators import sma, session_vwap
+from market_calendar import NSE_CALENDAR, EXCHANGE_TZ
+from strategy_kernels import session_layout, SIGNAL_BUY, SIGNAL_SELL, SIGNAL_NAMES
+
+logger = logging.getLogger(__name__)
+
+BAR_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+
+# --- Inputs seen by the features ---
+class Bars:
+    """A candle frame as the batch features see it: float64 columns plus the session layout."""
+
+    def __init__(self, df):
+        for column in BAR_COLUMNS:
+            setattr(self, column, df[column].to_numpy(dtype=np.float64))
+        self.session_starts, self.seconds_of_day = session_layout(df.index)
+        lengths = np.diff(self.session_starts)
+        self.session_open = np.repeat(NSE_CALENDAR.open_seconds_for(df.index[self.session_starts[:-1]].date), lengths)
+        self.length = len(df)
+
+    def sessions(self):
+        """(start, end) offsets of every session."""
+        return zip(self.session_starts[:-1], self.session_starts[1:])
+
+
+class Bar:
+    """One candle as the streaming features see it."""
+    __slots__ = ('day', 'seconds_of_day', 'session_open', 'new_session') + BAR_COLUMNS
+
+
+def exchange_time(timestamp):
+    """Exchange-local Timestamp for a tz-aware or naive (already exchange-local) timestamp or ISO string."""
+    stamp = pd.Timestamp(timestamp)
+    return stamp.tz_convert(EXCHANGE_TZ) if stamp.tzinfo is not None else stamp
+
+
+# --- Features: one batch kernel and one O(1) step each, with identical arithmetic ---
+class Feature:
+    def batch(self, bars, values):
+        raise NotImplementedError
+
+    def step(self, bar, values):
+        raise NotImplementedError
+
+
+class Previous(Feature):
+    """The value of a column or an earlier feature one bar back (NaN on the first bar)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.last = math.nan
+
+    def batch(self, bars, values):
+        source = values[self.name]
+        result = np.empty(len(source))
+        result[:1] = np.nan
+        result[1:] = source[:-1]
+        return result
+
+    def step(self, bar, values):
+        result, self.last = self.last, values[self.name]
+        return result
+
+
+class BarCount(Feature):
+    """Bars seen before this one (0 on the first bar), for warm-up periods."""
+
+    def __init__(self):
+        self.count = -1
+
+    def batch(self, bars, values):
+        return np.arange(bars.length, dtype=np.float64)
+
+    def step(self, bar, values):
+        self.count += 1
+        return float(self.count)
+
+
+class SMA(Feature):
+    """indicators.sma of a column: NaN until the window is full, or while it holds a NaN."""
+
+    def __init__(self, name, length):
+        self.name = name
+        self.length = length
+        self.prefix = 0.0
+        self.missing = 0
+        self.history = deque(maxlen=length + 1) # (prefix, missing count) of the last length+1 bars
+
+    def batch(self, bars, values):
+        return sma(values[self.name], self.length)
+
+    def step(self, bar, values):
+        value = values[self.name]
+        if math.isnan(value):
+            self.missing += 1
+        else:
+            self.prefix += value
+        self.history.append((self.prefix, self.missing))
+        if len(self.history) < self.length:
+            return math.nan
+        if len(self.history) == self.length:
+            window_sum, window_missing = self.prefix, self.missing
+        else:
+            window_sum, window_missing = self.prefix - self.history[0][0], self.missing - self.history[0][1]
+        return math.nan if window_missing else window_sum / self.length
+
+
+def _divide(numerator, denominator):
+    """NumPy's float division (x/0 is +-inf, 0/0 is NaN) for Python floats."""
+    if denominator:
+        return numerator / denominator
+    return math.nan if numerator == 0 or math.isnan(numerator) else math.copysign(math.inf, numerator) * math.copysign(1.0, denominator)
+
+
+class SessionVWAP(Feature):
+    """indicators.session_vwap: typical-price VWAP that restarts every session."""
+
+    def __init__(self):
+        self.cum_weighted = self.cum_volume = 0.0
+        self.base_weighted = self.base_volume = 0.0
+
+    def batch(self, bars, values):
+        return session_vwap(bars.high, bars.low, bars.close, bars.volume, bars.session_starts)
+
+    def step(self, bar, values):
+        if bar.new_session:
+            self.base_weighted, self.base_volume = self.cum_weighted, self.cum_volume
+        self.cum_weighted += (bar.high + bar.low + bar.close) / 3.0 * bar.volume
+        self.cum_volume += bar.volume
+        return _divide(self.cum_weighted - self.base_weighted, self.cum_volume - self.base_volume)
+
+
+class OpeningRange(Feature):
+    """
+    Running max (np.fmax) or min (np.fmin) of a column over the bars stamped from the session open
+    to range_minutes after it, both ends included; NaN until the first such bar. After the range
+    closes it is the range's final high or low.
+    """
+
+    def __init__(self, name, reducer, range_minutes):
+        self.name = name
+        self.reducer = reducer
+        self.range_seconds = range_minutes * 60
+        self.running = math.nan
+
+    def batch(self, bars, values):
+        inside = (bars.seconds_of_day >= bars.session_open) & (bars.seconds_of_day <= bars.session_open + self.range_seconds)
+        masked = np.where(inside, values[self.name], np.nan)
+        for start, end in bars.sessions():
+            self.reducer.accumulate(masked[start:end], out=masked[start:end])
+        return masked
+
+    def step(self, bar, values):
+        if bar.new_session:
+            self.running = math.nan
+        if bar.session_open <= bar.seconds_of_day <= bar.session_open + self.range_seconds:
+            self.running = float(self.reducer(self.running, values[self.name]))
+        return self.running
+
+
+class AfterRange(Feature):
+    """1.0 for bars stamped after the opening range closes, else 0.0."""
+
+    def __init__(self, range_minutes):
+        self.range_seconds = range_minutes * 60
+
+    def batch(self, bars, values):
+        return (bars.seconds_of_day > bars.session_open + self.range_seconds).astype(np.float64)
+
+    def step(self, bar, values):
+        return 1.0 if bar.seconds_of_day > bar.session_open + self.range_seconds else 0.0
+
+
+# --- Strategy definition and the two evaluators ---
+class Strategy:
+    """
+    Subclasses implement features() (a fresh, ordered dict of name -> Feature; a feature may read the
+    bar columns and any feature listed before it) and rule(x), which maps the feature values in the
+    namespace x to (buy, sell) conditions using only elementwise operators. BUY wins when both hold.
+    With one_signal_per_session only the first BUY/SELL of each session is kept.
+    """
+    one_signal_per_session = False
+
+    def features(self):
+        raise NotImplementedError
+
+    def rule(self, x):
+        raise NotImplementedError
+
+    def codes(self, df):
+        """Batch evaluation: int8 signal codes (1 BUY, -1 SELL, 0 HOLD) for every bar of a sorted candle frame."""
+        if not len(df):
+            return np.zeros(0, dtype=np.int8)
+        bars = Bars(df)
+        values = {column: getattr(bars, column) for column in BAR_COLUMNS}
+        for name, feature in self.features().items():
+            values[name] = feature.batch(bars, values)
+        with np.errstate(invalid='ignore'):
+            buy, sell = self.rule(SimpleNamespace(**values))
+        codes = np.where(buy, SIGNAL_BUY, np.where(sell, SIGNAL_SELL, 0)).astype(np.int8)
+        if self.one_signal_per_session:
+            # Keep a signal only if no earlier bar of its session signalled
+            fired = np.cumsum(codes != 0)
+            before_session = np.repeat(np.concatenate(([0], fired[bars.session_starts[1:-1] - 1])), np.diff(bars.session_starts))
+            codes[fired - before_session > 1] = 0
+        return codes
+
+    def signals(self, df):
+        """Batch evaluation as a list of "BUY"/"SELL"/"HOLD" (drop-in for the strategy_logic functions)."""
+        return SIGNAL_NAMES[self.codes(df).astype(np.int64) + 1].tolist()
+
+    def stream(self):
+        return StrategyStream(self)
+
+
+class StrategyStream:
+    """Incremental evaluation: feed bars in time order, get each bar's signal in O(1)."""
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+        self.features = strategy.features()
+        self.values = {}
+        self.day = None
+        self.last_timestamp = None
+        self.fired = False
+
+    def update(self, timestamp, open, high, low, close, volume):
+        """
+        Advances every feature by one bar and returns its signal ("BUY"/"SELL"/"HOLD"), or None if the
+        bar is not newer than the last one fed in (a repeated poll of the same candle changes nothing).
+        """
+        stamp = exchange_time(timestamp)
+        if self.last_timestamp is not None and stamp <= self.last_timestamp:
+            return None
+        self.last_timestamp = stamp
+
+        bar = Bar()
+        bar.open, bar.high, bar.low, bar.close, bar.volume = float(open), float(high), float(low), float(close), float(volume)
+        bar.day = stamp.date()
+        bar.seconds_of_day = stamp.hour * 3600 + stamp.minute * 60 + stamp.second
+        bar.new_session = bar.day != self.day
+        if bar.new_session:
+            self.day = bar.day
+            self.fired = False
+            self.session_open = int(NSE_CALENDAR.open_seconds_for([bar.day])[0])
+        bar.session_open = self.session_open
+
+        values = {column: getattr(bar, column) for column in BAR_COLUMNS}
+        for name, feature in self.features.items():
+            values[name] = feature.step(bar, values)
+        self.values = values
+
+        buy, sell = self.strategy.rule(SimpleNamespace(**values))
+        code = SIGNAL_BUY if buy else (SIGNAL_SELL if sell else 0)
+        if self.strategy.one_signal_per_session and code:
+            if self.fired:
+                code = 0
+            self.fired = True
+        return SIGNAL_NAMES[code + 1]
+
+
+# --- Strategies ---
+class OrbStrategy(Strategy):
+    """
+    Opening Range Breakout: the range is every bar stamped from the session open to range_minutes
+    later (both ends included); the first bar after it whose high breaks the range high is a BUY, or
+    whose low breaks the range low a SELL. One signal per session.
+    """
+    one_signal_per_session = True
+
+    def __init__(self, range_minutes=30):
+        self.range_minutes = range_minutes
+
+    def features(self):
+        return {'range_high': OpeningRange('high', np.fmax, self.range_minutes),
+                'range_low': OpeningRange('low', np.fmin, self.range_minutes),
+                'after_range': AfterRange(self.range_minutes)}
+
+    def rule(self, x):
+        after = x.after_range > 0
+        return after & (x.high > x.range_high), after & (x.low < x.range_low)
+
+
+class VwapCrossStrategy(Strategy):
+    """
+    The V2 agent: a close crossing the session VWAP on volume above volume_factor x the previous
+    bar's volume SMA, in the direction of the trend SMA. No signals for the first trend_period bars.
+    """
+
+    def __init__(self, volume_period=20, volume_factor=1.5, trend_period=50):
+        self.volume_period = volume_period
+        self.volume_factor = volume_factor
+        self.trend_period = trend_period
+
+    def features(self):
+        return {'vwap': SessionVWAP(),
+                'volume_sma': SMA('volume', self.volume_period),
+                'trend_sma': SMA('close', self.trend_period),
+                'previous_close': Previous('close'),
+                'previous_vwap': Previous('vwap'),
+                'previous_volume_sma': Previous('volume_sma'),
+                'bar_count': BarCount()}
+
+    def rule(self, x):
+        warmed_up = x.bar_count >= self.trend_period
+        bullish_crossover = (x.previous_close < x.previous_vwap) & (x.close > x.vwap)
+        bearish_crossover = (x.previous_close > x.previous_vwap) & (x.close < x.vwap)
+        strong_volume = x.volume > x.previous_volume_sma * self.volume_factor
+        uptrend = x.close > x.trend_sma
+        return (warmed_up & bullish_crossover & strong_volume & uptrend,
+                warmed_up & bearish_crossover & strong_volume & np.logical_not(uptrend))
+
+
+def stream_signals(strategy, df):
+    """Feeds every bar of a frame through a fresh stream and returns the signals."""
+    stream = strategy.stream()
+    columns = [df[column].to_numpy(dtype=np.float64) for column in BAR_COLUMNS]
+    return [stream.update(timestamp, *bar) for timestamp, *bar in zip(df.index, *columns)]
+
+
+# --- Batch/stream and kernel parity ---
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
+    from data_loader import load_candles
+    from resample_bars import resample_session_bars
+    from strategy_kernels import run_orb_strategy_fast
+
+    data_file = sys.argv[1] if len(sys.argv) > 1 else "hdfcbank_2yr_1m_data.csv"
+    df_history = load_candles(data_file)
+    checks = [(OrbStrategy(30), lambda df: run_orb_strategy_fast(df, range_minutes=30)),
+              (VwapCrossStrategy(20, 1.5, 50), None)]
+    # Resampled bars too: a 30-minute range is one or two bars there, which the kernel must not mistake for a short session
+    for bar_minutes in (1, 15, 30):
+        df_bars = df_history if bar_minutes == 1 else resample_session_bars(df_history, bar_minutes)
+        for strategy, reference_fn in checks:
+            name = f"{type(strategy).__name__} {bar_minutes}m"
+            started = time.perf_counter()
+            batch = strategy.signals(df_bars)
+            batch_seconds = time.perf_counter() - started
+            started = time.perf_counter()
+            streamed = stream_signals(strategy, df_bars)
+            stream_seconds = time.perf_counter() - started
+            stream_mismatches = sum(a != b for a, b in zip(batch, streamed))
+            kernel = f", vs compiled kernel: {sum(a != b for a, b in zip(batch, reference_fn(df_bars)))}" if reference_fn else ""
+            logger.info(f"{name:<22} {len(batch)} bars, {sum(s != 'HOLD' for s in batch)} signals | batch {batch_seconds * 1000:.1f} ms, "
+                        f"stream {stream_seconds / len(batch) * 1e6:.1f} us/bar | batch vs stream mismatches: {stream_mismatches}{kernel}")
@@ -0,0 +1,217 @@
+# FILE: strategy_kernels.py
+"""
+Compiled kernels for the path-dependent parts of the backtester: the one-trade-per-day ORB latch
+and the SL/TP position state machine. When Numba is installed the kernels are compiled in nopython
+mode and cached on disk next to this file, otherwise the exact same code runs as plain Python.
+"""
+import sys
+import numpy as np
+import pandas as pd
+from market_calendar import NSE_CALENDAR
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """Stand-in decorator used when Numba is not installed."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+# --- Signal and exit codes shared by the kernels ---
+SIGNAL_SELL = -1
+SIGNAL_HOLD = 0
+SIGNAL_BUY = 1
+SIGNAL_NAMES = np.array(["SELL", "HOLD", "BUY"], dtype=object)
+
+EVENT_ENTRY = 0
+EVENT_STOP_LOSS = 1
+EVENT_TAKE_PROFIT = 2
+EVENT_OPPOSITE_SIGNAL = 3
+EXIT_REASONS = {EVENT_STOP_LOSS: 'STOP_LOSS', EVENT_TAKE_PROFIT: 'TAKE_PROFIT', EVENT_OPPOSITE_SIGNAL: 'OPPOSITE_SIGNAL'}
+
+
+@njit(cache=True)
+def orb_signal_kernel(day_starts, seconds_of_day, high, low, range_start, range_end):
+    """
+    Marks the first breakout of each day's opening range (inclusive of both range ends).
+    range_start/range_end hold each day's range in seconds after midnight, so special sessions and
+    resampled bars work too: only bar times are compared, never bar counts.
+    """
+    signals = np.zeros(len(high), dtype=np.int8)
+    num_days = len(day_starts) - 1
+
+    for d in range(num_days):
+        start = day_starts[d]
+        end = day_starts[d + 1]
+
+        # Opening range: every bar stamped between the open and the range end
+        range_high = -np.inf
+        range_low = np.inf
+        has_range = False
+        for i in range(start, end):
+            t = seconds_of_day[i]
+            if range_start[d] <= t <= range_end[d]:
+                has_range = True
+                if high[i] > range_high:
+                    range_high = high[i]
+                if low[i] < range_low:
+                    range_low = low[i]
+        if not has_range:
+            continue
+
+        # One trade per day: stop at the first breakout after the range closes
+        for i in range(start, end):
+            if seconds_of_day[i] > range_end[d]:
+                if high[i] > range_high:
+                    signals[i] = SIGNAL_BUY
+                    break
+                elif low[i] < range_low:
+                    signals[i] = SIGNAL_SELL
+                    break
+    return signals
+
+
+@njit(cache=True)
+def position_kernel(close, high, low, signals, brokerage, slippage, stop_loss_pct, take_profit_pct,
+                    cash, shares, position_open, entry_price, stop_loss_price, take_profit_price):
+    """
+    Runs the long-only SL/TP state machine of calculate_performance_with_exits over one block of bars.
+    The position state goes in and comes out, so blocks (e.g. days) can be chained.
+    Returns the event arrays (bar, kind, price, shares), the event count and the final state.
+    """
+    n = len(close)
+    event_bar = np.empty(n, dtype=np.int64)
+    event_kind = np.empty(n, dtype=np.int8)
+    event_price = np.empty(n, dtype=np.float64)
+    event_shares = np.empty(n, dtype=np.float64)
+    num_events = 0
+
+    for i in range(n):
+        signal = signals[i]
+
+        if position_open:
+            exit_kind = -1
+            exit_price = 0.0
+            if low[i] <= stop_loss_price:
+                exit_kind = EVENT_STOP_LOSS
+                exit_price = stop_loss_price
+            elif high[i] >= take_profit_price:
+                exit_kind = EVENT_TAKE_PROFIT
+                exit_price = take_profit_price
+            elif signal == SIGNAL_SELL:
+                exit_kind = EVENT_OPPOSITE_SIGNAL
+                exit_price = close[i] * (1 - slippage)
+
+            if exit_kind >= 0:
+                cash -= brokerage
+                cash += shares * exit_price
+                position_open = False
+                event_bar[num_events] = i
+                event_kind[num_events] = exit_kind
+                event_price[num_events] = exit_price
+                event_shares[num_events] = shares
+                num_events += 1
+                continue
+
+        if signal == SIGNAL_BUY and not position_open:
+            entry_price = close[i] * (1 + slippage)
+            cash -= brokerage
+            shares = cash / entry_price
+            cash = 0.0
+            position_open = True
+            stop_loss_price = entry_price * (1 - stop_loss_pct)
+            take_profit_price = entry_price * (1 + take_profit_pct)
+            event_bar[num_events] = i
+            event_kind[num_events] = EVENT_ENTRY
+            event_price[num_events] = entry_price
+            event_shares[num_events] = shares
+            num_events += 1
+
+    return (event_bar, event_kind, event_price, event_shares, num_events,
+            cash, shares, position_open, entry_price, stop_loss_price, take_profit_price)
+
+
+def session_layout(index):
+    """Returns (day start offsets, seconds since local midnight) for a sorted tz-aware minute index."""
+    if not index.is_monotonic_increasing:
+        raise ValueError("The kernels need the bars sorted by timestamp.")
+    days = index.normalize().asi8
+    day_starts = np.flatnonzero(np.diff(days)) + 1
+    day_starts = np.concatenate(([0], day_starts, [len(index)])).astype(np.int64)
+    seconds_of_day = (index.hour * 3600 + index.minute * 60 + index.second).to_numpy(dtype=np.int64)
+    return day_starts, seconds_of_day
+
+
+def signal_codes(signals):
+    """Converts a list/array of "BUY"/"SELL"/"HOLD" strings into kernel signal codes."""
+    signals = np.asarray(signals, dtype=object)
+    return ((signals == "BUY").astype(np.int8) - (signals == "SELL").astype(np.int8))
+
+
+def run_orb_strategy_fast(historical_data, range_minutes=30):
+    """Compiled drop-in for strategy_logic.run_orb_strategy; returns the same list of signals."""
+    day_starts, seconds_of_day = session_layout(historical_data.index)
+    range_start = NSE_CALENDAR.open_seconds_for(historical_data.index[day_starts[:-1]].date)
+    codes = orb_signal_kernel(
+        day_starts, seconds_of_day,
+        historical_data['high'].to_numpy(dtype=np.float64), historical_data['low'].to_numpy(dtype=np.float64),
+        range_start, range_start + range_minutes * 60
+    )
+    return SIGNAL_NAMES[codes.astype(np.int64) + 1].tolist()
+
+
+def events_to_trades(index, event_bar, event_kind, event_price, event_shares, num_events, open_trade=None):
+    """
+    Pairs kernel entry/exit events into trade dicts shaped like calculate_performance_with_exits.
+    open_trade carries an entry from an earlier block; returns (closed trades, still-open trade).
+    """
+    trades = []
+    for k in range(num_events):
+        bar = index[event_bar[k]]
+        if event_kind[k] == EVENT_ENTRY:
+            open_trade = {'entry_date': bar, 'entry_price': float(event_price[k]), 'shares': float(event_shares[k])}
+        else:
+            exit_price = float(event_price[k])
+            open_trade.update({'exit_date': bar, 'exit_price': exit_price,
+                               'profit': (exit_price - open_trade['entry_price']) * open_trade['shares'],
+                               'exit_reason': EXIT_REASONS[int(event_kind[k])]})
+            trades.append(open_trade)
+            open_trade = None
+    return trades, open_trade
+
+
+def calculate_performance_fast(df_with_signals, starting_cash, brokerage, slippage, stop_loss_pct, take_profit_pct):
+    """Compiled drop-in for strategy_logic.calculate_performance_with_exits; returns (cash, trades DataFrame)."""
+    close = df_with_signals['close'].to_numpy(dtype=np.float64)
+    result = position_kernel(
+        close, df_with_signals['high'].to_numpy(dtype=np.float64), df_with_signals['low'].to_numpy(dtype=np.float64),
+        signal_codes(df_with_signals['signal']), float(brokerage), float(slippage),
+        float(stop_loss_pct), float(take_profit_pct),
+        float(starting_cash), 0.0, False, 0.0, 0.0, 0.0
+    )
+    cash, shares, position_open = result[5], result[6], result[7]
+    trades, open_trade = events_to_trades(df_with_signals.index, *result[:5])
+
+    # If a position is still open at the very end, close it
+    if position_open:
+        last_price = close[-1]
+        cash += shares * last_price
+        open_trade.update({'exit_date': df_with_signals.index[-1], 'exit_price': last_price,
+                           'profit': (last_price - open_trade['entry_price']) * open_trade['shares'],
+                           'exit_reason': 'END_OF_DATA'})
+        trades.append(open_trade)
+
+    return cash, pd.DataFrame(trades).dropna()
+
+
+# --- Parity Check (strategy_parity.py: baseline loop, OrbStrategy and the kernels, on generated and stored candles) ---
+if __name__ == "__main__":
+    import logging
+    from strategy_parity import main
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
+    main(sys.argv[1:])
@@ -0,0 +1,167 @@
+# FILE: strategy_parity.py
+"""
+Parity checks for the signal and exit engines that run without the stored CSVs. Three ORB
+implementations must agree bar for bar: the loop the backtester started from (kept verbatim below
+as the reference), strategies.OrbStrategy (batch and streaming) and the compiled kernel
+(strategy_kernels.run_orb_strategy_fast). The compiled exit engine must reproduce
+strategy_logic.calculate_performance_with_exits trade for trade.
+
+The checks run on generated candles (regular sessions plus a Muhurat session, at 1, 15 and 30
+minutes) and on any candle CSVs given on the command line:
+
+    python strategy_parity.py [data.csv ...]
+
+The baseline hard-codes a 09:15 open and skips sessions with range_minutes bars or fewer, so it is
+only held to the 1-minute regular sessions; the other two are compared on everything.
+"""
+import logging
+import sys
+import time
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
+from market_calendar import NSE_CALENDAR, EXCHANGE_TZ, MARKET_OPEN
+from strategies import OrbStrategy, stream_signals
+from strategy_kernels import NUMBA_AVAILABLE, run_orb_strategy_fast, calculate_performance_fast
+from strategy_logic import calculate_performance_with_exits
+from resample_bars import resample_session_bars
+
+logger = logging.getLogger(__name__)
+
+RANGE_MINUTES = 30
+SYNTHETIC_START = date(2024, 10, 14)
+SYNTHETIC_DAYS = 30 # Calendar days; covers the 2024-11-01 Muhurat session
+MINUTE_VOLATILITY = 0.0015
+EXIT_CASES = [(0.02, 0.04), (0.005, 0.01), (0.5, 0.5)] # (stop loss, take profit)
+
+
+def baseline_orb_strategy(historical_data, range_minutes=30):
+    """
+    The original strategy_logic.run_orb_strategy, unchanged: the reference the faster engines replaced.
+    """
+    df = historical_data.copy()
+    signals = []
+
+    # Group data by each unique day to process one day at a time
+    daily_groups = df.groupby(df.index.date)
+
+    for day, daily_data in daily_groups:
+        daily_signals = ["HOLD"] * len(daily_data)
+
+        if len(daily_data) > range_minutes:
+            # Define the opening range time
+            market_open_time = pd.to_datetime(f"{day} 09:15:00").tz_localize('Asia/Kolkata')
+            range_end_time = market_open_time + pd.Timedelta(minutes=range_minutes)
+
+            # Get the data for the opening range
+            opening_range_data = daily_data.loc[market_open_time:range_end_time]
+
+            if not opening_range_data.empty:
+                # Find the high and low of the range
+                range_high = opening_range_data['high'].max()
+                range_low = opening_range_data['low'].min()
+
+                trade_taken_today = False
+
+                # Check for breakouts for the rest of the day
+                for i in range(len(daily_data)):
+                    current_bar = daily_data.iloc[i]
+
+                    if current_bar.name > range_end_time and not trade_taken_today:
+                        # Check for Bullish Breakout
+                        if current_bar['high'] > range_high:
+                            daily_signals[i] = "BUY"
+                            trade_taken_today = True # Take only the first signal of the day
+                        # Check for Bearish Breakout
+                        elif current_bar['low'] < range_low:
+                            daily_signals[i] = "SELL"
+                            trade_taken_today = True # Take only the first signal of the day
+
+        signals.extend(daily_signals)
+
+    return signals
+
+
+def synthetic_candles(start=SYNTHETIC_START, days=SYNTHETIC_DAYS, seed=7):
+    """Deterministic 1-minute random-walk candles for every NSE session in the window, indexed in exchange time."""
+    rng = np.random.default_rng(seed)
+    stamps, frames = [], []
+    price = 1500.0
+    for day in NSE_CALENDAR.trading_days(start, start + timedelta(days=days)):
+        session_open, session_close, _ = NSE_CALENDAR.session_times(day)
+        opened = datetime.combine(day, session_open)
+        minutes = int((datetime.combine(day, session_close) - opened).total_seconds() // 60)
+        # Four steps per bar, so each bar's high and low sit on its own path
+        path = price * np.exp(np.cumsum(rng.normal(0, MINUTE_VOLATILITY / 2, minutes * 4))).reshape(minutes, 4)
+        close = path[:, -1]
+        bar_open = np.concatenate(([price], close[:-1]))
+        frames.append(np.column_stack((bar_open, np.maximum(bar_open, path.max(axis=1)), np.minimum(bar_open, path.min(axis=1)),
+                                       close, rng.integers(1000, 50000, minutes), np.zeros(minutes))))
+        stamps.append(pd.date_range(opened, periods=minutes, freq='min'))
+        price = close[-1]
+    index = stamps[0].append(stamps[1:]).tz_localize(EXCHANGE_TZ).rename('timestamp')
+    df = pd.DataFrame(np.vstack(frames), index=index, columns=['open', 'high', 'low', 'close', 'volume', 'oi'])
+    return df.astype({'volume': np.int64, 'oi': np.int64})
+
+
+def regular_sessions(df):
+    """Bars of the sessions that open at the regular 09:15 (the only ones the baseline loop handles)."""
+    first_bar = df.index.to_series().groupby(df.index.date).transform('min')
+    return df[(first_bar.dt.time == MARKET_OPEN).to_numpy()]
+
+
+def check_orb(df, label, with_baseline, range_minutes=RANGE_MINUTES):
+    """Asserts the kernel, OrbStrategy (batch and streaming) and optionally the baseline agree; returns the signals."""
+    strategy = OrbStrategy(range_minutes)
+    started = time.perf_counter()
+    batch = strategy.signals(df)
+    batch_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    fast = run_orb_strategy_fast(df, range_minutes=range_minutes)
+    fast_seconds = time.perf_counter() - started
+    assert fast == batch, f"{label}: kernel ORB signals differ from OrbStrategy"
+    assert stream_signals(strategy, df) == batch, f"{label}: streamed ORB signals differ from the batch ones"
+    timing = f"OrbStrategy {batch_seconds * 1000:.1f} ms, kernel {fast_seconds * 1000:.1f} ms"
+    if with_baseline:
+        started = time.perf_counter()
+        baseline = baseline_orb_strategy(df, range_minutes=range_minutes)
+        timing += f", baseline {(time.perf_counter() - started) * 1000:.0f} ms"
+        assert baseline == batch, f"{label}: ORB signals differ from the baseline loop"
+    logger.info(f"{label}: ORB signals match{' the baseline' if with_baseline else ''} "
+                f"({len(df)} bars, {sum(signal != 'HOLD' for signal in batch)} signals; {timing})")
+    return batch
+
+
+def check_performance(df, signals, label):
+    """Asserts the compiled exit engine reproduces calculate_performance_with_exits for every EXIT_CASES pair."""
+    bars = df.assign(signal=signals)
+    for stop_loss_pct, take_profit_pct in EXIT_CASES:
+        reference_cash, reference_trades = calculate_performance_with_exits(bars, 100000.0, 10.0, 0.0005, stop_loss_pct, take_profit_pct)
+        fast_cash, fast_trades = calculate_performance_fast(bars, 100000.0, 10.0, 0.0005, stop_loss_pct, take_profit_pct)
+        assert fast_cash == reference_cash, f"{label}: ending cash differs for SL={stop_loss_pct}: {fast_cash} != {reference_cash}"
+        pd.testing.assert_frame_equal(fast_trades, reference_trades)
+    logger.info(f"{label}: exits match for {len(EXIT_CASES)} SL/TP pairs")
+
+
+def check_all(df, label):
+    """Every check on one 1-minute frame and its 15- and 30-minute resamples."""
+    check_orb(regular_sessions(df), f"{label} 1m regular sessions", with_baseline=True)
+    signals = check_orb(df, f"{label} 1m", with_baseline=False)
+    check_performance(df, signals, f"{label} 1m")
+    for bar_minutes in (15, 30):
+        # A 30-minute range is one or two bars here, so only bar times may gate it
+        check_orb(resample_session_bars(df, bar_minutes), f"{label} {bar_minutes}m", with_baseline=False)
+
+
+def main(paths=()):
+    logger.info(f"Numba available: {NUMBA_AVAILABLE}")
+    check_all(synthetic_candles(), "synthetic")
+    for path in paths:
+        from data_loader import load_candles
+        check_all(load_candles(path), path)
+    logger.info("All parity checks passed.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
+    main(sys.argv[1:])
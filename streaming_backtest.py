@@ -0,0 +1,118 @@
+# FILE: streaming_backtest.py
+"""
+Constant-memory backtest: a generator pipeline pulls one trading session at a time from the CSV
+(load -> signals -> fills) and carries only the open position across days, so peak memory depends
+on the read chunk size rather than on the length of the history.
+Signal functions must be session-local (like ORB), since each one only ever sees a single day.
+"""
+import logging
+import sys
+import numpy as np
+import pandas as pd
+from data_loader import PRICE_COLUMNS, COUNT_COLUMNS, compact_frame, symbol_from_filename
+from strategy_kernels import run_orb_strategy_fast, position_kernel, signal_codes, events_to_trades
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 50000
+
+
+def iter_sessions(path, chunksize=CHUNK_ROWS, compact=True):
+    """Yields (day, session DataFrame) for every trading day in a timestamp-sorted candle CSV."""
+    dtypes = {column: np.float32 if compact else np.float64 for column in PRICE_COLUMNS}
+    dtypes.update({column: np.int32 if compact else np.int64 for column in COUNT_COLUMNS})
+    symbol = symbol_from_filename(path)
+    pending = None
+
+    for chunk in pd.read_csv(path, usecols=['timestamp_text'] + PRICE_COLUMNS + COUNT_COLUMNS, dtype=dtypes, chunksize=chunksize):
+        if compact:
+            frame = compact_frame(chunk, symbol)
+        else:
+            chunk['timestamp'] = pd.to_datetime(chunk['timestamp_text'])
+            frame = chunk.set_index('timestamp')
+        if pending is not None:
+            frame = pd.concat([pending, frame])
+
+        # The last day of a chunk may continue in the next one, so hold it back
+        days = frame.index.normalize()
+        last_day = days[-1]
+        for day, session in frame[days != last_day].groupby(days[days != last_day], sort=False):
+            yield day.date(), session
+        pending = frame[days == last_day]
+
+    if pending is not None and len(pending):
+        yield pending.index[0].date(), pending
+
+
+def with_signals(sessions, signal_fn=run_orb_strategy_fast, **signal_kwargs):
+    """Attaches the strategy's signal codes to every session as it streams past."""
+    for day, session in sessions:
+        yield day, session, signal_codes(signal_fn(session, **signal_kwargs))
+
+
+def run_fills(sessions_with_signals, starting_cash, brokerage, slippage, stop_loss_pct, take_profit_pct):
+    """
+    Runs the SL/TP state machine day by day, carrying only the position across sessions.
+    Returns (ending cash, trades DataFrame) exactly like calculate_performance_with_exits.
+    """
+    cash, shares, position_open = float(starting_cash), 0.0, False
+    entry_price = stop_loss_price = take_profit_price = 0.0
+    open_trade = None
+    trades = []
+    last_bar = last_close = None
+
+    for day, session, codes in sessions_with_signals:
+        close = session['close'].to_numpy(dtype=np.float64)
+        result = position_kernel(
+            close, session['high'].to_numpy(dtype=np.float64), session['low'].to_numpy(dtype=np.float64), codes,
+            float(brokerage), float(slippage), float(stop_loss_pct), float(take_profit_pct),
+            cash, shares, position_open, entry_price, stop_loss_price, take_profit_price
+        )
+        cash, shares, position_open, entry_price, stop_loss_price, take_profit_price = result[5:]
+        closed, open_trade = events_to_trades(session.index, *result[:5], open_trade=open_trade)
+        trades.extend(closed)
+        last_bar, last_close = session.index[-1], close[-1]
+
+    # If a position is still open at the very end, close it
+    if position_open:
+        cash += shares * last_close
+        open_trade.update({'exit_date': last_bar, 'exit_price': last_close,
+                           'profit': (last_close - open_trade['entry_price']) * open_trade['shares'],
+                           'exit_reason': 'END_OF_DATA'})
+        trades.append(open_trade)
+
+    return cash, pd.DataFrame(trades).dropna()
+
+
+def stream_backtest(path, starting_cash, brokerage, slippage, stop_loss_pct, take_profit_pct,
+                    range_minutes=30, chunksize=CHUNK_ROWS, compact=True):
+    """Streams an ORB backtest over one symbol's CSV with bounded memory."""
+    sessions = iter_sessions(path, chunksize=chunksize, compact=compact)
+    signals = with_signals(sessions, run_orb_strategy_fast, range_minutes=range_minutes)
+    return run_fills(signals, starting_cash, brokerage, slippage, stop_loss_pct, take_profit_pct)
+
+
+# --- Parity Check Against the In-Memory Backtest ---
+if __name__ == "__main__":
+    import tracemalloc
+    from data_loader import load_candles
+    from strategy_kernels import calculate_performance_fast
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
+    data_file = sys.argv[1] if len(sys.argv) > 1 else "hdfcbank_2yr_1m_data.csv"
+
+    tracemalloc.start()
+    streamed_cash, streamed_trades = stream_backtest(data_file, 100000.0, 10.0, 0.0005, 0.02, 0.04)
+    streamed_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+
+    df_history = load_candles(data_file, compact=True)
+    df_history['signal'] = run_orb_strategy_fast(df_history, range_minutes=30)
+    batch_cash, batch_trades = calculate_performance_fast(df_history, 100000.0, 10.0, 0.0005, 0.02, 0.04)
+    batch_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert streamed_cash == batch_cash, f"Ending cash differs: {streamed_cash} != {batch_cash}"
+    pd.testing.assert_frame_equal(streamed_trades, batch_trades)
+    logger.info(f"Streaming matches batch: {len(streamed_trades)} trades, ending cash Rs.{streamed_cash:,.2f}")
+    logger.info(f"Peak traced memory: streaming {streamed_peak / 1024 ** 2:.1f} MB vs batch {batch_peak / 1024 ** 2:.1f} MB")
@@ -0,0 +1,432 @@
+# FILE: sweep_cluster.py
+"""
+Distributed (symbol x parameter-set) sweeps. A coordinator hands tasks to worker processes on any
+number of hosts over TCP (newline-delimited JSON) and streams the results back as they arrive.
+
+- Data locality: each worker keeps the symbols it has loaded in an LRU cache and reports them when
+  it asks for work; the coordinator prefers tasks for a cached symbol, then a symbol no other worker
+  holds, so every data file is read by as few workers as possible.
+- Lost workers: a task is leased to one worker and kept alive by its heartbeats. A dropped
+  connection or a lease that runs out puts the task back on the queue; a late duplicate result is
+  ignored. A task that fails MAX_ATTEMPTS times is reported as failed.
+- Results are recorded in backtest_results.db (results_store.py), and tasks whose fingerprint is
+  already stored are answered from it without being sent out.
+
+    python sweep_cluster.py coordinator --port 7600 reliance_2yr_1m_data.csv ...   # then on each host:
+    python sweep_cluster.py worker --host <coordinator> --port 7600 [--data-dir /shared/data]
+    python sweep_cluster.py local --workers 4 reliance_2yr_1m_data.csv ...         # coordinator + local workers
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 7600
+LEASE_SECONDS = 30.0 # A task is re-queued if its worker sends no heartbeat for this long
+HEARTBEAT_SECONDS = 5.0
+MAX_ATTEMPTS = 3
+CACHED_SYMBOLS = 8 # Loaded symbol frames a worker keeps in memory
+
+EXIT_DEFAULTS = {'starting_cash': 100000.0, 'brokerage': 10.0, 'slippage_pct': 0.0005, 'stop_loss_pct': 0.02, 'take_profit_pct': 0.04}
+SIGNAL_PARAMS = {
+    'orb': ('range_minutes',),
+    'v2': ('volume_period', 'volume_factor', 'trend_period'),
+    'bollinger': ('bb_length', 'bb_std'),
+}
+DEFAULT_GRIDS = {
+    'orb': {'range_minutes': [15, 30, 45], 'stop_loss_pct': [0.01, 0.015, 0.02], 'take_profit_pct': [0.02, 0.03, 0.04]},
+    'v2': {'volume_period': [20, 40], 'volume_factor': [1.5, 2.5], 'trend_period': [50, 100]},
+    'bollinger': {'bb_length': [20, 40], 'bb_std': [2.0, 2.5]},
+}
+
+
+def _json_default(value):
+    return value.item() if isinstance(value, np.generic) else str(value)
+
+
+def send_message(stream, message, lock=None):
+    data = (json.dumps(message, default=_json_default, separators=(',', ':')) + '\n').encode()
+    if lock is None:
+        stream.write(data)
+        stream.flush()
+    else:
+        with lock:
+            stream.write(data)
+            stream.flush()
+
+
+def build_tasks(data_files, strategy, grid):
+    """One task per (file, parameter combination), symbol-major so consecutive tasks share data."""
+    from data_loader import symbol_from_filename
+    names = list(grid)
+    tasks = []
+    for data_file in data_files:
+        for values in itertools.product(*(grid[name] for name in names)):
+            symbol = symbol_from_filename(data_file)
+            tasks.append({'task_id': len(tasks), 'symbol': symbol, 'data_file': data_file, 'strategy': strategy,
+                          'labels': {'symbol': symbol, **dict(zip(names, values))},
+                          'params': {**EXIT_DEFAULTS, **dict(zip(names, values))}})
+    return tasks
+
+
+# --- Worker side ---
+def evaluate_task(df, strategy, params):
+    """Signals + SL/TP exits + metrics for one parameter set on an already loaded candle frame."""
+    from strategy_logic import run_v2_strategy, run_bollinger_bands_strategy
+    from strategy_kernels import run_orb_strategy_fast, calculate_performance_fast
+    from performance_analytics import compute_performance_metrics
+    signal_functions = {'orb': run_orb_strategy_fast, 'v2': run_v2_strategy, 'bollinger': run_bollinger_bands_strategy}
+    signal_args = {name: params[name] for name in SIGNAL_PARAMS[strategy] if name in params}
+
+    df = df.copy(deep=False)
+    df['signal'] = signal_functions[strategy](df, **signal_args)
+    _, df_trades = calculate_performance_fast(df, params['starting_cash'], params['brokerage'], params['slippage_pct'],
+                                              params['stop_loss_pct'], params['take_profit_pct'])
+    metrics, _, _, _ = compute_performance_metrics(df, df_trades, params['starting_cash'], params['brokerage'])
+    return metrics, df_trades
+
+
+class SymbolCache:
+    """LRU of loaded candle frames, keyed by symbol."""
+
+    def __init__(self, data_dir=None, max_symbols=CACHED_SYMBOLS):
+        self.data_dir = data_dir
+        self.max_symbols = max_symbols
+        self.frames = OrderedDict()
+
+    def symbols(self):
+        return list(self.frames)
+
+    def get(self, symbol, data_file):
+        if symbol in self.frames:
+            self.frames.move_to_end(symbol)
+            return self.frames[symbol]
+        from data_loader import load_candles
+        # Workers on other hosts resolve the file name against their own copy of the data
+        path = os.path.join(self.data_dir, os.path.basename(data_file)) if self.data_dir else data_file
+        started = time.perf_counter()
+        self.frames[symbol] = load_candles(path, compact=False, symbol=symbol)
+        logger.info(f"Loaded {symbol} from {path} in {time.perf_counter() - started:.2f}s")
+        while len(self.frames) > self.max_symbols:
+            self.frames.popitem(last=False)
+        return self.frames[symbol]
+
+
+def run_worker(host, port, worker_id=None, data_dir=None, max_symbols=CACHED_SYMBOLS, connect_timeout=30.0):
+    """Connects to a coordinator and works tasks until it says the sweep is done. Returns the number completed."""
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    deadline = time.monotonic() + connect_timeout
+    while True:
+        try:
+            connection = socket.create_connection((host, port), timeout=10)
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+    connection.settimeout(None)
+    connection.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    reader, writer = connection.makefile('rb'), connection.makefile('wb')
+    write_lock = threading.Lock()
+    stop = threading.Event()
+    cache = SymbolCache(data_dir, max_symbols)
+    current = {'task_id': None}
+
+    def heartbeat():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            try:
+                send_message(writer, {'type': 'heartbeat', 'task_id': current['task_id']}, write_lock)
+            except OSError:
+                return
+
+    threading.Thread(target=heartbeat, name="sweep-heartbeat", daemon=True).start()
+    completed = 0
+    try:
+        send_message(writer, {'type': 'hello', 'worker': worker_id}, write_lock)
+        while True:
+            send_message(writer, {'type': 'ready', 'cached': cache.symbols()}, write_lock)
+            line = reader.readline()
+            if not line:
+                logger.warning("Coordinator closed the connection.")
+                break
+            message = json.loads(line)
+            if message['type'] == 'shutdown':
+                break
+            if message['type'] == 'wait':
+                time.sleep(message.get('seconds', 1.0))
+                continue
+
+            task = message['task']
+            current['task_id'] = task['task_id']
+            started = time.perf_counter()
+            try:
+                df = cache.get(task['symbol'], task['data_file'])
+                metrics, df_trades = evaluate_task(df, task['strategy'], task['params'])
+                trades = df_trades.astype({'entry_date': str, 'exit_date': str}).to_dict('records') if len(df_trades) else []
+                reply = {'type': 'result', 'task_id': task['task_id'], 'metrics': metrics, 'trades': trades,
+                         'seconds': time.perf_counter() - started}
+                completed += 1
+            except Exception as e:
+                logger.error(f"Task {task['task_id']} ({task['symbol']}) failed: {e}", exc_info=True)
+                reply = {'type': 'error', 'task_id': task['task_id'], 'error': repr(e)}
+            current['task_id'] = None
+            send_message(writer, reply, write_lock)
+    finally:
+        stop.set()
+        connection.close()
+    logger.info(f"Worker {worker_id} finished: {completed} tasks, cached {cache.symbols()}")
+    return completed
+
+
+# --- Coordinator side ---
+class SweepCoordinator:
+    """Task queue with per-symbol locality, heartbeat leases and a stream of results."""
+
+    def __init__(self, tasks, host='0.0.0.0', port=DEFAULT_PORT, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.tasks = {task['task_id']: task for task in tasks}
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.condition = threading.Condition()
+        self.pending = OrderedDict() # symbol -> deque of task ids
+        self.leases = {} # task_id -> (worker, deadline)
+        self.attempts = dict.fromkeys(self.tasks, 0)
+        self.finished = set()
+        self.workers = {} # worker -> set of cached symbols
+        self.stream = queue.Queue()
+        for task in tasks:
+            self.pending.setdefault(task['symbol'], deque()).append(task['task_id'])
+
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                coordinator._serve_worker(self.rfile, self.wfile, self.client_address)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.address = self.server.server_address
+
+    # --- Queue operations (all under self.condition) ---
+    def mark_done(self, task_id, metrics, source='cache'):
+        """Completes a task without sending it out (e.g. answered from the results store)."""
+        with self.condition:
+            for symbol, ids in self.pending.items():
+                if task_id in ids:
+                    ids.remove(task_id)
+            self.finished.add(task_id)
+        self.stream.put({'type': 'result', 'task': self.tasks[task_id], 'metrics': metrics, 'trades': None, 'worker': source})
+
+    def _next_task(self, worker, cached):
+        other = set().union(*(symbols for name, symbols in self.workers.items() if name != worker))
+        candidates = [symbol for symbol in cached if self.pending.get(symbol)] or \
+                     [symbol for symbol, ids in self.pending.items() if ids and symbol not in other] or \
+                     [symbol for symbol, ids in self.pending.items() if ids]
+        if not candidates:
+            return None
+        task_id = self.pending[candidates[0]].popleft()
+        # The worker is about to load this symbol, so other workers are steered to a different one
+        self.workers.setdefault(worker, set()).add(candidates[0])
+        self.attempts[task_id] += 1
+        self.leases[task_id] = (worker, time.monotonic() + self.lease_seconds)
+        return self.tasks[task_id]
+
+    def _requeue(self, task_id, reason):
+        self.leases.pop(task_id, None)
+        if task_id in self.finished:
+            return
+        task = self.tasks[task_id]
+        if self.attempts[task_id] >= self.max_attempts:
+            self.finished.add(task_id)
+            self.stream.put({'type': 'failed', 'task': task, 'error': reason})
+            return
+        logger.warning(f"Re-queueing task {task_id} ({task['symbol']}): {reason}")
+        self.pending.setdefault(task['symbol'], deque()).appendleft(task_id)
+
+    def _expire_leases(self):
+        now = time.monotonic()
+        for task_id, (worker, deadline) in list(self.leases.items()):
+            if deadline < now:
+                self._requeue(task_id, f"lease expired on {worker}")
+
+    def done(self):
+        with self.condition:
+            return len(self.finished) == len(self.tasks)
+
+    # --- Connection handling ---
+    def _serve_worker(self, reader, writer, address):
+        worker = None
+        try:
+            for line in reader:
+                message = json.loads(line)
+                kind = message['type']
+                with self.condition:
+                    if kind == 'hello':
+                        worker = message['worker']
+                        self.workers[worker] = set()
+                        logger.info(f"Worker {worker} connected from {address[0]}")
+                        continue
+                    if kind == 'heartbeat':
+                        if message.get('task_id') in self.leases and self.leases[message['task_id']][0] == worker:
+                            self.leases[message['task_id']] = (worker, time.monotonic() + self.lease_seconds)
+                        continue
+                    if kind in ('result', 'error'):
+                        self._finish(worker, message)
+                        continue
+                    # 'ready': hand out the next task, ask the worker to wait, or tell it the sweep is over
+                    self.workers[worker] = set(message.get('cached', ()))
+                    self._expire_leases()
+                    task = self._next_task(worker, message.get('cached', ()))
+                    if task is not None:
+                        reply = {'type': 'task', 'task': task}
+                    elif len(self.finished) == len(self.tasks):
+                        reply = {'type': 'shutdown'}
+                    else:
+                        reply = {'type': 'wait', 'seconds': 0.5}
+                send_message(writer, reply)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Lost worker {worker or address}: {e}")
+        finally:
+            with self.condition:
+                self.workers.pop(worker, None)
+                for task_id, (holder, _) in list(self.leases.items()):
+                    if holder == worker:
+                        self._requeue(task_id, f"worker {worker} disconnected")
+
+    def _finish(self, worker, message):
+        task_id = message['task_id']
+        if self.leases.get(task_id, (None,))[0] == worker:
+            self.leases.pop(task_id)
+        if task_id in self.finished:
+            return # Late duplicate from a worker whose lease had already been re-queued
+        if message['type'] == 'error':
+            self._requeue(task_id, f"{worker}: {message['error']}")
+            return
+        self.finished.add(task_id)
+        self.stream.put({'type': 'result', 'task': self.tasks[task_id], 'metrics': message['metrics'],
+                         'trades': message['trades'], 'worker': worker, 'seconds': message.get('seconds')})
+
+    # --- Lifecycle ---
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="sweep-coordinator", daemon=True).start()
+        logger.info(f"Coordinator listening on {self.address[0]}:{self.address[1]} with {len(self.tasks)} tasks")
+        return self
+
+    def results(self, poll_seconds=1.0):
+        """Yields result/failure events as they arrive until every task is finished."""
+        while True:
+            try:
+                yield self.stream.get(timeout=poll_seconds)
+            except queue.Empty:
+                with self.condition:
+                    self._expire_leases()
+            if self.done() and self.stream.empty():
+                return
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def run_sweep(coordinator, store=None, sweep_name="sweep_cluster", on_start=None):
+    """
+    Starts the coordinator and drives it to completion, streaming results into a ResultsStore.
+    Tasks already in the store are answered from it before any work is handed out; on_start is
+    called once that leaves work to do. Returns the summarize_sweep table.
+    """
+    import pandas as pd
+    from performance_analytics import summarize_sweep
+    from results_store import code_version
+    runs, failed = [], 0
+    if store is not None:
+        engine_version = code_version()
+        sweep_id = store.start_sweep(sweep_name, engine_version)
+        data_versions = {}
+        for task in coordinator.tasks.values():
+            if task['data_file'] not in data_versions:
+                data_versions[task['data_file']] = store.data_fingerprint(task['data_file']) if os.path.exists(task['data_file']) else None
+            data_version = data_versions[task['data_file']]
+            task['fingerprint'] = store.run_fingerprint(task['strategy'], task['symbol'], task['params'], data_version, engine_version)
+            previous = store.find_run(task['fingerprint'], sweep_id) if data_version else None
+            if previous:
+                coordinator.mark_done(task['task_id'], previous[1])
+
+    coordinator.start()
+    if on_start is not None and not coordinator.done():
+        on_start()
+    started = time.perf_counter()
+    for event in coordinator.results():
+        task = event['task']
+        if event['type'] == 'failed':
+            failed += 1
+            logger.error(f"Task {task['task_id']} ({task['symbol']}) failed: {event['error']}")
+            continue
+        runs.append({'labels': task['labels'], 'metrics': event['metrics']})
+        if store is not None and event['worker'] != 'cache':
+            data_version = data_versions[task['data_file']]
+            store.record_run(sweep_id, task['strategy'], task['symbol'], task['params'], data_version, engine_version,
+                             event['metrics'], pd.DataFrame(event['trades']))
+        logger.info(f"[{len(runs) + failed}/{len(coordinator.tasks)}] {task['labels']} -> "
+                    f"{event['metrics']['return_pct']:.2f}% ({event['worker']})")
+    logger.info(f"Sweep finished in {time.perf_counter() - started:.1f}s: {len(runs)} results, {failed} failed")
+    return summarize_sweep(runs) if runs else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed symbol x parameter sweeps")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name in ('coordinator', 'local'):
+        command = commands.add_parser(name)
+        command.add_argument('data_files', nargs='+')
+        command.add_argument('--strategy', choices=sorted(SIGNAL_PARAMS), default='orb')
+        command.add_argument('--grid', type=json.loads, help='JSON {"param": [values, ...]} (default: the built-in grid)')
+        command.add_argument('--host', default='0.0.0.0' if name == 'coordinator' else '127.0.0.1')
+        command.add_argument('--port', type=int, default=DEFAULT_PORT if name == 'coordinator' else 0)
+        command.add_argument('--no-store', action='store_true', help="don't read or write backtest_results.db")
+    commands.choices['local'].add_argument('--workers', type=int, default=os.cpu_count())
+    worker = commands.add_parser('worker')
+    worker.add_argument('--host', default='127.0.0.1')
+    worker.add_argument('--port', type=int, default=DEFAULT_PORT)
+    worker.add_argument('--data-dir', help="directory holding the data files on this host")
+    worker.add_argument('--cache-symbols', type=int, default=CACHED_SYMBOLS)
+    args = parser.parse_args(argv)
+
+    if args.command == 'worker':
+        run_worker(args.host, args.port, data_dir=args.data_dir, max_symbols=args.cache_symbols)
+        return
+
+    from results_store import ResultsStore
+    tasks = build_tasks(args.data_files, args.strategy, args.grid or DEFAULT_GRIDS[args.strategy])
+    coordinator = SweepCoordinator(tasks, args.host, args.port)
+    processes = []
+
+    def spawn_local_workers():
+        processes.extend(subprocess.Popen([sys.executable, os.path.abspath(__file__), 'worker', '--port', str(coordinator.address[1])])
+                         for _ in range(args.workers))
+
+    try:
+        summary = run_sweep(coordinator, None if args.no_store else ResultsStore(), f"sweep_cluster:{args.strategy}",
+                            on_start=spawn_local_workers if args.command == 'local' else None)
+        if summary is not None:
+            print(summary.sort_values('return_pct', ascending=False).head(20).to_string(index=False))
+    finally:
+        coordinator.shutdown()
+        for process in processes:
+            process.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,150 @@
+# FILE: utils/candle_cache.py
+"""
+On-disk cache for Upstox historical candle requests. A closed session's 1-minute candles never change,
+so each (instrument_key, interval, date) response is stored once as a gzipped JSON file named by the
+hash of its key and never expires once it was stored on a later (IST) date than the day it covers.
+Anything stored earlier (today's partial candles, a pre-open 404, or the empty response the historical
+endpoint gives for a session that closed a few hours ago) is only good for a short TTL. 404s for
+weekends and holidays are cached too, so re-running a fetch script makes no API calls at all.
+Recently used entries are also kept in memory.
+"""
+import calendar
+import gzip
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from upstox_client.rest import ApiException
+from market_calendar import IST_OFFSET_SECONDS
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".aita_cache", "candles")
+TODAY_TTL_SECONDS = 60
+MEMORY_ENTRIES = 512
+
+
+def cache_key(instrument_key, interval, day):
+    return hashlib.sha256(f"{instrument_key}|{interval}|{day}".encode()).hexdigest()
+
+
+def ist_today():
+    """Today's date at the exchange, whatever the machine's time zone."""
+    return (datetime.now(timezone.utc) + timedelta(seconds=IST_OFFSET_SECONDS)).date()
+
+
+def final_after(day):
+    """
+    Epoch seconds after which a stored response for `day` is final: the IST midnight that ends it. The
+    historical endpoint often has nothing for a session until well after its close, so an entry stored
+    on the day itself (even in the evening) is never trusted past the TTL.
+    """
+    return calendar.timegm(day.timetuple()) - IST_OFFSET_SECONDS + 24 * 3600
+
+
+class CandleCache:
+    """Content-addressed store of candle lists: <cache_dir>/<first two hex digits>/<sha256>.json.gz."""
+
+    def __init__(self, cache_dir=CACHE_DIR, today_ttl_seconds=TODAY_TTL_SECONDS, memory_entries=MEMORY_ENTRIES, today=ist_today):
+        self.cache_dir = cache_dir
+        self.today_ttl_seconds = today_ttl_seconds
+        self.memory_entries = memory_entries
+        self.today = today
+        self._memory = OrderedDict() # key -> (stored_at, entry)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def _fresh(self, day, stored_at):
+        """Entries stored on a later IST date never expire; anything stored on the day itself is only good for the TTL."""
+        if day > self.today():
+            return False
+        return stored_at >= final_after(day) or time.time() - stored_at < self.today_ttl_seconds
+
+    def get(self, instrument_key, interval, day):
+        """Returns the cached entry ({'status': 200|404, 'candles': [...]}) or None."""
+        key = cache_key(instrument_key, interval, day)
+        if key in self._memory:
+            stored_at, entry = self._memory[key]
+            if self._fresh(day, stored_at):
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry
+            del self._memory[key]
+
+        path = self._path(key)
+        try:
+            stored_at = os.path.getmtime(path)
+            if self._fresh(day, stored_at):
+                with gzip.open(path, 'rt') as f:
+                    entry = json.load(f)
+                self._remember(key, stored_at, entry)
+                self.hits += 1
+                return entry
+        except (OSError, ValueError):
+            pass # missing or unreadable file: treat as a miss and refetch
+        self.misses += 1
+        return None
+
+    def put(self, instrument_key, interval, day, candles, status=200):
+        if day > self.today():
+            return
+        key = cache_key(instrument_key, interval, day)
+        entry = {'instrument_key': instrument_key, 'interval': interval, 'date': str(day), 'status': status, 'candles': candles}
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(temp_path, 'wt', compresslevel=6) as f:
+            json.dump(entry, f, separators=(',', ':'))
+        os.replace(temp_path, path) # atomic, so a concurrent reader never sees half a file
+        self._remember(key, time.time(), entry)
+
+    def _remember(self, key, stored_at, entry):
+        self._memory[key] = (stored_at, entry)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+class CachedHistoryApi:
+    """
+    Drop-in wrapper around upstox_client's HistoryApi for get_historical_candle_data: returns the
+    same response shape (.data.candles) and raises the same 404 ApiException, from the cache when it can.
+    last_from_cache tells the caller whether the previous call reached the API (e.g. to skip rate-limit sleeps).
+    """
+
+    def __init__(self, api_instance, cache=None):
+        self.api = api_instance
+        self.cache = cache or CandleCache()
+        self.last_from_cache = False
+
+    def get_historical_candle_data(self, instrument_key, interval, to_date, api_version="v2"):
+        day = _as_date(to_date)
+        entry = self.cache.get(instrument_key, interval, day)
+        self.last_from_cache = entry is not None
+        if entry is None:
+            try:
+                response = self.api.get_historical_candle_data(instrument_key=instrument_key, interval=interval,
+                                                               to_date=str(day), api_version=api_version)
+            except ApiException as e:
+                if e.status == 404:
+                    self.cache.put(instrument_key, interval, day, [], status=404)
+                raise
+            candles = [list(candle) for candle in (response.data.candles or [])] if response.data else []
+            self.cache.put(instrument_key, interval, day, candles)
+            return response
+
+        if entry['status'] == 404:
+            raise ApiException(status=404, reason="Not Found (cached)")
+        return SimpleNamespace(status='success', data=SimpleNamespace(candles=entry['candles']))
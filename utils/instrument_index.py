@@ -0,0 +1,82 @@
+# FILE: utils/instrument_index.py
+"""
+SQLite index of the Upstox instrument master for interactive lookups. It is built from
+upstox_complete_instruments.csv with the csv module and queried with sqlite3, so a lookup never
+imports pandas. The index is rebuilt automatically when the CSV changes.
+"""
+import csv
+import os
+import sqlite3
+
+INSTRUMENT_FILE = "upstox_complete_instruments.csv"
+INDEX_FILE = ".instrument_index.sqlite"
+COLUMNS = ('instrument_key', 'exchange', 'instrument_type', 'tradingsymbol', 'name', 'expiry', 'lot_size')
+
+
+class InstrumentIndex:
+    def __init__(self, csv_path=INSTRUMENT_FILE, index_path=INDEX_FILE):
+        self.csv_path = csv_path
+        self.index_path = index_path
+        self._connection = None
+
+    def connection(self):
+        """Connection to an index that matches the current CSV, rebuilding it first if needed."""
+        if self._connection is not None:
+            return self._connection
+        stat = os.stat(self.csv_path)
+        source = f"{stat.st_size}:{stat.st_mtime_ns}"
+        if os.path.exists(self.index_path):
+            connection = sqlite3.connect(self.index_path)
+            try:
+                row = connection.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+                if row and row[0] == source:
+                    self._connection = connection
+                    return connection
+            except sqlite3.DatabaseError:
+                pass
+            connection.close()
+        self._connection = self._build(source)
+        return self._connection
+
+    def _build(self, source):
+        temp_path = f"{self.index_path}.tmp"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        connection = sqlite3.connect(temp_path)
+        connection.executescript(f"""
+            CREATE TABLE instruments ({', '.join(f'{column} TEXT COLLATE NOCASE' for column in COLUMNS)});
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        with open(self.csv_path, newline='') as f:
+            reader = csv.DictReader(f)
+            reader.fieldnames = [name.strip() for name in reader.fieldnames] # Clean column names
+            connection.executemany(f"INSERT INTO instruments VALUES ({', '.join('?' * len(COLUMNS))})",
+                                   (tuple(row.get(column) or None for column in COLUMNS) for row in reader))
+        connection.executescript("""
+            CREATE INDEX instruments_symbol ON instruments(tradingsymbol);
+            CREATE INDEX instruments_name ON instruments(name);
+            CREATE INDEX instruments_key ON instruments(instrument_key);
+        """)
+        connection.execute("INSERT INTO meta VALUES ('source', ?)", (source,))
+        connection.commit()
+        connection.close()
+        os.replace(temp_path, self.index_path)
+        return sqlite3.connect(self.index_path)
+
+    def search(self, term, exchange=None, instrument_type=None, limit=20):
+        """Instruments whose key, trading symbol or name starts with `term` (case-insensitive), as dicts."""
+        # Escape LIKE's wildcards so "SYM1_" is a literal prefix, not "SYM1" plus any character
+        prefix = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        filters, params = [], [term, prefix, prefix]
+        if exchange:
+            filters.append("AND exchange = ?")
+            params.append(exchange)
+        if instrument_type:
+            filters.append("AND instrument_type = ?")
+            params.append(instrument_type)
+        # Each OR branch is a prefix range on its own NOCASE index
+        rows = self.connection().execute(f"""
+            SELECT {', '.join(COLUMNS)} FROM instruments
+            WHERE (instrument_key = ? OR tradingsymbol LIKE ? ESCAPE '\\' OR name LIKE ? ESCAPE '\\') {' '.join(filters)}
+            ORDER BY length(tradingsymbol), expiry, tradingsymbol LIMIT ?""", (*params, limit)).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
@@ -0,0 +1,63 @@
+# FILE: utils/instrument_master.py
+"""
+Cached view of the Upstox instrument master (upstox_complete_instruments.csv). The CSV is parsed once
+into a pickle of the columns the tools need, re-read only when the CSV changes, and lookups such as
+a futures expiry chain are then plain in-memory filters.
+"""
+import os
+import pickle
+import re
+import pandas as pd
+
+INSTRUMENT_FILE = "upstox_complete_instruments.csv"
+CACHE_FILE = ".instrument_master.pkl"
+COLUMNS = ['instrument_key', 'exchange', 'instrument_type', 'tradingsymbol', 'name', 'expiry', 'lot_size']
+
+
+class InstrumentMaster:
+    def __init__(self, csv_path=INSTRUMENT_FILE, cache_path=CACHE_FILE):
+        self.csv_path = csv_path
+        self.cache_path = cache_path
+        self._frame = None
+
+    def frame(self):
+        """The instrument master as a DataFrame, from the pickle when it is newer than the CSV."""
+        if self._frame is not None:
+            return self._frame
+        stat = os.stat(self.csv_path)
+        source = (stat.st_size, stat.st_mtime)
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cached_source, frame = pickle.load(f)
+            if cached_source == source:
+                self._frame = frame
+                return frame
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            pass
+
+        frame = pd.read_csv(self.csv_path, low_memory=False)
+        frame.columns = frame.columns.str.strip() # Clean column names
+        frame = frame[[column for column in COLUMNS if column in frame.columns]].copy()
+        frame['expiry'] = pd.to_datetime(frame['expiry'], errors='coerce')
+        for column in ('exchange', 'instrument_type'):
+            frame[column] = frame[column].astype('category')
+        with open(f"{self.cache_path}.tmp", 'wb') as f:
+            pickle.dump((source, frame), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{self.cache_path}.tmp", self.cache_path)
+        self._frame = frame
+        return frame
+
+    def futures_chain(self, symbol, exchange, instrument_type="FUT"):
+        """Every listed futures contract on `symbol` (e.g. GOLDM on MCX_FO), sorted by expiry."""
+        df = self.frame()
+        # The root must be followed by a space or the expiry digits, so GOLD does not also match GOLDM
+        pattern = re.compile(rf"^{re.escape(symbol)}[\s\d]")
+        selected = df[(df['exchange'] == exchange) & (df['instrument_type'] == instrument_type)]
+        selected = selected[selected['tradingsymbol'].astype(str).str.match(pattern)]
+        return selected.dropna(subset=['expiry']).sort_values('expiry').reset_index(drop=True)
+
+    def nearest_future(self, symbol, exchange, instrument_type="FUT", now=None):
+        """The nearest contract that has not expired yet, or None."""
+        chain = self.futures_chain(symbol, exchange, instrument_type)
+        active = chain[chain['expiry'] > (now or pd.Timestamp.now())]
+        return active.iloc[0] if not active.empty else None
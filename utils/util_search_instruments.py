@@ -1,8 +1,8 @@
 # FILE: utils/util_search_instruments.py
-import pandas as pd
 import logging
 import sys
 from datetime import datetime
+from instrument_master import InstrumentMaster
 
 logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='%(message)s')
 logger = logging.getLogger(__name__)
@@ -13,21 +13,14 @@ EXCHANGE = "MCX_FO"
 INSTRUMENT_TYPE = "FUT"
 
 try:
-    df = pd.read_csv(INSTRUMENT_FILE)
-    df.columns = df.columns.str.strip() # Clean column names
-    
-    filtered_df = df[
-        (df['exchange'] == EXCHANGE) &
-        (df['instrument_type'] == INSTRUMENT_TYPE) &
-        (df['tradingsymbol'].str.contains(SEARCH_SYMBOL, na=False))
-    ].copy()
+    # The parsed master is cached next to the CSV, so repeated lookups don't rescan it
+    master = InstrumentMaster(INSTRUMENT_FILE)
+    contracts = master.futures_chain(SEARCH_SYMBOL, EXCHANGE, INSTRUMENT_TYPE)
 
-    if not filtered_df.empty:
-        filtered_df['expiry'] = pd.to_datetime(filtered_df['expiry'])
-        future_contracts = filtered_df[filtered_df['expiry'] > datetime.now()]
+    if not contracts.empty:
+        nearest_future = master.nearest_future(SEARCH_SYMBOL, EXCHANGE, INSTRUMENT_TYPE, now=datetime.now())
         
-        if not future_contracts.empty:
-            nearest_future = future_contracts.sort_values(by='expiry').iloc[0]
+        if nearest_future is not None:
             logger.info("\n--- Found Nearest Active Futures Contract ---")
             logger.info(f"Trading Symbol: {nearest_future['tradingsymbol']}")
             logger.info(f"Instrument Key: {nearest_future['instrument_key']}")